@@ -4,6 +4,12 @@ from setuptools import find_packages, setup
 
 plugins: Dict[str, Set[str]] = {
     "powerbireportserver": {"orderedset", "pydantic", "requests", "requests_ntlm"},
+    # Faster JSON decoding of large responses
+    "fast-decoding": {"orjson"},
+    # asyncio client with NTLM support
+    "async": {"httpx", "httpx-ntlm"},
+    # OpenTelemetry spans of requests and ingestion stages
+    "opentelemetry": {"opentelemetry-api"},
 }
 
 setup_output = setup(
@@ -13,4 +19,9 @@ setup_output = setup(
     package_dir={"": "src"},
     packages=find_packages("src"),
     install_requires=list(plugins["powerbireportserver"]),
+    extras_require={
+        "fast-decoding": list(plugins["fast-decoding"]),
+        "async": list(plugins["async"]),
+        "opentelemetry": list(plugins["opentelemetry"]),
+    },
 )
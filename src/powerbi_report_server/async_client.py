@@ -0,0 +1,1189 @@
+#########################################################
+#
+# asyncio client of the Power BI Report Server REST API
+#
+#########################################################
+import asyncio
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from .content import DefinitionCache, ReportDefinition, extract_definition
+from .decoding import CollectionParser, ModelDecoder, loads
+from .endpoints import ROOT_FOLDER_KEY, EndpointRegistry
+from .instrumentation import Tracer
+from .powerbi_report_server import (
+    AdaptiveLimit,
+    CatalogItem,
+    CatalogRecord,
+    CircuitBreaker,
+    CircuitBreakerOpenError,
+    Constant,
+    DataSet,
+    DataSource,
+    LinkedReport,
+    MetaData,
+    MobileReport,
+    PowerBiDashboardSourceConfig,
+    PowerBiReport,
+    PowerBiReportServerAPI,
+    PowerBiReportServerAPIConfig,
+    PowerBiReportServerDashboardSourceReport,
+    Report,
+    ReportLineage,
+    SystemPolicies,
+    TokenBucket,
+    UserDirectory,
+    backoff_delay,
+    next_page_request,
+)
+from .response_cache import CachedResponse, ResponseCache
+from .state import to_odata_datetime, to_utc
+
+try:
+    import httpx
+    from httpx_ntlm import HttpNtlmAuth
+
+    HAS_HTTPX = True
+except ImportError:  # pragma: no cover
+    HAS_HTTPX = False
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+M = TypeVar("M", bound=BaseModel)
+
+
+async def ordered_map_async(
+    fn: Callable[[T], Awaitable[R]], items: AsyncIterator[T], max_in_flight: int
+) -> AsyncIterator[R]:
+    """
+    asyncio counterpart of ordered_map: results are yielded in input order
+    and at most max_in_flight calls are pending at any time.
+    """
+    pending: Deque["asyncio.Future[R]"] = deque()
+    try:
+        async for item in items:
+            pending.append(asyncio.ensure_future(fn(item)))
+            if len(pending) >= max_in_flight:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_sync(iterator: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Drive async generator on a private event loop from synchronous code.
+
+    Pending tasks of the generator progress every time the next item is
+    requested. The generator is closed on the same loop when the caller stops.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        loop.run_until_complete(iterator.aclose())  # type: ignore
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class AsyncMemoCache:
+    """
+    Per-run memo of coroutine results.
+
+    Concurrent callers asking for the same key await one task. Failed tasks
+    are forgotten and computed again on the next call.
+    """
+
+    def __init__(
+        self,
+        on_hit: Optional[Callable[[], None]] = None,
+        on_miss: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.__on_hit = on_hit
+        self.__on_miss = on_miss
+        self.__tasks: Dict[Any, "asyncio.Future[Any]"] = {}
+
+    def __forget_failed(self, key: Any, task: "asyncio.Future[Any]") -> None:
+        if task.cancelled() or task.exception() is not None:
+            if self.__tasks.get(key) is task:
+                del self.__tasks[key]
+
+    async def get(self, key: Any, compute: Callable[[], Awaitable[R]]) -> R:
+        task = self.__tasks.get(key)
+        if task is None:
+            if self.__on_miss is not None:
+                self.__on_miss()
+            task = asyncio.ensure_future(compute())
+            task.add_done_callback(functools.partial(self.__forget_failed, key))
+            self.__tasks[key] = task
+        elif self.__on_hit is not None:
+            self.__on_hit()
+        # A cancelled caller must not cancel the task shared with the others
+        return await asyncio.shield(task)
+
+
+class AsyncRequestThrottle:
+    """
+    asyncio counterpart of RequestThrottle, waiting for a request slot or a
+    token of the rate limit without blocking the event loop. It is bound to
+    the event loop it is created on.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        requests_per_second: Optional[float] = None,
+        adaptive: bool = False,
+        latency_target: float = 2.0,
+        error_rate_threshold: float = 0.05,
+        window: int = 20,
+        on_limit_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.__in_flight = 0
+        self.__condition = asyncio.Condition()
+        self.__bucket: Optional[TokenBucket] = (
+            TokenBucket(requests_per_second) if requests_per_second else None
+        )
+        self.__adaptive = adaptive
+        self.__limit = AdaptiveLimit(
+            max_in_flight, latency_target, error_rate_threshold, window
+        )
+        self.__on_limit_change = on_limit_change
+        if self.__on_limit_change is not None:
+            self.__on_limit_change(self.__limit.limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """
+        Hold a request slot, yields time in seconds spent waiting for it
+        """
+        started_at = time.monotonic()
+        async with self.__condition:
+            await self.__condition.wait_for(
+                lambda: self.__in_flight < self.__limit.limit
+            )
+            self.__in_flight += 1
+        try:
+            if self.__bucket is not None:
+                delay = self.__bucket.take()
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = self.__bucket.take()
+            yield time.monotonic() - started_at
+        finally:
+            # Released before waiting for the lock so cancellation can't leak it
+            self.__in_flight -= 1
+            async with self.__condition:
+                self.__condition.notify()
+
+    async def record(self, latency: float, status_code: Optional[int]) -> None:
+        """
+        Feed outcome of a request to the adaptive controller
+        """
+        if not self.__adaptive or not self.__limit.record(latency, status_code):
+            return
+        async with self.__condition:
+            self.__condition.notify_all()
+        if self.__on_limit_change is not None:
+            self.__on_limit_change(self.__limit.limit)
+
+
+def cached_response(entry: CachedResponse) -> "httpx.Response":
+    """
+    httpx response of the cached body
+    """
+    return httpx.Response(
+        200,
+        headers=entry.headers,
+        content=entry.body,
+        request=httpx.Request("GET", entry.url),
+    )
+
+
+class AsyncPowerBiReportServerAPI:
+    """
+    asyncio client mirroring the getters of PowerBiReportServerAPI.
+
+    Requests share one httpx connection pool authenticated with NTLM, so
+    hundreds of small detail calls can be in flight from a single thread.
+    The client is bound to the event loop of its first request and must be
+    closed on that loop.
+    """
+
+    def __init__(
+        self,
+        config: PowerBiReportServerAPIConfig,
+        report: Optional[PowerBiReportServerDashboardSourceReport] = None,
+        report_lock: Optional[threading.Lock] = None,
+    ) -> None:
+        if not HAS_HTTPX:
+            raise ImportError(
+                "async_client needs httpx and httpx-ntlm, "
+                "install powerbi_report_server[async]"
+            )
+        self.__config: PowerBiReportServerAPIConfig = config
+        self.__report = report
+        # Shared with the source and other clients updating the same report
+        self.__report_lock = report_lock or threading.Lock()
+        self.__decoder: ModelDecoder = ModelDecoder(
+            validate=self.__config.validate_payloads
+        )
+        self.__endpoints: EndpointRegistry = EndpointRegistry(
+            self.__config.get_base_api_url, PowerBiReportServerAPI.API_ENDPOINTS
+        )
+        self.__circuit_breaker = CircuitBreaker(
+            threshold=self.__config.circuit_breaker_threshold,
+            reset_timeout=self.__config.circuit_breaker_reset_timeout,
+        )
+        self.__tracer = Tracer(self.__config.opentelemetry_spans)
+        self.__response_cache: Optional[ResponseCache] = None
+        if self.__config.response_cache_path:
+            self.__response_cache = ResponseCache(
+                path=self.__config.response_cache_path,
+                max_size=self.__config.response_cache_max_size_mb * 1024 * 1024,
+                ttl=self.__config.response_cache_ttl,
+            )
+        # Created on the event loop of the first request
+        self.__http: Optional["httpx.AsyncClient"] = None
+        self.__throttle: Optional[AsyncRequestThrottle] = None
+        self.__users_lock: Optional[asyncio.Lock] = None
+        self.__user_directory: Optional[UserDirectory] = None
+        self.__users_loaded_at: Optional[float] = None
+
+    def __client(self) -> "httpx.AsyncClient":
+        if self.__http is None:
+            max_in_flight = max(self.__config.async_max_in_flight, 1)
+            self.__http = httpx.AsyncClient(
+                auth=HttpNtlmAuth(
+                    "{}\\{}".format(
+                        self.__config.workstation_name, self.__config.username
+                    ),
+                    self.__config.password,
+                ),
+                limits=httpx.Limits(
+                    max_connections=max_in_flight,
+                    max_keepalive_connections=max_in_flight,
+                ),
+                timeout=httpx.Timeout(
+                    self.__config.scan_timeout, connect=self.__config.connect_timeout
+                ),
+            )
+            self.__throttle = AsyncRequestThrottle(
+                max_in_flight=self.__config.max_in_flight or max_in_flight,
+                requests_per_second=self.__config.requests_per_second,
+                adaptive=self.__config.adaptive_concurrency,
+                latency_target=self.__config.adaptive_latency_target,
+                error_rate_threshold=self.__config.adaptive_error_rate_threshold,
+                window=self.__config.adaptive_window,
+                on_limit_change=self.__report_limit,
+            )
+            self.__users_lock = asyncio.Lock()
+        return self.__http
+
+    async def close(self) -> None:
+        if self.__http is not None:
+            await self.__http.aclose()
+            self.__http = None
+        if self.__response_cache is not None:
+            self.__response_cache.close()
+            self.__response_cache = None
+
+    async def get(
+        self, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> "httpx.Response":
+        """
+        Issue GET request, answered from the response cache when possible
+        like PowerBiReportServerAPI.get
+        """
+        if self.__response_cache is None:
+            return await self.__request(url, params)
+
+        key = ResponseCache.key(url, params)
+        entry = self.__response_cache.lookup(key)
+        listing = (
+            self.__endpoints.endpoint_of(url) in PowerBiReportServerAPI.CATALOG_LISTINGS
+        )
+        if entry is not None and not listing and self.__response_cache.is_fresh(entry):
+            self.__report_response_cache(hit=True, revalidated=False)
+            return cached_response(entry)
+
+        response = await self.__request(
+            url, params, entry.conditional_headers() if entry is not None else None
+        )
+        if response.status_code == 304 and entry is not None:
+            self.__response_cache.touch(key, entry, response.headers)
+            self.__report_response_cache(hit=True, revalidated=True)
+            return cached_response(entry)
+
+        self.__report_response_cache(hit=False, revalidated=False)
+        # Listings without validators could never be served from the cache
+        if response.status_code == 200 and (
+            not listing
+            or any(name in response.headers for name in ResponseCache.VALIDATOR_HEADERS)
+        ):
+            self.__response_cache.store(
+                key, str(response.url), response.headers, response.content
+            )
+        return response
+
+    def __report_response_cache(self, hit: bool, revalidated: bool) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                if hit:
+                    self.__report.report_response_cache_hit(revalidated)
+                else:
+                    self.__report.report_response_cache_miss()
+
+    def __report_limit(self, limit: int) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_max_in_flight_limit(limit)
+
+    def __report_throttled(self, seconds: float) -> None:
+        if self.__report is not None and seconds > 0:
+            with self.__report_lock:
+                self.__report.report_throttled(seconds)
+
+    async def __request(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> "httpx.Response":
+        """
+        Issue GET request, retried with backoff like PowerBiReportServerAPI.get.
+        401 is retried once to negotiate NTLM again.
+        """
+        if not self.__circuit_breaker.allow():
+            if self.__report is not None:
+                with self.__report_lock:
+                    self.__report.report_circuit_breaker_rejection()
+            raise CircuitBreakerOpenError(
+                "Power BI Report Server keeps failing, request to {} rejected".format(
+                    url
+                )
+            )
+
+        settled = False
+        try:
+            http = self.__client()
+            assert self.__throttle is not None
+            endpoint = self.__endpoints.endpoint_of(url)
+            started_at = time.monotonic()
+            renegotiated = False
+            attempt = 0
+            while True:
+                response: Optional["httpx.Response"] = None
+                error: Optional[Exception] = None
+                async with self.__throttle.slot() as throttled:
+                    self.__report_throttled(throttled)
+                    attempt_started_at = time.monotonic()
+                    try:
+                        response = await http.send(
+                            http.build_request(
+                                "GET", url, params=params, headers=headers
+                            ),
+                            stream=stream,
+                        )
+                    except httpx.TransportError as e:
+                        error = e
+                latency = time.monotonic() - attempt_started_at
+                await self.__throttle.record(
+                    latency, response.status_code if response is not None else None
+                )
+                self.__report_attempt(endpoint, url, latency, response, stream)
+
+                if (
+                    response is not None
+                    and response.status_code == 401
+                    and not renegotiated
+                ):
+                    renegotiated = True
+                    LOGGER.info("Renegotiating NTLM for URL={}".format(url))
+                    await response.aclose()
+                    continue
+
+                # Without response the request failed with error
+                retryable = (
+                    response is None
+                    or response.status_code in self.__config.retry_status_codes
+                )
+                if not retryable or attempt >= self.__config.max_retries:
+                    break
+
+                delay = backoff_delay(
+                    self.__config,
+                    attempt,
+                    response.headers.get("Retry-After")
+                    if response is not None
+                    else None,
+                )
+                LOGGER.info(
+                    "Retrying URL={} in {:.2f}s after {}".format(
+                        url, delay, error if response is None else response.status_code
+                    )
+                )
+                if response is not None:
+                    await response.aclose()
+                attempt += 1
+                await asyncio.sleep(delay)
+
+            if self.__report is not None:
+                with self.__report_lock:
+                    self.__report.report_request(
+                        time.monotonic() - started_at, attempt, retryable
+                    )
+            if retryable:
+                self.__circuit_breaker.record_failure()
+            else:
+                self.__circuit_breaker.record_success()
+            settled = True
+        finally:
+            # Unexpected errors must not leave the trial request in flight
+            if not settled:
+                self.__circuit_breaker.release()
+
+        if response is None:
+            raise ConnectionError(
+                "Request to {} failed after {} retries ({})".format(url, attempt, error)
+            ) from error
+        return response
+
+    def __report_attempt(
+        self,
+        endpoint: Optional[str],
+        url: str,
+        latency: float,
+        response: Optional["httpx.Response"],
+        stream: bool,
+    ) -> None:
+        status_code = response.status_code if response is not None else None
+        self.__tracer.record(
+            "pbirs.request",
+            latency,
+            endpoint=endpoint,
+            url=url,
+            status_code=status_code,
+        )
+        if self.__report is not None:
+            # Streamed bodies are counted as they are read
+            size = len(response.content) if response is not None and not stream else 0
+            with self.__report_lock:
+                self.__report.report_endpoint_request(
+                    endpoint, latency, status_code, size
+                )
+
+    def __report_parse(self, endpoint: Optional[str], seconds: float) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_endpoint_parse(endpoint, seconds)
+
+    def __select_params(self, model: Any) -> Dict[str, Any]:
+        """
+        OData $select of fields declared by model
+        """
+        select_fields = getattr(model, "SELECT_FIELDS", ())
+        if not self.__config.field_projection or not select_fields:
+            return {}
+        return {Constant.ODATA_SELECT: ",".join(select_fields)}
+
+    async def fetch_one(self, endpoint: str, model: Type[M], **keys: str) -> M:
+        """
+        Fetch single item of API_ENDPOINTS and parse it to model
+        """
+        url = self.__endpoints.url(endpoint, **keys)
+        LOGGER.debug("Request to URL={}".format(url))
+        response = await self.get(url, params=self.__select_params(model))
+
+        # Check if we got response from PowerBi
+        if response.status_code != 200:
+            message: str = "Failed to fetch {} from power-bi-report-server for".format(
+                model.__name__
+            )
+            LOGGER.warning(message)
+            LOGGER.warning("URL={}, http_status={}".format(url, response.status_code))
+            raise ConnectionError(message)
+
+        started_at = time.perf_counter()
+        item = self.__decoder.decode(model, loads(response.content))
+        self.__report_parse(endpoint, time.perf_counter() - started_at)
+        return item
+
+    async def get_users_policies(self) -> List[SystemPolicies]:
+        """
+        Get user policy by Power Bi Report Server System
+        """
+        return await self.__collect(
+            self.fetch_many(Constant.SYSTEM_POLICIES, SystemPolicies, paged=False)
+        )
+
+    async def get_user_policies(
+        self, user_name: Optional[str]
+    ) -> Optional[SystemPolicies]:
+        """
+        Lookup user policy in the System/Policies user table fetched once per run
+        """
+        if user_name is None:
+            return None
+
+        self.__client()
+        assert self.__users_lock is not None
+        async with self.__users_lock:
+            ttl = self.__config.users_cache_ttl
+            if self.__user_directory is None or (
+                ttl is not None
+                and self.__users_loaded_at is not None
+                and time.monotonic() - self.__users_loaded_at > ttl
+            ):
+                users = await self.get_users_policies()
+                self.__user_directory = UserDirectory(
+                    fetch=lambda: users,
+                    report=self.__report,
+                    report_lock=self.__report_lock,
+                )
+                self.__users_loaded_at = time.monotonic()
+        return self.__user_directory.get(user_name)
+
+    async def get_report(self, report_id: str) -> Optional[Report]:
+        """
+        Fetch the .rdl report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return await self.fetch_one(Constant.REPORT, Report, REPORT_ID=report_id)
+
+    async def get_powerbi_report(self, report_id: str) -> Optional[PowerBiReport]:
+        """
+        Fetch the .pbix report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return await self.fetch_one(
+            Constant.POWERBI_REPORT, PowerBiReport, POWERBI_REPORT_ID=report_id
+        )
+
+    async def get_linked_report(self, report_id: str) -> Optional[LinkedReport]:
+        """
+        Fetch the linked report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return await self.fetch_one(
+            Constant.LINKED_REPORT, LinkedReport, LINKED_REPORT_ID=report_id
+        )
+
+    async def get_mobile_report(self, report_id: str) -> Optional[MobileReport]:
+        """
+        Fetch the mobile report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return await self.fetch_one(
+            Constant.MOBILE_REPORT, MobileReport, MOBILE_REPORT_ID=report_id
+        )
+
+    async def get_dataset(self, dataset_id: str) -> Optional[DataSet]:
+        """
+        Fetch the dataset from PowerBi for the given dataset identifier
+        """
+        if dataset_id is None:
+            return None
+        return await self.fetch_one(Constant.DATASET, DataSet, DATASET_ID=dataset_id)
+
+    async def get_data_source(self, dataset: DataSet) -> Optional[DataSource]:
+        """
+        Fetch the data source from PowerBi for the given dataset
+        """
+        data_sources = await self.get_dataset_data_sources(dataset.Id)
+        if len(data_sources) == 0:
+            LOGGER.info(
+                "datasource is not found for dataset {}({})".format(
+                    dataset.Name, dataset.Id
+                )
+            )
+            return None
+        # Consider only zero index datasource
+        return data_sources[0]
+
+    async def __fetch_page(
+        self, endpoint: str, url: str, params: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[PowerBiReportServerAPI.PageRequest]]:
+        """
+        Fetch one page of OData collection and work out the request of next page
+        """
+        LOGGER.debug("Request to collection URL={} params={}".format(url, params))
+        response = await self.get(url, params=params)
+
+        # Check if we got response from PowerBi
+        if response.status_code != 200:
+            message: str = "Failed to fetch collection from power-bi-report-server for"
+            LOGGER.warning(message)
+            LOGGER.warning("URL={}, http_status={}".format(url, response.status_code))
+            raise ConnectionError(message)
+
+        started_at = time.perf_counter()
+        response_dict = loads(response.content)
+        self.__report_parse(endpoint, time.perf_counter() - started_at)
+        values: List[Dict[str, Any]] = response_dict.get(Constant.VALUE) or []
+        return values, next_page_request(
+            self.__config, url, params, response_dict, len(values)
+        )
+
+    async def __iter_stream(
+        self,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        model: Type[M],
+    ) -> AsyncIterator[M]:
+        """
+        Parse items of OData collection pages while they are downloaded
+        """
+        request: Optional[PowerBiReportServerAPI.PageRequest] = (url, params)
+        while request is not None:
+            url, params = request
+            LOGGER.debug("Stream collection URL={} params={}".format(url, params))
+            response = await self.__request(url, params, stream=True)
+            parser = CollectionParser()
+            try:
+                # Check if we got response from PowerBi
+                if response.status_code != 200:
+                    message = (
+                        "Failed to fetch collection from power-bi-report-server for"
+                    )
+                    LOGGER.warning(message)
+                    LOGGER.warning(
+                        "URL={}, http_status={}".format(url, response.status_code)
+                    )
+                    raise ConnectionError(message)
+                received = 0
+                parse_seconds = 0.0
+                try:
+                    async for chunk in response.aiter_bytes(
+                        self.__config.stream_chunk_size
+                    ):
+                        received += len(chunk)
+                        started_at = time.perf_counter()
+                        items = [
+                            self.__decoder.decode(model, value)
+                            for value in parser.feed(chunk)
+                        ]
+                        parse_seconds += time.perf_counter() - started_at
+                        for item in items:
+                            yield item
+                    started_at = time.perf_counter()
+                    items = [
+                        self.__decoder.decode(model, value) for value in parser.close()
+                    ]
+                    parse_seconds += time.perf_counter() - started_at
+                    for item in items:
+                        yield item
+                except (httpx.HTTPError, ValueError) as e:
+                    raise ConnectionError(
+                        "Failed to read collection from {} ({})".format(url, e)
+                    ) from e
+                finally:
+                    if self.__report is not None:
+                        with self.__report_lock:
+                            self.__report.report_endpoint_bytes(endpoint, received)
+                    self.__report_parse(endpoint, parse_seconds)
+            finally:
+                await response.aclose()
+            request = next_page_request(
+                self.__config, url, params, parser.members, parser.count
+            )
+
+    async def download_content(self, report_type: str, report_id: str) -> str:
+        """
+        Stream the definition of report to a temporary file and return its
+        path, the caller removes the file
+        """
+        endpoint, key = PowerBiReportServerAPI.CONTENT_ENDPOINTS[report_type]
+        url = self.__endpoints.url(endpoint, **{key: report_id})
+        LOGGER.debug("Download content URL={}".format(url))
+        response = await self.__request(url, stream=True)
+        try:
+            # Check if we got response from PowerBi
+            if response.status_code != 200:
+                message = (
+                    "Failed to download report content from power-bi-report-server for"
+                )
+                LOGGER.warning(message)
+                LOGGER.warning(
+                    "URL={}, http_status={}".format(url, response.status_code)
+                )
+                raise ConnectionError(message)
+            fd, path = tempfile.mkstemp(
+                prefix="pbirs-",
+                suffix=".{}".format(
+                    PowerBiReportServerAPI.CONTENT_FORMATS[report_type]
+                ),
+                dir=self.__config.content_directory,
+            )
+            received = 0
+            try:
+                # Writes of local files are short enough not to block the loop
+                with os.fdopen(fd, "wb") as content_file:
+                    async for chunk in response.aiter_bytes(
+                        self.__config.stream_chunk_size
+                    ):
+                        received += len(chunk)
+                        content_file.write(chunk)
+            except httpx.HTTPError as e:
+                os.unlink(path)
+                raise ConnectionError(
+                    "Failed to download content from {} ({})".format(url, e)
+                ) from e
+            except BaseException:
+                os.unlink(path)
+                raise
+            finally:
+                if self.__report is not None:
+                    with self.__report_lock:
+                        self.__report.report_endpoint_bytes(endpoint, received)
+        finally:
+            await response.aclose()
+        return path
+
+    async def fetch_many(
+        self,
+        endpoint: str,
+        model: Type[M],
+        params: Optional[Dict[str, Any]] = None,
+        paged: bool = True,
+        **keys: str,
+    ) -> AsyncIterator[M]:
+        """
+        Iterate over OData collection of API_ENDPOINTS page by page,
+        the next page is downloaded while the current one is consumed
+        """
+        collection_endpoint = self.__endpoints.url(endpoint, **keys)
+        params = {**self.__select_params(model), **(params or {})}
+        if paged and self.__config.page_size > 0:
+            params.update(
+                {
+                    Constant.ODATA_TOP: self.__config.page_size,
+                    Constant.ODATA_SKIP: 0,
+                    # Stable order is needed to page with $skip
+                    Constant.ODATA_ORDER_BY: "Id",
+                }
+            )
+
+        if self.__config.stream_collections:
+            async for item in self.__iter_stream(
+                endpoint, collection_endpoint, params, model
+            ):
+                yield item
+            return
+
+        page: Optional["asyncio.Future[Any]"] = asyncio.ensure_future(
+            self.__fetch_page(endpoint, collection_endpoint, params)
+        )
+        try:
+            while page is not None:
+                values, next_request = await page
+                page = (
+                    asyncio.ensure_future(self.__fetch_page(endpoint, *next_request))
+                    if next_request is not None
+                    else None
+                )
+                # Raw items are released as soon as they are decoded
+                values.reverse()
+                parse_seconds = 0.0
+                while values:
+                    started_at = time.perf_counter()
+                    item = self.__decoder.decode(model, values.pop())
+                    parse_seconds += time.perf_counter() - started_at
+                    yield item
+                self.__report_parse(endpoint, parse_seconds)
+        finally:
+            if page is not None:
+                page.cancel()
+
+    async def __collect(self, items: AsyncIterator[Any]) -> List[Any]:
+        return [item async for item in items]
+
+    async def get_all_reports(
+        self, modified_since: Optional[Dict[str, datetime]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Stream all reports from PowerBiReportServer.
+
+        modified_since limits each report type to items modified after the
+        given datetime.
+        """
+        modified_since = modified_since or {}
+        for report_type, model in PowerBiReportServerAPI.REPORT_TYPES_MAPPING.items():
+            params: Dict[str, Any] = {}
+            if modified_since.get(report_type) is not None:
+                params[Constant.ODATA_FILTER] = "ModifiedDate gt {}".format(
+                    to_odata_datetime(modified_since[report_type])
+                )
+            try:
+                async for item in self.fetch_many(report_type, model, params):
+                    yield item
+            except ConnectionError as e:
+                message = "Failed to fetch {} ({})".format(report_type, e)
+                LOGGER.warning(message)
+                if self.__report is not None:
+                    with self.__report_lock:
+                        self.__report.report_failure(report_type, message)
+
+    async def __list_folder(
+        self, folder_id: str, folder_path: str
+    ) -> List[CatalogItem]:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_folder_listed()
+        try:
+            return await self.__collect(
+                self.fetch_many(
+                    Constant.FOLDER_CATALOG_ITEMS, CatalogItem, FOLDER_ID=folder_id
+                )
+            )
+        except ConnectionError as e:
+            message = "Failed to list folder {} ({})".format(folder_path, e)
+            LOGGER.warning(message)
+            if self.__report is not None:
+                with self.__report_lock:
+                    self.__report.report_failure(folder_path, message)
+            return []
+
+    async def walk_catalog(
+        self, is_pruned: Callable[[str], bool]
+    ) -> AsyncIterator[CatalogItem]:
+        """
+        Walk the folder tree breadth first from the root folder.
+
+        Items other than folders are yielded. All folders of a level are listed
+        concurrently, the subtree of a folder whose path is_pruned is never
+        listed.
+        """
+        folders: List[Tuple[str, str]] = [(ROOT_FOLDER_KEY, "/")]
+        while folders:
+            listings = [
+                asyncio.ensure_future(self.__list_folder(*folder)) for folder in folders
+            ]
+            subfolders: List[Tuple[str, str]] = []
+            try:
+                for listing in listings:
+                    for item in await listing:
+                        if item.Type != Constant.FOLDER_TYPE:
+                            yield item
+                        elif is_pruned(item.Path):
+                            LOGGER.debug("Pruned folder {}".format(item.Path))
+                            if self.__report is not None:
+                                with self.__report_lock:
+                                    self.__report.report_folder_pruned()
+                        else:
+                            subfolders.append((item.Id, item.Path))
+            finally:
+                for listing in listings:
+                    listing.cancel()
+            folders = subfolders
+
+    def __to_data_sources(self, data_sources: Iterable[DataSource]) -> List[DataSource]:
+        result: List[DataSource] = []
+        for data_source in data_sources:
+            # Check if datasource is relational as per our relation mapping
+            platform = self.__config.get_dataset_platform(data_source.get_type())
+            data_source.MetaData = MetaData(is_relational=platform is not None)
+            result.append(data_source)
+        return result
+
+    async def get_dataset_data_sources(self, dataset_id: str) -> List[DataSource]:
+        """
+        Fetch the data sources of the given dataset
+        """
+        return self.__to_data_sources(
+            await self.__collect(
+                self.fetch_many(
+                    Constant.DATASET_DATASOURCES,
+                    DataSource,
+                    paged=False,
+                    DATASET_ID=dataset_id,
+                )
+            )
+        )
+
+    async def get_report_datasets(self, report_id: str) -> List[DataSet]:
+        """
+        Fetch the shared datasets used by the given .rdl report
+        """
+        return await self.__collect(
+            self.fetch_many(
+                Constant.REPORT_SHARED_DATASETS,
+                DataSet,
+                paged=False,
+                REPORT_ID=report_id,
+            )
+        )
+
+    async def get_report_data_sources(
+        self, report_type: str, report_id: str
+    ) -> List[DataSource]:
+        """
+        Fetch the data sources embedded in the given report
+        """
+        if report_type == Constant.REPORTS:
+            collection = self.fetch_many(
+                Constant.REPORT_DATASOURCES,
+                DataSource,
+                paged=False,
+                REPORT_ID=report_id,
+            )
+        elif report_type == Constant.POWERBI_REPORTS:
+            collection = self.fetch_many(
+                Constant.POWERBI_REPORT_DATASOURCES,
+                DataSource,
+                paged=False,
+                POWERBI_REPORT_ID=report_id,
+            )
+        else:
+            return []
+        return self.__to_data_sources(await self.__collect(collection))
+
+
+class AsyncIngestionDriver:
+    """
+    Fetch and enrich reports with AsyncPowerBiReportServerAPI for the
+    synchronous get_workunits of the source.
+
+    Up to async_max_in_flight reports are enriched at once, reports keep
+    the order in which the server returned them.
+    """
+
+    REPORT_TYPES_BY_MODEL: Dict[Any, str] = {
+        model: report_type
+        for report_type, model in PowerBiReportServerAPI.REPORT_TYPES_MAPPING.items()
+    }
+
+    def __init__(
+        self,
+        config: PowerBiDashboardSourceConfig,
+        report: PowerBiReportServerDashboardSourceReport,
+        definition_cache: Optional[DefinitionCache] = None,
+        parse_executor: Optional[Executor] = None,
+        report_lock: Optional[threading.Lock] = None,
+    ) -> None:
+        self.__config = config
+        self.__report = report
+        # Shared with the source and the clients of the other servers
+        self.__report_lock = report_lock or threading.Lock()
+        self.__definition_cache = definition_cache
+        # Report definitions are parsed on the default executor of the loop
+        # unless a process pool is given
+        self.__parse_executor = parse_executor
+        self.client = AsyncPowerBiReportServerAPI(config, report, self.__report_lock)
+        self.__tracer = Tracer(config.opentelemetry_spans)
+        # Data sources by dataset Id, fetched once whatever the fan-in
+        self.__dataset_data_sources = AsyncMemoCache(
+            on_hit=functools.partial(self.__locked, report.report_lineage_cache_hit),
+            on_miss=functools.partial(self.__locked, report.report_lineage_cache_miss),
+        )
+
+    def __locked(self, update: Callable[[], None]) -> None:
+        with self.__report_lock:
+            update()
+
+    async def __get_lineage(self, report: CatalogRecord) -> ReportLineage:
+        lineage = ReportLineage()
+        if report.HasSharedDataSets:
+            lineage.datasets = await self.client.get_report_datasets(report.Id)
+            data_sources = await asyncio.gather(
+                *(
+                    self.__dataset_data_sources.get(
+                        dataset.Id,
+                        functools.partial(
+                            self.client.get_dataset_data_sources, dataset.Id
+                        ),
+                    )
+                    for dataset in lineage.datasets
+                )
+            )
+            lineage.dataset_data_sources = {
+                dataset.Id: dataset_data_sources
+                for dataset, dataset_data_sources in zip(lineage.datasets, data_sources)
+            }
+        if report.HasDataSources:
+            lineage.data_sources = await self.client.get_report_data_sources(
+                report.ReportType, report.Id
+            )
+        return lineage
+
+    async def __get_definition(
+        self, report: CatalogRecord
+    ) -> Optional[ReportDefinition]:
+        """
+        Metadata of report definition, downloaded only if the report was
+        modified since it was extracted
+        """
+        content_format = PowerBiReportServerAPI.CONTENT_FORMATS.get(report.ReportType)
+        if content_format is None:
+            return None
+        server_url = self.__config.get_base_api_url
+        modified_date = (
+            to_utc(report.ModifiedDate) if report.ModifiedDate is not None else None
+        )
+        if self.__definition_cache is not None and modified_date is not None:
+            definition = self.__definition_cache.lookup(
+                server_url, report.Id, modified_date
+            )
+            if definition is not None:
+                with self.__report_lock:
+                    self.__report.report_definition_cache_hit()
+                return definition
+
+        path = await self.client.download_content(report.ReportType, report.Id)
+        with self.__report_lock:
+            self.__report.report_content_download()
+        started_at = time.perf_counter()
+        try:
+            # Parsed off the event loop so other requests go on meanwhile
+            definition = await asyncio.get_running_loop().run_in_executor(
+                self.__parse_executor, extract_definition, content_format, path
+            )
+        finally:
+            os.unlink(path)
+            with self.__report_lock:
+                self.__report.report_stage(
+                    Constant.STAGE_PARSE, time.perf_counter() - started_at
+                )
+        if self.__definition_cache is not None and modified_date is not None:
+            self.__definition_cache.store(
+                server_url, report.Id, modified_date, definition
+            )
+        return definition
+
+    async def __enrich_report(self, report: CatalogRecord) -> CatalogRecord:
+        """
+        Fetch details of report which are not part of the report collection
+        """
+        started_at = time.perf_counter()
+        try:
+            with self.__tracer.span("pbirs.enrich", report_id=report.Id):
+                report.UserInfo = await self.client.get_user_policies(report.CreatedBy)
+                if self.__config.extract_lineage:
+                    report.Lineage = await self.__get_lineage(report)
+                if self.__config.extract_charts:
+                    report.Definition = await self.__get_definition(report)
+            with self.__report_lock:
+                self.__report.report_scanned()
+        except Exception as e:
+            message = "Error ({}) occurred while loading dashboard {}(id={}).".format(
+                e, report.Name, report.Id
+            )
+            LOGGER.exception(message)
+            report.EnrichmentFailed = True
+            with self.__report_lock:
+                self.__report.report_warning(report.Id, message)
+        finally:
+            with self.__report_lock:
+                self.__report.report_stage(
+                    Constant.STAGE_ENRICH, time.perf_counter() - started_at
+                )
+        return report
+
+    async def __walk_records(
+        self, modified_since: Dict[str, datetime]
+    ) -> AsyncIterator[CatalogRecord]:
+        async for item in self.client.walk_catalog(self.__config.is_folder_pruned):
+            report_type = PowerBiReportServerAPI.CATALOG_ITEM_TYPES.get(item.Type)
+            if report_type is None:
+                continue
+            # Items of the folder listing can't be filtered by the server
+            watermark = modified_since.get(report_type)
+            if (
+                watermark is not None
+                and item.ModifiedDate is not None
+                and to_utc(item.ModifiedDate) <= to_utc(watermark)
+            ):
+                continue
+            yield CatalogRecord.from_folder_item(report_type, item)
+
+    async def __collection_records(
+        self, modified_since: Dict[str, datetime]
+    ) -> AsyncIterator[CatalogRecord]:
+        async for item in self.client.get_all_reports(modified_since):
+            yield CatalogRecord.from_item(self.REPORT_TYPES_BY_MODEL[type(item)], item)
+
+    async def __records(
+        self, modified_since: Optional[Dict[str, datetime]]
+    ) -> AsyncIterator[CatalogRecord]:
+        records = (
+            self.__walk_records(modified_since or {})
+            if self.__config.folder_traversal
+            else self.__collection_records(modified_since or {})
+        )
+        started_at = time.perf_counter()
+        async for record in records:
+            with self.__report_lock:
+                self.__report.report_stage(
+                    Constant.STAGE_FETCH, time.perf_counter() - started_at
+                )
+            # Reports of other shards or denied are dropped before any follow-up call
+            if not self.__config.is_in_shard(record.Folder):
+                pass
+            elif not self.__config.report_pattern.allowed(record.Path):
+                with self.__report_lock:
+                    self.__report.report_dropped(record.Path)
+            else:
+                yield record
+            started_at = time.perf_counter()
+
+    async def __iter_reports(
+        self, modified_since: Optional[Dict[str, datetime]]
+    ) -> AsyncIterator[CatalogRecord]:
+        try:
+            async for report in ordered_map_async(
+                self.__enrich_report,
+                self.__records(modified_since),
+                max(self.__config.async_max_in_flight, 1),
+            ):
+                yield report
+        finally:
+            await self.client.close()
+
+    def iter_reports(
+        self, modified_since: Optional[Dict[str, datetime]] = None
+    ) -> Iterator[CatalogRecord]:
+        """
+        Enriched reports, fetched on a private event loop
+        """
+        return iter_sync(self.__iter_reports(modified_since))
@@ -0,0 +1,247 @@
+#########################################################
+#
+# Benchmarks of the Power BI Report Server source
+#
+# python -m powerbi_report_server.benchmark decode --items 10000
+# python -m powerbi_report_server.benchmark ingest --items 10000 --latency 0.01
+#
+#########################################################
+import argparse
+import dataclasses
+import json
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from datahub.ingestion.api.common import PipelineContext
+
+from .decoding import ModelDecoder, loads
+from .mock_server import MockReportServer, MockServerConfig
+from .powerbi_report_server import (
+    LinkedReport,
+    MobileReport,
+    PowerBiReport,
+    PowerBiReportServerDashboardSource,
+    Report,
+)
+
+
+def catalog_item(index: int) -> Dict[str, Any]:
+    return {
+        "Id": "ee56dc21-248a-4138-a446-ee5ab1fc938{}".format(index),
+        "Name": "Report {}".format(index),
+        "Description": None,
+        "Path": "/Finance/Reports/Report {}".format(index),
+        "Type": "Report",
+        "Hidden": False,
+        "Size": 1024 * index,
+        "ModifiedBy": "DOMAIN\\user{}".format(index % 50),
+        "ModifiedDate": "2022-06-01T10:{:02d}:00.1234567Z".format(index % 60),
+        "CreatedBy": "DOMAIN\\user{}".format(index % 50),
+        "CreatedDate": "2021-01-01T00:00:00Z",
+        "ParentFolderId": "47495172-89ab-455f-a446-fffd3cf239ca",
+        "ContentType": None,
+        "Content": "",
+        "IsFavorite": False,
+        "HasDataSources": True,
+        "HasSharedDataSets": False,
+        "HasParameters": False,
+    }
+
+
+def payload(items: int) -> bytes:
+    return json.dumps(
+        {"value": [catalog_item(index) for index in range(items)]}
+    ).encode()
+
+
+def measure(
+    name: str, items: int, repeat: int, decode: Callable[[], List[Any]]
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        decoded = decode()
+        best = min(best, time.perf_counter() - started_at)
+        assert len(decoded) == items
+    rate = items / best
+    print("{:<32} {:>12,.0f} items/s".format(name, rate))
+    return rate
+
+
+def decode_benchmark(items: int, repeat: int) -> None:
+    content = payload(items)
+    print("Decoding {} items ({:,} bytes)".format(items, len(content)))
+    for model in (Report, PowerBiReport, LinkedReport, MobileReport):
+        baseline = measure(
+            "{} parse_obj".format(model.__name__),
+            items,
+            repeat,
+            lambda: [model.parse_obj(value) for value in json.loads(content)["value"]],
+        )
+        validating = ModelDecoder(validate=True)
+        measure(
+            "{} validated".format(model.__name__),
+            items,
+            repeat,
+            lambda: validating.decode_many(model, loads(content)["value"]),
+        )
+        trusted = ModelDecoder(validate=False)
+        fast = measure(
+            "{} trusted".format(model.__name__),
+            items,
+            repeat,
+            lambda: trusted.decode_many(model, loads(content)["value"]),
+        )
+        print("{:<32} {:>12.1f}x".format("speedup", fast / baseline))
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of the process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def ingest_benchmark(
+    server_config: MockServerConfig, source_config: Dict[str, Any], repeat: int
+) -> None:
+    """
+    Run get_workunits of the source against the mock server.
+
+    The server runs in this process, so peak RSS includes its catalog.
+    """
+    with MockReportServer(server_config) as server:
+        catalog = server.catalog
+        items = sum(
+            len(catalog.collections[collection])
+            for collection in (
+                "Reports",
+                "PowerBiReports",
+                "MobileReports",
+                "LinkedReports",
+            )
+        )
+        print(
+            "Ingesting {} reports from http://{}/ (latency {}s, error rate {})".format(
+                items,
+                server.workstation_name,
+                server_config.latency,
+                server_config.error_rate,
+            )
+        )
+        for run in range(repeat):
+            config = {
+                "username": "{}\\benchmark".format(server_config.ntlm_domain),
+                "password": "benchmark",
+                "workstation_name": server.workstation_name,
+                "report_virtual_directory_name": "Reports",
+                "report_server_virtual_directory_name": "ReportServer",
+                "dataset_type_mapping": {"SQL": "mssql"},
+                **source_config,
+            }
+            before = dataclasses.replace(server.stats)
+            source = PowerBiReportServerDashboardSource.create(
+                config, PipelineContext(run_id="benchmark-{}".format(run))
+            )
+            started_at = time.perf_counter()
+            try:
+                work_units = sum(1 for _ in source.get_workunits())
+            finally:
+                source.close()
+            elapsed = time.perf_counter() - started_at
+
+            print("Run {}".format(run + 1))
+            print(
+                "{:<32} {:>12,}".format(
+                    "requests", server.stats.requests - before.requests
+                )
+            )
+            print(
+                "{:<32} {:>12,}".format(
+                    "NTLM handshakes", server.stats.handshakes - before.handshakes
+                )
+            )
+            print(
+                "{:<32} {:>12,}".format(
+                    "injected errors", server.stats.errors - before.errors
+                )
+            )
+            print("{:<32} {:>12.2f} s".format("wall time", elapsed))
+            print("{:<32} {:>12,.0f} items/s".format("reports", items / elapsed))
+            print(
+                "{:<32} {:>12,.0f} work units/s".format(
+                    "work units", work_units / elapsed
+                )
+            )
+            print("{:<32} {:>12,.1f} MiB".format("peak RSS", peak_rss() / 2 ** 20))
+            print("{:<32} {:>12,}".format("failures", len(source.report.failures)))
+            for stage, stats in source.report.stage_timings.items():
+                print("{:<32} {:>12.2f} s".format("stage " + stage, stats.seconds))
+            for endpoint, stats in sorted(source.report.endpoint_stats.items()):
+                print(
+                    "{:<32} {:>8,} requests p50 {:.3f}s p99 {:.3f}s".format(
+                        endpoint,
+                        stats.requests,
+                        stats.latency.quantile(0.5) or 0.0,
+                        stats.latency.quantile(0.99) or 0.0,
+                    )
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Power BI Report Server source benchmarks"
+    )
+    parser.add_argument(
+        "benchmark", nargs="?", choices=("decode", "ingest"), default="decode"
+    )
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=None)
+    # Mock server of the ingest benchmark
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--datasets", type=int, default=20)
+    parser.add_argument("--folders", type=int, default=10)
+    parser.add_argument("--no-ntlm", dest="ntlm", action="store_false")
+    parser.add_argument(
+        "--config",
+        action="append",
+        default=[],
+        metavar="NAME=JSON",
+        help="Source config option, e.g. --config max_workers=8",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark == "decode":
+        decode_benchmark(args.items, args.repeat or 5)
+        return
+
+    # Catalog of --items reports split like a typical server
+    server_config = MockServerConfig(
+        reports=args.items * 45 // 100,
+        powerbi_reports=args.items * 45 // 100,
+        mobile_reports=args.items * 5 // 100,
+        linked_reports=args.items * 5 // 100,
+        folders=args.folders,
+        users=args.users,
+        datasets=args.datasets,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        ntlm=args.ntlm,
+    )
+    source_config: Dict[str, Any] = {}
+    for option in args.config:
+        name, _, value = option.partition("=")
+        source_config[name] = json.loads(value)
+    ingest_benchmark(server_config, source_config, args.repeat or 1)
+
+
+if __name__ == "__main__":
+    main()
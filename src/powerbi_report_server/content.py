@@ -0,0 +1,366 @@
+#########################################################
+#
+# Metadata of report definitions downloaded from the server
+#
+#########################################################
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+# Formats of report definitions
+RDL = "rdl"
+PBIX = "pbix"
+
+# Report items of RDL bound to data, other items like textboxes, lines or
+# rectangles are layout only
+RDL_DATA_REGIONS = frozenset(
+    (
+        "Chart",
+        "CustomReportItem",
+        "DataBar",
+        "GaugePanel",
+        "Indicator",
+        "List",
+        "Map",
+        "Matrix",
+        "Sparkline",
+        "Table",
+        "Tablix",
+    )
+)
+
+# Elements of RDL kept until they end, everything else is released
+RDL_KEPT = RDL_DATA_REGIONS | {"DataSource", "ReportParameter"}
+
+# Field references of RDL expressions, e.g. =Sum(Fields!Amount.Value)
+RDL_FIELD = re.compile(r"\bFields!(\w+)\.")
+
+# Visual types of PBIX layouts which don't show data
+PBIX_DECORATIONS = frozenset(
+    (
+        "actionButton",
+        "basicShape",
+        "bookmarkNavigator",
+        "image",
+        "pageNavigator",
+        "shape",
+        "textbox",
+    )
+)
+
+# Members of the PBIX archive holding the report layout and live connections
+PBIX_LAYOUT = "Report/Layout"
+PBIX_CONNECTIONS = "Connections"
+
+
+@dataclass(frozen=True)
+class Visual:
+    """
+    Data visual of a report, i.e. a data region of RDL or a visual of PBIX
+    """
+
+    # Unique within the report
+    name: str
+    type: str
+    title: Optional[str] = None
+    # Display name of the page of PBIX visuals
+    page: Optional[str] = None
+    # Dataset of RDL data regions
+    dataset: Optional[str] = None
+    # Fields shown, Fields!<name> of RDL and <table>.<column> of PBIX
+    fields: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class DataSourceReference:
+    """
+    Data source declared by a report definition
+    """
+
+    name: str
+    # Path of the shared data source or the model of a live connection
+    reference: Optional[str] = None
+    # Data extension, e.g. SQL, or connection type of PBIX
+    provider: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    """
+    Compact metadata extracted from a report definition
+    """
+
+    visuals: Tuple[Visual, ...] = ()
+    data_sources: Tuple[DataSourceReference, ...] = ()
+    # Names of report parameters
+    parameters: Tuple[str, ...] = ()
+
+    def as_obj(self) -> Dict[str, Any]:
+        return {
+            "visuals": [visual.__dict__ for visual in self.visuals],
+            "data_sources": [source.__dict__ for source in self.data_sources],
+            "parameters": list(self.parameters),
+        }
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> "ReportDefinition":
+        return cls(
+            visuals=tuple(
+                Visual(**dict(visual, fields=tuple(visual.get("fields", ()))))
+                for visual in obj.get("visuals", [])
+            ),
+            data_sources=tuple(
+                DataSourceReference(**source) for source in obj.get("data_sources", [])
+            ),
+            parameters=tuple(obj.get("parameters", [])),
+        )
+
+
+def local_name(tag: str) -> str:
+    # RDL namespace changes with the schema version, e.g. {.../2016/01/reportdefinition}
+    return tag.rpartition("}")[2]
+
+
+def child_text(element: ET.Element, name: str) -> Optional[str]:
+    for child in element:
+        if local_name(child.tag) == name:
+            return child.text
+    return None
+
+
+def unique(values: List[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(values))
+
+
+def extract_rdl(path: str) -> ReportDefinition:
+    """
+    Data regions, data sources and parameters of a paginated report.
+
+    The file is parsed incrementally and elements are released once they are
+    past, so embedded images and large queries are never held in memory.
+    """
+    visuals: List[Visual] = []
+    data_sources: List[DataSourceReference] = []
+    parameters: List[str] = []
+    # Kept elements being parsed, data regions may be nested in cells of others
+    open_elements = 0
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        name = local_name(element.tag)
+        if event == "start":
+            if name in RDL_KEPT:
+                open_elements += 1
+            continue
+        if name in RDL_KEPT:
+            open_elements -= 1
+        elif open_elements > 0:
+            continue
+
+        if name in RDL_DATA_REGIONS:
+            visuals.append(
+                Visual(
+                    name=element.get("Name") or "",
+                    type=name,
+                    title=rdl_chart_title(element) if name == "Chart" else None,
+                    dataset=child_text(element, "DataSetName"),
+                    fields=unique(RDL_FIELD.findall(" ".join(element.itertext()))),
+                )
+            )
+        elif name == "DataSource":
+            provider = None
+            for child in element:
+                if local_name(child.tag) == "ConnectionProperties":
+                    provider = child_text(child, "DataProvider")
+            data_sources.append(
+                DataSourceReference(
+                    name=element.get("Name") or "",
+                    reference=child_text(element, "DataSourceReference"),
+                    provider=provider,
+                )
+            )
+        elif name == "ReportParameter":
+            parameters.append(element.get("Name") or "")
+        element.clear()
+    return ReportDefinition(
+        visuals=tuple(visuals),
+        data_sources=tuple(data_sources),
+        parameters=tuple(parameters),
+    )
+
+
+def rdl_chart_title(chart: ET.Element) -> Optional[str]:
+    for element in chart.iter():
+        if local_name(element.tag) == "ChartTitle":
+            caption = child_text(element, "Caption")
+            if caption:
+                return caption
+    return None
+
+
+def extract_pbix(path: str) -> ReportDefinition:
+    """
+    Visuals of the pages and live connections of a Power BI report.
+
+    Only the layout and connections members are read from the archive, the
+    data model is left compressed on disk.
+    """
+    with zipfile.ZipFile(path) as archive:
+        members = set(archive.namelist())
+        layout_content = archive.read(PBIX_LAYOUT) if PBIX_LAYOUT in members else None
+        connections_content = (
+            archive.read(PBIX_CONNECTIONS) if PBIX_CONNECTIONS in members else None
+        )
+
+    visuals: List[Visual] = []
+    if layout_content is None:
+        # Reports saved in the enhanced report format have no layout member
+        LOGGER.debug("No {} in {}".format(PBIX_LAYOUT, path))
+    else:
+        layout = json.loads(layout_content.decode("utf-16-le").lstrip("\ufeff"))
+        for section in layout.get("sections", []):
+            page = section.get("displayName") or section.get("name")
+            for container in section.get("visualContainers", []):
+                visual = pbix_visual(container, page)
+                if visual is not None:
+                    visuals.append(visual)
+
+    data_sources: List[DataSourceReference] = []
+    if connections_content is not None:
+        connections = json.loads(connections_content.decode("utf-8-sig"))
+        for connection in connections.get("Connections", []):
+            data_sources.append(
+                DataSourceReference(
+                    name=connection.get("Name") or "",
+                    reference=connection.get("PbiModelDatabaseName"),
+                    provider=connection.get("ConnectionType"),
+                )
+            )
+    # Parameters of Power BI reports belong to the data model
+    return ReportDefinition(visuals=tuple(visuals), data_sources=tuple(data_sources))
+
+
+def pbix_visual(container: Dict[str, Any], page: Optional[str]) -> Optional[Visual]:
+    config = json.loads(container.get("config") or "{}")
+    single_visual = config.get("singleVisual")
+    if not single_visual:
+        # Groups of visuals
+        return None
+    visual_type = single_visual.get("visualType") or ""
+    if visual_type in PBIX_DECORATIONS:
+        return None
+    # Fields of each role of the visual, e.g. Category or Values
+    fields = [
+        projection["queryRef"]
+        for projections in single_visual.get("projections", {}).values()
+        for projection in projections
+        if "queryRef" in projection
+    ]
+    return Visual(
+        name=config.get("name") or "",
+        type=visual_type,
+        title=pbix_visual_title(single_visual),
+        page=page,
+        fields=unique(fields),
+    )
+
+
+def pbix_visual_title(single_visual: Dict[str, Any]) -> Optional[str]:
+    for title in single_visual.get("vcObjects", {}).get("title", []):
+        literal = (
+            title.get("properties", {})
+            .get("text", {})
+            .get("expr", {})
+            .get("Literal", {})
+            .get("Value")
+        )
+        # Literals are quoted like 'Sales by region'
+        if isinstance(literal, str) and len(literal) >= 2 and literal[0] == "'":
+            return literal[1:-1].replace("''", "'")
+    return None
+
+
+EXTRACTORS: Dict[str, Callable[[str], ReportDefinition]] = {
+    RDL: extract_rdl,
+    PBIX: extract_pbix,
+}
+
+
+def extract_definition(content_format: str, path: str) -> ReportDefinition:
+    """
+    Metadata of the report definition downloaded to path.
+
+    Only the path is passed in and a compact result is returned, so the
+    function can run in a worker process without copying the content.
+    """
+    return EXTRACTORS[content_format](path)
+
+
+class DefinitionCache:
+    """
+    SQLite file keeping the metadata extracted from each report definition.
+
+    Entries are keyed by server and report Id and hold the ModifiedDate of
+    the report they were extracted from, so a report is only downloaded
+    again once it is modified.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS definitions ("
+                " server TEXT NOT NULL,"
+                " report_id TEXT NOT NULL,"
+                " modified_date TEXT NOT NULL,"
+                " definition TEXT NOT NULL,"
+                " PRIMARY KEY (server, report_id))"
+            )
+
+    def lookup(
+        self, server: str, report_id: str, modified_date: datetime
+    ) -> Optional[ReportDefinition]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT definition FROM definitions"
+                " WHERE server = ? AND report_id = ? AND modified_date = ?",
+                (server, report_id, modified_date.isoformat()),
+            ).fetchone()
+        if row is None:
+            return None
+        return ReportDefinition.from_obj(json.loads(row[0]))
+
+    def store(
+        self,
+        server: str,
+        report_id: str,
+        modified_date: datetime,
+        definition: ReportDefinition,
+    ) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO definitions"
+                " (server, report_id, modified_date, definition) VALUES (?, ?, ?, ?)",
+                (
+                    server,
+                    report_id,
+                    modified_date.isoformat(),
+                    json.dumps(definition.as_obj()),
+                ),
+            )
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
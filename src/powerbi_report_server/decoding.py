@@ -0,0 +1,303 @@
+#########################################################
+#
+# Decoding of Power BI Report Server payloads to models
+#
+#########################################################
+import codecs
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover
+    HAS_ORJSON = False
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def loads(content: bytes) -> Any:
+    """
+    Decode JSON response body, with orjson when it is installed
+    """
+    if HAS_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def parse_datetime(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    # fromisoformat of older Pythons doesn't accept Z suffix
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # Fractions with more than 6 digits, e.g. 2022-01-01T00:00:00.1234567Z
+        head, _, tail = value.partition(".")
+        digits = "".join(c for c in tail if c.isdigit())
+        offset = tail[len(digits) :]
+        return datetime.fromisoformat("{}.{}{}".format(head, digits[:6], offset))
+
+
+class ModelDecoder:
+    """
+    Decode payload dicts to pydantic models.
+
+    With validation the model is built by parse_obj. Trusted payloads skip
+    validation: a per-model plan converts only datetimes and nested models,
+    then the model is built by construct(). Models with custom validators
+    are always validated so their derived fields are set.
+    """
+
+    def __init__(self, validate: bool = True) -> None:
+        self.validate = validate
+        self.__plans: Dict[type, _Plan] = {}
+
+    @staticmethod
+    def __has_validators(model: Type[BaseModel]) -> bool:
+        return bool(
+            model.__validators__
+            or model.__pre_root_validators__
+            or model.__post_root_validators__
+        )
+
+    def __plan(self, model: Type[BaseModel]) -> "_Plan":
+        plan = self.__plans.get(model)
+        if plan is not None:
+            return plan
+
+        plan = _Plan(defaults={}, plain=[], converted=[])
+        for name, model_field in model.__fields__.items():
+            plan.defaults[name] = model_field.get_default()
+            field_type = model_field.type_
+            if field_type is datetime and model_field.shape == SHAPE_SINGLETON:
+                plan.converted.append((name, parse_datetime))
+            elif isinstance(field_type, type) and issubclass(field_type, BaseModel):
+                if model_field.shape == SHAPE_SINGLETON:
+                    plan.converted.append((name, _nested(self, field_type)))
+                elif model_field.shape == SHAPE_LIST:
+                    plan.converted.append((name, _nested_list(self, field_type)))
+                else:
+                    plan.plain.append(name)
+            else:
+                plan.plain.append(name)
+        self.__plans[model] = plan
+        return plan
+
+    def decode(self, model: Type[M], value: Dict[str, Any]) -> M:
+        if self.validate or self.__has_validators(model):
+            return model.parse_obj(value)
+
+        # Same as model.construct() without its per field default lookup
+        plan = self.__plan(model)
+        fields = dict(plan.defaults)
+        fields_set = set()
+        for name in plan.plain:
+            if name in value:
+                fields[name] = value[name]
+                fields_set.add(name)
+        for name, converter in plan.converted:
+            if name in value:
+                fields[name] = converter(value[name])
+                fields_set.add(name)
+        instance = model.__new__(model)
+        object.__setattr__(instance, "__dict__", fields)
+        object.__setattr__(instance, "__fields_set__", fields_set)
+        return instance
+
+    def decode_many(self, model: Type[M], values: List[Dict[str, Any]]) -> List[M]:
+        return [self.decode(model, value) for value in values]
+
+
+@dataclass
+class _Plan:
+    # Field defaults, the fields passed as-is and the converted ones
+    defaults: Dict[str, Any]
+    plain: List[str]
+    converted: List[Tuple[str, Callable[[Any], Any]]]
+
+
+def _nested(decoder: ModelDecoder, model: Type[BaseModel]) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        return decoder.decode(model, value) if isinstance(value, dict) else value
+
+    return convert
+
+
+def _nested_list(decoder: ModelDecoder, model: Type[BaseModel]) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        if not isinstance(value, list):
+            return value
+        return [
+            decoder.decode(model, item) if isinstance(item, dict) else item
+            for item in value
+        ]
+
+    return convert
+
+
+class CollectionParser:
+    """
+    Incremental parser of OData collection responses.
+
+    Chunks of the body are fed as they are received and every element of the
+    value array is returned as soon as it is complete, so the whole body is
+    never held in memory. Other members of the response object, e.g.
+    @odata.nextLink, are kept in members.
+    """
+
+    VALUE = "value"
+
+    # Parser states
+    START = 0
+    KEY = 1
+    COLON = 2
+    MEMBER = 3
+    AFTER_MEMBER = 4
+    ARRAY = 5
+    AFTER_ELEMENT = 6
+    END = 7
+
+    WHITESPACE = " \t\n\r"
+    NUMBER_CHARACTERS = "0123456789.eE+-"
+
+    def __init__(self) -> None:
+        self.members: Dict[str, Any] = {}
+        # Number of value elements parsed so far
+        self.count = 0
+        self.__json = json.JSONDecoder()
+        self.__text = codecs.getincrementaldecoder("utf-8")()
+        self.__buffer = ""
+        self.__position = 0
+        self.__state = CollectionParser.START
+        self.__key: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """
+        Parse next chunk of the body, returns the elements it completed
+        """
+        self.__buffer += self.__text.decode(chunk)
+        return self.__parse(final=False)
+
+    def close(self) -> List[Any]:
+        """
+        End of the body, returns the last elements
+        """
+        self.__buffer += self.__text.decode(b"", final=True)
+        values = self.__parse(final=True)
+        if self.__state != CollectionParser.END:
+            raise ValueError("Truncated OData collection response")
+        return values
+
+    def __decode(self, final: bool) -> Tuple[bool, Any]:
+        try:
+            value, end = self.__json.raw_decode(self.__buffer, self.__position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            # Incomplete until proven otherwise by the end of the body
+            return False, None
+        # A number at the end of the buffer might go on in the next chunk, also
+        # when raw_decode stopped at a fraction or exponent it can't parse yet,
+        # e.g. 3. or 1e
+        if not final and not isinstance(value, (dict, list, str)):
+            tail = end
+            while (
+                tail < len(self.__buffer)
+                and self.__buffer[tail] in CollectionParser.NUMBER_CHARACTERS
+            ):
+                tail += 1
+            if tail == len(self.__buffer):
+                return False, None
+        self.__position = end
+        return True, value
+
+    def __expect(self, character: str, expected: str, state: int) -> None:
+        if character not in expected:
+            raise ValueError(
+                "Unexpected {!r} in OData collection response".format(character)
+            )
+        self.__position += 1
+        self.__state = state
+
+    def __parse(self, final: bool) -> List[Any]:
+        values: List[Any] = []
+        buffer = self.__buffer
+        while True:
+            while (
+                self.__position < len(buffer)
+                and buffer[self.__position] in CollectionParser.WHITESPACE
+            ):
+                self.__position += 1
+            if self.__position == len(buffer):
+                break
+
+            character = buffer[self.__position]
+            state = self.__state
+            if state == CollectionParser.START:
+                self.__expect(character, "{", CollectionParser.KEY)
+            elif state == CollectionParser.KEY:
+                if character == "}":
+                    self.__expect(character, "}", CollectionParser.END)
+                    continue
+                if character != '"':
+                    self.__expect(character, '"', state)
+                complete, key = self.__decode(final)
+                if not complete:
+                    break
+                self.__key = key
+                self.__state = CollectionParser.COLON
+            elif state == CollectionParser.COLON:
+                self.__expect(character, ":", CollectionParser.MEMBER)
+            elif state == CollectionParser.MEMBER:
+                if self.__key == CollectionParser.VALUE and character == "[":
+                    self.__expect(character, "[", CollectionParser.ARRAY)
+                    continue
+                complete, value = self.__decode(final)
+                if not complete:
+                    break
+                self.members[self.__key or ""] = value
+                self.__state = CollectionParser.AFTER_MEMBER
+            elif state == CollectionParser.AFTER_MEMBER:
+                self.__expect(
+                    character,
+                    ",}",
+                    CollectionParser.KEY if character == "," else CollectionParser.END,
+                )
+            elif state == CollectionParser.ARRAY:
+                if character == "]":
+                    self.__expect(character, "]", CollectionParser.AFTER_MEMBER)
+                    continue
+                complete, value = self.__decode(final)
+                if not complete:
+                    break
+                values.append(value)
+                self.count += 1
+                self.__state = CollectionParser.AFTER_ELEMENT
+            elif state == CollectionParser.AFTER_ELEMENT:
+                self.__expect(
+                    character,
+                    ",]",
+                    CollectionParser.ARRAY
+                    if character == ","
+                    else CollectionParser.AFTER_MEMBER,
+                )
+            else:
+                raise ValueError("Unexpected data after OData collection response")
+
+        # Only the unparsed tail is kept
+        self.__buffer = buffer[self.__position :]
+        self.__position = 0
+        return values
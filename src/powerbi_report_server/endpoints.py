@@ -0,0 +1,121 @@
+#########################################################
+#
+# URLs of Power BI Report Server REST API endpoints
+#
+#########################################################
+import re
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import quote
+
+BASE_URL_FIELD = "PBIRS_BASE_URL"
+
+GUID = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+
+
+def odata_key(value: str, name: Optional[str] = None) -> str:
+    """
+    OData key literal, e.g. Reports(<key>).
+
+    GUIDs are left as is, other values are quoted strings with single
+    quotes doubled. With name, the key is an alternate key like Path='/'.
+    """
+    if name is None and GUID.fullmatch(value):
+        literal = value
+    else:
+        literal = "'{}'".format(value.replace("'", "''"))
+    if name is not None:
+        literal = "{}={}".format(name, literal)
+    return quote(literal, safe="'=/")
+
+
+class ODataKey(str):
+    """
+    Key literal already quoted by odata_key
+    """
+
+
+# Key of the root folder
+ROOT_FOLDER_KEY = ODataKey(odata_key("/", name="Path"))
+
+
+class EndpointRegistry:
+    """
+    API endpoint templates bound to the base URL of one server.
+
+    Templates are parsed once into literal parts and key fields, the base URL
+    is part of the literals. Building a URL joins the parts with the keys
+    quoted by odata_key.
+    """
+
+    def __init__(self, base_url: str, templates: Dict[str, str]) -> None:
+        base_url = base_url.rstrip("/")
+        self.__builders: Dict[str, Callable[..., str]] = {
+            endpoint: self.compile(template, base_url)
+            for endpoint, template in templates.items()
+        }
+        # One alternative per template, the group name is its index
+        self.__endpoints: List[str] = list(templates)
+        self.__pattern: Pattern[str] = re.compile(
+            "|".join(
+                "(?P<e{}>{})".format(index, self.pattern(templates[endpoint], base_url))
+                for index, endpoint in enumerate(self.__endpoints)
+            )
+        )
+
+    @staticmethod
+    def pattern(template: str, base_url: str) -> str:
+        """
+        Regular expression of URLs built from template, without query
+        """
+        pattern = ""
+        for text, field, _, _ in Formatter().parse(template):
+            pattern += re.escape(text)
+            if field == BASE_URL_FIELD:
+                pattern += re.escape(base_url)
+            elif field:
+                pattern += ".+?"
+        return pattern
+
+    @staticmethod
+    def compile(template: str, base_url: str) -> Callable[..., str]:
+        parts: List[Tuple[str, Optional[str]]] = []
+        literal = ""
+        for text, field, _, _ in Formatter().parse(template):
+            literal += text
+            if field == BASE_URL_FIELD:
+                literal += base_url
+            elif field:
+                parts.append((literal, field))
+                literal = ""
+        if literal or not parts:
+            parts.append((literal, None))
+
+        if len(parts) == 1 and parts[0][1] is None:
+            url = parts[0][0]
+            return lambda: url
+
+        def build(**keys: str) -> str:
+            url: List[str] = []
+            for text, field in parts:
+                url.append(text)
+                if field is not None:
+                    key = keys[field]
+                    url.append(key if isinstance(key, ODataKey) else odata_key(key))
+            return "".join(url)
+
+        return build
+
+    def url(self, endpoint: str, **keys: str) -> str:
+        return self.__builders[endpoint](**keys)
+
+    def endpoint_of(self, url: str) -> Optional[str]:
+        """
+        Endpoint whose template url was built from, e.g. for an @odata.nextLink
+        """
+        match = self.__pattern.fullmatch(url.split("?", 1)[0])
+        if match is None or match.lastgroup is None:
+            return None
+        return self.__endpoints[int(match.lastgroup[1:])]
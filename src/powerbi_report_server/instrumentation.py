@@ -0,0 +1,300 @@
+#########################################################
+#
+# Request and stage instrumentation of the ingestion
+#
+#########################################################
+import bisect
+import contextlib
+import logging
+import time
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+try:
+    from opentelemetry import trace
+
+    HAS_OPENTELEMETRY = True
+except ImportError:  # pragma: no cover
+    HAS_OPENTELEMETRY = False
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations over fixed log-spaced buckets.
+
+    Bucket bounds grow by sqrt(2) from 1ms to about 4 minutes, quantiles
+    are interpolated within their bucket so memory stays constant.
+    """
+
+    BOUNDS: ClassVar[Tuple[float, ...]] = tuple(
+        0.001 * 2 ** (index / 2) for index in range(37)
+    )
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        # Last bucket counts durations above all bounds
+        self.counts: List[int] = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.BOUNDS[index - 1] if index > 0 else 0.0
+                upper = (
+                    self.BOUNDS[index] if index < len(self.BOUNDS) else self.BOUNDS[-1]
+                )
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.BOUNDS[-1]
+
+    def buckets(self) -> Iterator[Tuple[float, int]]:
+        """
+        Cumulative counts of durations up to each bound, as in Prometheus
+        """
+        cumulative = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+class EndpointStats:
+    """
+    Requests of one API_ENDPOINTS template
+    """
+
+    __slots__ = ("requests", "bytes_received", "status_codes", "latency", "parse")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.bytes_received = 0
+        # Status code of each attempt, "error" for transport errors
+        self.status_codes: Counter = Counter()
+        self.latency = LatencyHistogram()
+        # JSON parsing and model decoding of the responses
+        self.parse = StageStats()
+
+    def as_obj(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes_received": self.bytes_received,
+            "latency_p50_seconds": round_seconds(self.latency.quantile(0.5)),
+            "latency_p95_seconds": round_seconds(self.latency.quantile(0.95)),
+            "latency_p99_seconds": round_seconds(self.latency.quantile(0.99)),
+            "status_codes": {str(k): v for k, v in self.status_codes.items()},
+            "parse_seconds": round_seconds(self.parse.seconds),
+        }
+
+
+class StageStats:
+    """
+    Time spent in one stage, summed over threads
+    """
+
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.seconds += seconds
+
+    def as_obj(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "seconds": round_seconds(self.seconds)}
+
+
+def round_seconds(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds, 6) if seconds is not None else None
+
+
+def timed_iter(items: Iterable[T], record: Callable[[float], None]) -> Iterator[T]:
+    """
+    Iterate over items, recording the time taken to produce each of them
+    """
+    iterator = iter(items)
+    while True:
+        started_at = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            record(time.perf_counter() - started_at)
+        yield item
+
+
+class Tracer:
+    """
+    OpenTelemetry spans, no-op unless enabled
+    """
+
+    def __init__(self, enabled: bool) -> None:
+        self.__tracer: Any = None
+        if enabled:
+            if not HAS_OPENTELEMETRY:
+                raise ImportError(
+                    "opentelemetry_spans needs opentelemetry-api, "
+                    "install powerbi_report_server[opentelemetry]"
+                )
+            self.__tracer = trace.get_tracer("powerbi_report_server")
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        if self.__tracer is None:
+            yield None
+            return
+        with self.__tracer.start_as_current_span(name) as span:
+            for key, value in attributes.items():
+                if value is not None:
+                    span.set_attribute(key, value)
+            yield span
+
+    def record(self, name: str, seconds: float, **attributes: Any) -> None:
+        """
+        Span of an operation which ended now and took seconds
+        """
+        if self.__tracer is None:
+            return
+        ended_at = time.time_ns()
+        span = self.__tracer.start_span(
+            name,
+            start_time=ended_at - int(seconds * 1e9),
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        )
+        span.end(end_time=ended_at)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(
+    endpoints: Dict[str, EndpointStats], stages: Dict[str, StageStats]
+) -> str:
+    """
+    Metrics in Prometheus text exposition format
+    """
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help: str) -> None:
+        lines.append("# HELP {} {}".format(name, help))
+        lines.append("# TYPE {} {}".format(name, kind))
+
+    metric(
+        "pbirs_requests_total",
+        "counter",
+        "Requests to Power BI Report Server by endpoint and status code.",
+    )
+    for endpoint, stats in sorted(endpoints.items()):
+        for status, count in sorted(stats.status_codes.items(), key=str):
+            lines.append(
+                'pbirs_requests_total{{endpoint="{}",status="{}"}} {}'.format(
+                    escape_label(endpoint), status, count
+                )
+            )
+
+    metric(
+        "pbirs_response_bytes_total",
+        "counter",
+        "Bytes of response bodies received by endpoint.",
+    )
+    for endpoint, stats in sorted(endpoints.items()):
+        lines.append(
+            'pbirs_response_bytes_total{{endpoint="{}"}} {}'.format(
+                escape_label(endpoint), stats.bytes_received
+            )
+        )
+
+    metric(
+        "pbirs_request_duration_seconds",
+        "histogram",
+        "Duration of requests by endpoint.",
+    )
+    for endpoint, stats in sorted(endpoints.items()):
+        label = escape_label(endpoint)
+        for bound, count in stats.latency.buckets():
+            lines.append(
+                'pbirs_request_duration_seconds_bucket{{endpoint="{}",le="{:g}"}} {}'.format(
+                    label, bound, count
+                )
+            )
+        lines.append(
+            'pbirs_request_duration_seconds_bucket{{endpoint="{}",le="+Inf"}} {}'.format(
+                label, stats.latency.count
+            )
+        )
+        lines.append(
+            'pbirs_request_duration_seconds_sum{{endpoint="{}"}} {}'.format(
+                label, stats.latency.sum
+            )
+        )
+        lines.append(
+            'pbirs_request_duration_seconds_count{{endpoint="{}"}} {}'.format(
+                label, stats.latency.count
+            )
+        )
+
+    metric(
+        "pbirs_parse_seconds_total",
+        "counter",
+        "Time spent parsing responses by endpoint.",
+    )
+    for endpoint, stats in sorted(endpoints.items()):
+        lines.append(
+            'pbirs_parse_seconds_total{{endpoint="{}"}} {}'.format(
+                escape_label(endpoint), stats.parse.seconds
+            )
+        )
+
+    metric(
+        "pbirs_stage_seconds_total",
+        "counter",
+        "Time spent in each ingestion stage, summed over threads.",
+    )
+    for stage, stage_stats in sorted(stages.items()):
+        lines.append(
+            'pbirs_stage_seconds_total{{stage="{}"}} {}'.format(
+                escape_label(stage), stage_stats.seconds
+            )
+        )
+
+    metric(
+        "pbirs_stage_calls_total",
+        "counter",
+        "Calls of each ingestion stage.",
+    )
+    for stage, stage_stats in sorted(stages.items()):
+        lines.append(
+            'pbirs_stage_calls_total{{stage="{}"}} {}'.format(
+                escape_label(stage), stage_stats.calls
+            )
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,731 @@
+#########################################################
+#
+# Local stand-in for the Power BI Report Server REST API
+#
+# python -m powerbi_report_server.mock_server --port 8080 --reports 10000
+#
+#########################################################
+import argparse
+import base64
+import io
+import json
+import logging
+import random
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+API_PATH = re.compile(r"^/(?P<directory>[^/]+)/api/v2\.0/(?P<resource>.*)$")
+RESOURCE = re.compile(
+    r"^(?P<collection>\w+)(?:\((?P<key>[^)]*)\))?"
+    r"(?:/(?P<navigation>\w+)(?P<raw>/\$value)?)?$"
+)
+FILTER = re.compile(r"^ModifiedDate gt (?P<value>\S+)$")
+
+# Collection of each catalog item type
+REPORT_COLLECTIONS = {
+    "Report": "Reports",
+    "PowerBIReport": "PowerBiReports",
+    "MobileReport": "MobileReports",
+    "LinkedReport": "LinkedReports",
+}
+
+# Report definitions served as content of paginated and Power BI reports
+RDL_REPORT = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<Report xmlns="http://schemas.microsoft.com/sqlserver/reporting/2016/01/'
+    'reportdefinition">'
+    '<DataSources><DataSource Name="DataSource1">'
+    "<DataSourceReference>/Data Sources/Sales</DataSourceReference>"
+    "</DataSource></DataSources>"
+    '<DataSets><DataSet Name="DataSet1"><Query>'
+    "<DataSourceName>DataSource1</DataSourceName>"
+    "<CommandText>SELECT Region, Amount FROM Sales</CommandText></Query>"
+    "</DataSet></DataSets>"
+    '<ReportSections><ReportSection><Body><ReportItems><Textbox Name="Title"/>'
+    "{items}</ReportItems></Body></ReportSection></ReportSections>"
+    '<ReportParameters><ReportParameter Name="Year"><DataType>Integer</DataType>'
+    "</ReportParameter></ReportParameters></Report>"
+)
+RDL_CHART = (
+    '<Chart Name="Chart{number}"><ChartTitles><ChartTitle Name="Default">'
+    "<Caption>Chart {number} of report {index}</Caption></ChartTitle></ChartTitles>"
+    "<ChartData><ChartSeriesCollection><ChartSeries><ChartDataPoints>"
+    "<ChartDataPoint><ChartDataPointValues><Y>=Sum(Fields!Amount.Value)</Y>"
+    "</ChartDataPointValues></ChartDataPoint></ChartDataPoints></ChartSeries>"
+    "</ChartSeriesCollection></ChartData><DataSetName>DataSet1</DataSetName></Chart>"
+)
+RDL_TABLIX = (
+    '<Tablix Name="Tablix{number}"><TablixBody><TablixCells>'
+    '<Textbox Name="Region{number}"><Value>=Fields!Region.Value</Value></Textbox>'
+    '<Textbox Name="Amount{number}"><Value>=Fields!Amount.Value</Value></Textbox>'
+    "</TablixCells></TablixBody><DataSetName>DataSet1</DataSetName></Tablix>"
+)
+PBIX_CONNECTIONS = {
+    "Version": 1,
+    "Connections": [
+        {
+            "Name": "EntityDataSource",
+            "ConnectionType": "analysisServicesDatabaseLive",
+            "PbiModelDatabaseName": "Sales",
+        }
+    ],
+}
+
+NTLM_SIGNATURE = b"NTLMSSP\x00"
+NTLM_NEGOTIATE = 1
+NTLM_AUTHENTICATE = 3
+# Unicode, NTLM, always sign, extended session security, target info,
+# version, 128 and 56 bit encryption and key exchange
+NTLM_CHALLENGE_FLAGS = 0xE2898215
+
+
+def ntlm_message_type(token: bytes) -> Optional[int]:
+    if len(token) < 12 or not token.startswith(NTLM_SIGNATURE):
+        return None
+    return struct.unpack("<I", token[8:12])[0]
+
+
+def ntlm_challenge(domain: str, computer: str) -> bytes:
+    """
+    NTLM CHALLENGE_MESSAGE with a random server challenge
+    """
+    target_name = domain.encode("utf-16-le")
+    target_info = b"".join(
+        struct.pack("<HH", av_id, len(value)) + value
+        for av_id, value in (
+            (2, domain.encode("utf-16-le")),
+            (1, computer.encode("utf-16-le")),
+            (0, b""),
+        )
+    )
+    header_size = 56
+    return b"".join(
+        [
+            NTLM_SIGNATURE,
+            struct.pack("<I", 2),
+            struct.pack("<HHI", len(target_name), len(target_name), header_size),
+            struct.pack("<I", NTLM_CHALLENGE_FLAGS),
+            random.getrandbits(64).to_bytes(8, "little"),
+            bytes(8),
+            struct.pack(
+                "<HHI",
+                len(target_info),
+                len(target_info),
+                header_size + len(target_name),
+            ),
+            # Windows 10, NTLM revision 15
+            struct.pack("<BBHxxxB", 10, 0, 19041, 15),
+            target_name,
+            target_info,
+        ]
+    )
+
+
+def guid(kind: int, index: int) -> str:
+    return "{:08x}-0000-4000-8000-{:012x}".format(kind, index)
+
+
+def odata_datetime(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+@dataclass
+class MockServerConfig:
+    """
+    Size and behaviour of the mock server
+    """
+
+    # Catalog size
+    reports: int = 1000
+    powerbi_reports: int = 1000
+    mobile_reports: int = 100
+    linked_reports: int = 100
+    folders: int = 10
+    users: int = 50
+    datasets: int = 20
+    # Data sources embedded in each report and dataset
+    data_sources: int = 1
+    # Data visuals in the definition of each paginated and Power BI report
+    visuals: int = 3
+    # Seconds added to every response, plus up to latency_jitter more
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    # Share of requests answered with one of error_status_codes
+    error_rate: float = 0.0
+    error_status_codes: Tuple[int, ...] = (503,)
+    retry_after: Optional[int] = None
+    # Largest page served to requests without $top, longer collections are
+    # paged with @odata.nextLink
+    max_page_size: int = 0
+    # Require NTLM handshake once per connection
+    ntlm: bool = True
+    ntlm_domain: str = "MOCK"
+    seed: int = 0
+    # ModifiedDate of the first item, each next one is a minute later
+    modified_from: datetime = field(
+        default_factory=lambda: datetime(2022, 1, 1, tzinfo=timezone.utc)
+    )
+
+
+class MockCatalog:
+    """
+    Deterministic catalog of the mock server, built once in memory
+    """
+
+    def __init__(self, config: MockServerConfig) -> None:
+        self.config = config
+        self.users = [
+            "{}\\user{}".format(config.ntlm_domain, index)
+            for index in range(max(config.users, 1))
+        ]
+        self.folders: List[Dict[str, Any]] = [
+            self.__catalog_item(
+                guid(0xF, index), "Folder {}".format(index), "/", "Folder", index
+            )
+            for index in range(config.folders)
+        ]
+        self.datasets: List[Dict[str, Any]] = [
+            dict(
+                self.__catalog_item(
+                    guid(0xD, index),
+                    "Dataset {}".format(index),
+                    "/Datasets/",
+                    "DataSet",
+                    index,
+                ),
+                HasParameters=False,
+                QueryExecutionTimeOut=0,
+            )
+            for index in range(config.datasets)
+        ]
+        self.collections: Dict[str, List[Dict[str, Any]]] = {"Datasets": self.datasets}
+        # Items of each folder path
+        self.children: Dict[str, List[Dict[str, Any]]] = {"/": list(self.folders)}
+        self.by_id: Dict[str, Dict[str, Any]] = {
+            item["Id"]: item for item in self.folders + self.datasets
+        }
+
+        counts = {
+            "Report": config.reports,
+            "PowerBIReport": config.powerbi_reports,
+            "MobileReport": config.mobile_reports,
+            "LinkedReport": config.linked_reports,
+        }
+        for kind, (item_type, collection) in enumerate(REPORT_COLLECTIONS.items()):
+            items = [
+                self.__report(kind + 1, item_type, index)
+                for index in range(counts[item_type])
+            ]
+            self.collections[collection] = items
+            for item in items:
+                self.by_id[item["Id"]] = item
+                parent = item["Path"].rsplit("/", 1)[0] or "/"
+                self.children.setdefault(parent, []).append(item)
+
+    def __catalog_item(
+        self, item_id: str, name: str, folder: str, item_type: str, index: int
+    ) -> Dict[str, Any]:
+        user = self.users[index % len(self.users)]
+        return {
+            "Id": item_id,
+            "Name": name,
+            "Description": None,
+            "Path": folder + name,
+            "Type": item_type,
+            "Hidden": False,
+            "Size": 1024 + index,
+            "ModifiedBy": user,
+            "ModifiedDate": odata_datetime(
+                self.config.modified_from + timedelta(minutes=index)
+            ),
+            "CreatedBy": user,
+            "CreatedDate": odata_datetime(self.config.modified_from),
+            "ParentFolderId": None,
+            "ContentType": None,
+            "Content": "",
+            "IsFavorite": False,
+        }
+
+    def __report(self, kind: int, item_type: str, index: int) -> Dict[str, Any]:
+        folder = self.folders[index % len(self.folders)] if self.folders else None
+        item = self.__catalog_item(
+            guid(kind, index),
+            "{} {}".format(item_type, index),
+            folder["Path"] + "/" if folder is not None else "/",
+            item_type,
+            index,
+        )
+        if folder is not None:
+            item["ParentFolderId"] = folder["Id"]
+        if item_type == "Report":
+            item["HasDataSources"] = True
+            item["HasSharedDataSets"] = bool(self.datasets) and index % 2 == 0
+            item["HasParameters"] = False
+        elif item_type == "PowerBIReport":
+            item["HasDataSources"] = True
+        return item
+
+    def data_sources(self, owner: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Data sources embedded in owner, a report or a dataset
+        """
+        index = int(owner["Id"].rsplit("-", 1)[1], 16)
+        sources = []
+        for number in range(self.config.data_sources):
+            source = self.__catalog_item(
+                "{:08x}{}".format(0xDA000000 + number, owner["Id"][8:]),
+                "DataSource {}".format(number),
+                owner["Path"] + "/",
+                "DataSource",
+                index,
+            )
+            source.update(
+                IsEnabled=True,
+                DataModelDataSource=None,
+                DataSourceSubType=None,
+                DataSourceType="SQL",
+                IsOriginalConnectionStringExpressionBased=False,
+                IsConnectionStringOverridden=False,
+                CredentialsByUser=None,
+                CredentialsInServer=None,
+                IsReference=False,
+                ConnectionString="Data Source=sql{};Initial Catalog=db{}".format(
+                    index % 5, (index + number) % 20
+                ),
+            )
+            sources.append(source)
+        return sources
+
+    def shared_datasets(self, report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not report.get("HasSharedDataSets"):
+            return []
+        index = int(report["Id"].rsplit("-", 1)[1], 16)
+        return [self.datasets[index % len(self.datasets)]]
+
+    def content(self, report: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Definition of report, RDL of paginated reports and PBIX of Power BI ones
+        """
+        index = int(report["Id"].rsplit("-", 1)[1], 16)
+        if report["Type"] == "Report":
+            items = "".join(
+                (
+                    RDL_CHART.format(number=number, index=index)
+                    if number % 2 == 0
+                    else RDL_TABLIX.format(number=number)
+                )
+                for number in range(self.config.visuals)
+            )
+            return RDL_REPORT.format(items=items).encode("utf-8")
+        if report["Type"] == "PowerBIReport":
+            containers = []
+            for number in range(self.config.visuals):
+                title = {
+                    "Literal": {
+                        "Value": "'Visual {} of report {}'".format(number, index)
+                    }
+                }
+                config = {
+                    "name": "{:020x}".format(number),
+                    "singleVisual": {
+                        "visualType": "barChart",
+                        "projections": {
+                            "Category": [{"queryRef": "Sales.Region"}],
+                            "Y": [{"queryRef": "Sum(Sales.Amount)"}],
+                        },
+                        "vcObjects": {
+                            "title": [{"properties": {"text": {"expr": title}}}]
+                        },
+                    },
+                }
+                containers.append({"config": json.dumps(config)})
+            layout = {
+                "sections": [
+                    {
+                        "name": "ReportSection",
+                        "displayName": "Page 1",
+                        "visualContainers": containers,
+                    }
+                ]
+            }
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as pbix:
+                pbix.writestr("Version", "1.28".encode("utf-16-le"))
+                pbix.writestr("Report/Layout", json.dumps(layout).encode("utf-16-le"))
+                pbix.writestr("Connections", json.dumps(PBIX_CONNECTIONS))
+                # Data model, left alone by the connector
+                pbix.writestr("DataModel", bytes(64 * 1024))
+            return archive.getvalue()
+        return None
+
+    def policies(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "GroupUserName": user,
+                "Roles": [{"Name": "Browser", "Description": "May view reports"}],
+            }
+            for user in self.users
+        ]
+
+
+@dataclass
+class MockServerStats:
+    requests: int = 0
+    # NTLM negotiation round trips
+    handshakes: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    by_resource: Counter = field(default_factory=Counter)
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, NTLM authenticates a connection rather than a request
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, with Nagle and delayed ACK each
+    # response with a body would wait ~40ms for the ACK of the headers
+    disable_nagle_algorithm = True
+    server: "MockReportServer"
+
+    authenticated = False
+
+    def log_message(self, format: str, *args: Any) -> None:
+        LOGGER.debug(format, *args)
+
+    def do_GET(self) -> None:
+        server = self.server
+        with server.lock:
+            server.stats.requests += 1
+            error = server.random.random() < server.config.error_rate
+
+        if server.config.ntlm and not self.__negotiate():
+            return
+
+        if server.config.latency or server.config.latency_jitter:
+            time.sleep(
+                server.config.latency
+                + server.random.random() * server.config.latency_jitter
+            )
+
+        if error:
+            with server.lock:
+                server.stats.errors += 1
+            status = server.random.choice(server.config.error_status_codes)
+            headers = {}
+            if server.config.retry_after is not None:
+                headers["Retry-After"] = str(server.config.retry_after)
+            self.__send(status, {"error": {"message": "Injected error"}}, headers)
+            return
+
+        url = urlsplit(self.path)
+        match = API_PATH.match(re.sub("/+", "/", url.path))
+        if match is None:
+            self.__send(404, {"error": {"message": "Not found"}})
+            return
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        resource = unquote(match.group("resource"))
+        with server.lock:
+            server.stats.by_resource[re.sub(r"\([^)]*\)", "()", resource)] += 1
+        try:
+            status, body = server.resolve(resource, query)
+        except ValueError as e:
+            status, body = 400, {"error": {"message": str(e)}}
+        self.__send(status, body, base_url=url.path, query=query)
+
+    def __negotiate(self) -> bool:
+        """
+        Answer the NTLM handshake, True once the connection is authenticated.
+
+        A NEGOTIATE_MESSAGE restarts the handshake on an authenticated
+        connection, as IIS does.
+        """
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        message_type = None
+        if scheme in ("NTLM", "Negotiate"):
+            try:
+                message_type = ntlm_message_type(base64.b64decode(token))
+            except ValueError:
+                pass
+
+        if message_type == NTLM_AUTHENTICATE:
+            self.authenticated = True
+            return True
+        if message_type is None and self.authenticated:
+            return True
+
+        if message_type == NTLM_NEGOTIATE:
+            with self.server.lock:
+                self.server.stats.handshakes += 1
+            challenge = ntlm_challenge(self.server.config.ntlm_domain, "MOCKSERVER")
+            header = "{} {}".format(scheme, base64.b64encode(challenge).decode())
+        else:
+            header = "NTLM"
+        self.__send(
+            401, {"error": {"message": "Unauthorized"}}, {"WWW-Authenticate": header}
+        )
+        return False
+
+    def __send(
+        self,
+        status: int,
+        body: Any,
+        headers: Optional[Dict[str, str]] = None,
+        base_url: str = "",
+        query: Optional[Dict[str, str]] = None,
+    ) -> None:
+        page_size = self.server.config.max_page_size
+        if (
+            status == 200
+            and page_size > 0
+            and isinstance(body, dict)
+            and "$top" not in (query or {})
+            and isinstance(body.get("value"), list)
+            and len(body["value"]) > page_size
+        ):
+            # Server driven paging continues after the served items
+            query = dict(query or {})
+            skip = int(query.get("$skip", 0))
+            query["$skip"] = str(skip + page_size)
+            body = {
+                "value": body["value"][:page_size],
+                "@odata.nextLink": "http://{}{}?{}".format(
+                    self.headers.get("Host"), base_url, urlencode(query)
+                ),
+            }
+
+        # Raw content like report definitions is sent as is
+        raw = isinstance(body, bytes)
+        content = body if raw else json.dumps(body).encode("utf-8")
+        etag = '"{:08x}"'.format(zlib.crc32(content))
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, content = 304, b""
+
+        self.send_response(status)
+        self.send_header(
+            "Content-Type",
+            (
+                "application/octet-stream"
+                if raw
+                else "application/json; odata.metadata=minimal"
+            ),
+        )
+        self.send_header("Content-Length", str(len(content)))
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        with self.server.lock:
+            self.server.stats.bytes_sent += len(content)
+
+
+class MockReportServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering the REST API v2.0 from a MockCatalog.
+
+    Supports $top, $skip, $select and "ModifiedDate gt" $filter on
+    collections, injected latency and errors and a simulated NTLM handshake
+    which accepts any credentials.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        config: Optional[MockServerConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or MockServerConfig()
+        self.catalog = MockCatalog(self.config)
+        self.stats = MockServerStats()
+        self.lock = threading.Lock()
+        self.random = random.Random(self.config.seed)
+        self.__thread: Optional[threading.Thread] = None
+        super().__init__((host, port), MockRequestHandler)
+
+    @property
+    def workstation_name(self) -> str:
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("ascii")
+        return "{}:{}".format(host, port)
+
+    def start(self) -> "MockReportServer":
+        self.__thread = threading.Thread(
+            target=self.serve_forever, name="pbirs-mock-server", daemon=True
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self) -> "MockReportServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    @staticmethod
+    def parse_key(key: str) -> str:
+        # Alternate keys like Path='/' are looked up by value
+        value = key.partition("=")[2] if key.startswith("Path=") else key
+        if value.startswith("'") and value.endswith("'"):
+            value = value[1:-1].replace("''", "'")
+        return value
+
+    def resolve(self, resource: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        catalog = self.catalog
+        if resource == "System/Policies":
+            return 200, {"value": self.query(catalog.policies(), query)}
+
+        match = RESOURCE.match(resource)
+        if match is None:
+            return 404, {"error": {"message": "Not found"}}
+        collection, key, navigation, raw = match.group(
+            "collection", "key", "navigation", "raw"
+        )
+        if raw is not None and navigation != "Content":
+            return 404, {"error": {"message": "Not found"}}
+
+        if key is None:
+            if navigation is not None:
+                return 404, {"error": {"message": "Not found"}}
+            if collection == "DataSources":
+                items = [
+                    source
+                    for report in catalog.collections["Reports"]
+                    for source in catalog.data_sources(report)
+                ]
+            elif collection in catalog.collections:
+                items = catalog.collections[collection]
+            else:
+                return 404, {"error": {"message": "Not found"}}
+            return 200, {"value": self.query(items, query)}
+
+        value = self.parse_key(key)
+        if collection == "Folders":
+            path = value if key.startswith("Path=") else None
+            if path is None:
+                folder = catalog.by_id.get(value)
+                path = folder["Path"] if folder is not None else None
+            if path is None:
+                return 404, {"error": {"message": "Folder not found"}}
+            if navigation != "CatalogItems":
+                return 404, {"error": {"message": "Not found"}}
+            return 200, {"value": self.query(catalog.children.get(path, []), query)}
+
+        item = catalog.by_id.get(value)
+        if item is None or (
+            collection not in catalog.collections and collection != "CatalogItems"
+        ):
+            return 404, {"error": {"message": "Item not found"}}
+        if navigation is None:
+            return 200, self.select(item, query.get("$select"))
+        if navigation == "DataSources":
+            return 200, {"value": self.query(catalog.data_sources(item), query)}
+        if navigation == "SharedDataSets":
+            return 200, {"value": self.query(catalog.shared_datasets(item), query)}
+        if navigation == "Content" and raw is not None:
+            content = catalog.content(item)
+            if content is not None:
+                return 200, content
+        return 404, {"error": {"message": "Not found"}}
+
+    @staticmethod
+    def select(item: Dict[str, Any], select: Optional[str]) -> Dict[str, Any]:
+        if not select:
+            return item
+        return {name: item[name] for name in select.split(",") if name in item}
+
+    def query(
+        self, items: List[Dict[str, Any]], query: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply OData query options to a collection
+        """
+        if "$filter" in query:
+            match = FILTER.match(query["$filter"])
+            if match is None:
+                raise ValueError("Unsupported $filter {}".format(query["$filter"]))
+            # Dates share one format, so they compare as strings
+            since = match.group("value")
+            items = [item for item in items if item.get("ModifiedDate", "") > since]
+        if "$orderby" in query:
+            items = sorted(items, key=lambda item: str(item.get(query["$orderby"])))
+        skip = int(query.get("$skip", 0))
+        top = int(query["$top"]) if "$top" in query else len(items)
+        select = query.get("$select")
+        return [self.select(item, select) for item in items[skip : skip + top]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Power BI Report Server REST API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--reports", type=int, default=1000)
+    parser.add_argument("--powerbi-reports", type=int, default=1000)
+    parser.add_argument("--mobile-reports", type=int, default=100)
+    parser.add_argument("--linked-reports", type=int, default=100)
+    parser.add_argument("--folders", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--datasets", type=int, default=20)
+    parser.add_argument("--visuals", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-page-size", type=int, default=0)
+    parser.add_argument("--no-ntlm", dest="ntlm", action="store_false")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = MockServerConfig(
+        reports=args.reports,
+        powerbi_reports=args.powerbi_reports,
+        mobile_reports=args.mobile_reports,
+        linked_reports=args.linked_reports,
+        folders=args.folders,
+        users=args.users,
+        datasets=args.datasets,
+        visuals=args.visuals,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        max_page_size=args.max_page_size,
+        ntlm=args.ntlm,
+    )
+    server = MockReportServer(config, args.host, args.port)
+    LOGGER.info(
+        "Serving http://%s/Reports/api/v2.0/, press Ctrl+C to stop",
+        server.workstation_name,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,46 @@
 # Meta Data Ingestion From the Power BI Report Server
 #
 #########################################################
+import functools
+import hashlib
+import json
 import logging
+import multiprocessing
+import os
+import queue
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field as dataclass_field
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 import datahub.emitter.mce_builder as builder
 import requests
-from datahub.configuration.common import AllowDenyPattern
+from datahub.configuration.common import AllowDenyPattern, ConfigModel
 from datahub.configuration.source_common import EnvBasedSourceConfigBase
 from datahub.emitter.mcp import MetadataChangeProposalWrapper
 from datahub.ingestion.api.common import PipelineContext
@@ -29,23 +60,150 @@ from datahub.metadata.com.linkedin.pegasus2avro.common import ChangeAuditStamps
 from datahub.metadata.schema_classes import (
     BrowsePathsClass,
     ChangeTypeClass,
+    ChartInfoClass,
+    ChartKeyClass,
     CorpUserInfoClass,
     CorpUserKeyClass,
     DashboardInfoClass,
     DashboardKeyClass,
+    DatasetLineageTypeClass,
+    DatasetPropertiesClass,
     OwnerClass,
     OwnershipClass,
     OwnershipTypeClass,
     StatusClass,
+    UpstreamClass,
+    UpstreamLineageClass,
 )
 from orderedset import OrderedSet
 from pydantic import BaseModel, validator
 from pydantic.fields import Field
+from requests.adapters import HTTPAdapter
 from requests_ntlm import HttpNtlmAuth
 
+from .content import (
+    PBIX,
+    RDL,
+    DefinitionCache,
+    ReportDefinition,
+    Visual,
+    extract_definition,
+)
+from .decoding import CollectionParser, ModelDecoder, loads
+from .endpoints import ROOT_FOLDER_KEY, EndpointRegistry
+from .instrumentation import (
+    EndpointStats,
+    StageStats,
+    Tracer,
+    timed_iter,
+    to_prometheus,
+)
+from .response_cache import ResponseCache
+from .state import IngestionState, to_odata_datetime, to_utc
+
 # Logger instance
 LOGGER = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+M = TypeVar("M", bound=BaseModel)
+
+
+def merge_iterators(
+    iterators: List[Iterator[T]], max_buffered: int = 1, inline: bool = True
+) -> Iterator[Tuple[int, T]]:
+    """
+    Drain each iterator on a thread of its own.
+
+    Items are yielded as (index of iterator, item) in the order they arrive,
+    at most max_buffered of them wait to be consumed. An error of any
+    iterator is raised once the items before it are consumed. A single
+    iterator is consumed on the calling thread when inline is set.
+    """
+    if len(iterators) == 1 and inline:
+        for item in iterators[0]:
+            yield 0, item
+        return
+
+    results: "queue.Queue[Tuple[int, Any, Optional[BaseException]]]" = queue.Queue(
+        maxsize=max(max_buffered, 1)
+    )
+    stop = threading.Event()
+    done = object()
+
+    def put(entry: Tuple[int, Any, Optional[BaseException]]) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(index: int, iterator: Iterator[T]) -> None:
+        try:
+            for item in iterator:
+                if not put((index, item, None)):
+                    return
+        except BaseException as e:
+            put((index, done, e))
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        put((index, done, None))
+
+    threads = [
+        threading.Thread(
+            target=drain, args=(index, iterator), name="pbirs-merge-{}".format(index)
+        )
+        for index, iterator in enumerate(iterators)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        remaining = len(threads)
+        while remaining:
+            index, item, error = results.get()
+            if item is done:
+                remaining -= 1
+                if error is not None:
+                    raise error
+                continue
+            yield index, item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def ordered_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    executor: Optional[Executor] = None,
+    max_in_flight: int = 1,
+) -> Iterator[R]:
+    """
+    Lazily map fn over items on the executor.
+
+    Results are yielded in input order and at most max_in_flight calls are
+    pending at any time, so output stays deterministic and memory bounded.
+    Without an executor fn is called on the calling thread.
+    """
+    if executor is None:
+        for item in items:
+            yield fn(item)
+        return
+
+    pending: Deque[Future] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 
 class CreatedFrom(Enum):
     REPORT = "Report"
@@ -54,28 +212,69 @@ class CreatedFrom(Enum):
     UNKNOWN = "UNKNOWN"
 
 
+class Role(BaseModel):
+    Name: str
+    Description: str
+
+
+class SystemPolicies(BaseModel):
+    GroupUserName: str
+    Roles: List[Role]
+    DisplayName: Optional[str]
+
+    @validator("DisplayName", always=True)
+    def validate_diplay_name(cls, value, values):  # noqa: N805
+        return values["GroupUserName"].split("\\")[-1]
+
+    def get_urn_part(self):
+        return "users.{}".format(self.GroupUserName)
+
+
 class CatalogItem(BaseModel):
+    # Fields requested with $select, the rest are optional
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "Id",
+        "Name",
+        "Description",
+        "Path",
+        "Type",
+        "Hidden",
+        "ModifiedBy",
+        "ModifiedDate",
+        "CreatedBy",
+        "CreatedDate",
+        "ParentFolderId",
+    )
+
     Id: str
     Name: str
     Description: Optional[str]
     Path: str
     Type: Any
     Hidden: bool
-    Size: int
+    Size: Optional[int]
     ModifiedBy: Optional[str]
     ModifiedDate: Optional[datetime]
     CreatedBy: Optional[str]
     CreatedDate: Optional[datetime]
     ParentFolderId: Optional[str]
     ContentType: Optional[str]
-    Content: str
-    IsFavorite: bool
+    # Content can be megabytes and is never mapped
+    Content: Optional[str]
+    IsFavorite: Optional[bool]
+    # Owner resolved from CreatedBy, not part of the API response
+    UserInfo: Optional[SystemPolicies]
 
     def get_urn_part(self):
         return "reports.{}".format(self.Id)
 
 
 class DataSet(CatalogItem):
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = CatalogItem.SELECT_FIELDS + (
+        "HasParameters",
+        "QueryExecutionTimeOut",
+    )
+
     HasParameters: bool
     QueryExecutionTimeOut: int
 
@@ -97,11 +296,11 @@ class DataSet(CatalogItem):
 class DataModelDataSource(BaseModel):
     AuthType: Optional[str]
     SupportedAuthTypes: List[Optional[str]]
-    Kind: Optional[Callable]
-    ModelConnectionName: str
-    Secret: str
+    Kind: Optional[str]
+    ModelConnectionName: Optional[str]
+    Secret: Optional[str]
     Type: Optional[str]
-    Username: str
+    Username: Optional[str]
 
 
 class CredentialsByUser(BaseModel):
@@ -151,6 +350,9 @@ class MetaData(BaseModel):
 
 
 class DataSource(CatalogItem):
+    # All fields are needed to map the data source
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = ()
+
     IsEnabled: bool
     DataModelDataSource: Optional[DataModelDataSource]
     DataSourceSubType: Optional[str]
@@ -160,9 +362,59 @@ class DataSource(CatalogItem):
     CredentialsByUser: Optional[CredentialsByUser]
     CredentialsInServer: Optional[CredentialsInServer]
     IsReference: bool
+    ConnectionString: Optional[str]
     Subscriptions: Optional[Subscription]
     MetaData: Optional[MetaData]
 
+    # Connection string keywords of server and database, lower case
+    SERVER_KEYWORDS: ClassVar[Tuple[str, ...]] = (
+        "data source",
+        "server",
+        "host",
+        "address",
+    )
+    DATABASE_KEYWORDS: ClassVar[Tuple[str, ...]] = (
+        "initial catalog",
+        "database",
+        "dbname",
+    )
+    TABLE_KEYWORDS: ClassVar[Tuple[str, ...]] = (
+        "table",
+        "dbtable",
+    )
+
+    def get_type(self) -> Optional[str]:
+        # Power BI reports keep the source kind in the data model
+        if self.DataSourceType:
+            return self.DataSourceType
+        if self.DataModelDataSource is not None:
+            return self.DataModelDataSource.Kind
+        return None
+
+    def get_connection_properties(self) -> Dict[str, str]:
+        properties: Dict[str, str] = {}
+        for part in (self.ConnectionString or "").split(";"):
+            key, separator, value = part.partition("=")
+            if separator:
+                properties[key.strip().lower()] = value.strip()
+        return properties
+
+    def __get_connection_property(self, keywords: Tuple[str, ...]) -> Optional[str]:
+        properties = self.get_connection_properties()
+        for keyword in keywords:
+            if properties.get(keyword):
+                return properties[keyword]
+        return None
+
+    def get_server(self) -> Optional[str]:
+        return self.__get_connection_property(DataSource.SERVER_KEYWORDS)
+
+    def get_database(self) -> Optional[str]:
+        return self.__get_connection_property(DataSource.DATABASE_KEYWORDS)
+
+    def get_table(self) -> Optional[str]:
+        return self.__get_connection_property(DataSource.TABLE_KEYWORDS)
+
     def __members(self):
         return (self.Id,)
 
@@ -188,35 +440,27 @@ class Comment(BaseModel):
 
 
 class ExcelWorkbook(CatalogItem):
-    Comments: Comment
-
-
-class Role(BaseModel):
-    Name: str
-    Description: str
-
-
-class SystemPolicies(BaseModel):
-    GroupUserName: str
-    Roles: List[Role]
-    DisplayName: Optional[str]
-
-    @validator("DisplayName", always=True)
-    def validate_diplay_name(cls, value, values):  # noqa: N805
-        return values["GroupUserName"].split("\\")[-1]
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = ()
 
-    def get_urn_part(self):
-        return "users.{}".format(self.GroupUserName)
+    Comments: Comment
 
 
 class Report(CatalogItem):
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = CatalogItem.SELECT_FIELDS + (
+        "HasDataSources",
+        "HasSharedDataSets",
+    )
+
     HasDataSources: bool
     HasSharedDataSets: bool
-    HasParameters: bool
-    UserInfo: Optional[SystemPolicies]
+    HasParameters: Optional[bool]
 
 
 class PowerBiReport(CatalogItem):
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = CatalogItem.SELECT_FIELDS + (
+        "HasDataSources",
+    )
+
     HasDataSources: bool
 
 
@@ -243,6 +487,8 @@ class Value(BaseModel):
 
 
 class Kpi(CatalogItem):
+    SELECT_FIELDS: ClassVar[Tuple[str, ...]] = ()
+
     ValuerFormat: str
     Visualization: str
     DrillThroughTarget: DrillThroughTarget
@@ -252,8 +498,8 @@ class Kpi(CatalogItem):
 
 
 class LinkedReport(CatalogItem):
-    HasParemeters: bool
-    Link: str
+    HasParemeters: Optional[bool]
+    Link: Optional[str]
 
 
 class Manifest(BaseModel):
@@ -261,8 +507,8 @@ class Manifest(BaseModel):
 
 
 class MobileReport(CatalogItem):
-    AllowCaching: bool
-    Manifest: Manifest
+    AllowCaching: Optional[bool]
+    Manifest: Optional[Manifest]
 
 
 class PowerBIReport(CatalogItem):
@@ -293,15 +539,26 @@ class Constant:
     REPORT = "REPORT"
     DATASOURCE = "DATASOURCE"
     DATASET_DATASOURCES = "DATASET_DATASOURCES"
+    REPORT_DATASOURCES = "REPORT_DATASOURCES"
+    REPORT_SHARED_DATASETS = "REPORT_SHARED_DATASETS"
+    POWERBI_REPORT_DATASOURCES = "POWERBI_REPORT_DATASOURCES"
+    REPORT_CONTENT = "REPORT_CONTENT"
+    POWERBI_REPORT_CONTENT = "POWERBI_REPORT_CONTENT"
     DatasetId = "DatasetId"
     ReportId = "ReportId"
     PowerBiReportId = "ReportId"
     Dataset_URN = "DatasetURN"
     DASHBOARD_ID = "powerbi.linkedin.com/dashboards/{}"
     DASHBOARD = "dashboard"
+    CHART_ID = "powerbi.linkedin.com/charts/{}"
+    CHART = "chart"
+    CHART_INFO = "chartInfo"
+    CHART_KEY = "chartKey"
     DATASETS = "DATASETS"
     DATASET_ID = "powerbi.linkedin.com/datasets/{}"
     DATASET_PROPERTIES = "datasetProperties"
+    DATASET_ENTITY = "dataset"
+    UPSTREAM_LINEAGE = "upstreamLineage"
     SUBSCRIPTION = "SUBSCRIPTION"
     SYSTEM = "SYSTEM"
     CATALOG_ITEM = "CATALOG_ITEM"
@@ -309,6 +566,8 @@ class Constant:
     EXTENSIONS = "EXTENSIONS"
     FAVORITE_ITEM = "FAVORITE_ITEM"
     FOLDERS = "FOLDERS"
+    FOLDER_CATALOG_ITEMS = "FOLDER_CATALOG_ITEMS"
+    FOLDER_TYPE = "Folder"
     KPIS = "KPIS"
     LINKED_REPORTS = "LINKED_REPORTS"
     LINKED_REPORT = "LINKED_REPORT"
@@ -325,13 +584,27 @@ class Constant:
     DATAPLATFORM_INSTANCE = "dataPlatformInstance"
     STATUS = "status"
     VALUE = "value"
+    ODATA_NEXT_LINK = "@odata.nextLink"
+    # Endpoint of URLs not built from API_ENDPOINTS
+    OTHER_ENDPOINT = "OTHER"
+    # Ingestion stages of report_stage
+    STAGE_FETCH = "fetch"
+    STAGE_ENRICH = "enrich"
+    STAGE_PARSE = "parse"
+    STAGE_MAP = "map"
+    STAGE_EMIT = "emit"
+    ODATA_TOP = "$top"
+    ODATA_SKIP = "$skip"
+    ODATA_ORDER_BY = "$orderby"
+    ODATA_FILTER = "$filter"
+    ODATA_SELECT = "$select"
     ID = "ID"
     DASHBOARD_INFO = "dashboardInfo"
     DASHBOARD_KEY = "dashboardKey"
     CORP_USER = "corpuser"
     CORP_USER_INFO = "corpUserInfo"
     OWNERSHIP = "ownership"
-    CORP_USER_KEY = "corpUs erKey"
+    CORP_USER_KEY = "corpUserKey"
 
 
 class PowerBiReportServerAPIConfig(EnvBasedSourceConfigBase):
@@ -351,6 +624,168 @@ class PowerBiReportServerAPIConfig(EnvBasedSourceConfigBase):
         default=60,
         description="time in seconds to wait for Power BI metadata scan result.",
     )
+    users_cache_ttl: Optional[int] = Field(
+        default=None,
+        description="time in seconds after which the cached System/Policies user "
+        "table is fetched again. By default it is fetched once per run.",
+    )
+    field_projection: bool = Field(
+        default=True,
+        description="Request only the fields used by the source with OData $select "
+        "instead of whole items including their content.",
+    )
+    validate_payloads: bool = Field(
+        default=True,
+        description="Validate every item returned by Power BI Report Server with "
+        "pydantic. Disable to decode trusted payloads without validation, which is "
+        "several times faster on large servers.",
+    )
+    page_size: int = Field(
+        default=1000,
+        description="Number of items requested per page from collection endpoints. "
+        "0 fetches collections in a single request.",
+    )
+    max_workers: int = Field(
+        default=1,
+        description="Number of concurrent requests issued to Power BI Report Server. "
+        "1 fetches everything sequentially.",
+    )
+    connect_timeout: int = Field(
+        default=10,
+        description="time in seconds to wait for connection to Power BI Report Server. "
+        "scan_timeout is used as the read timeout.",
+    )
+    max_retries: int = Field(
+        default=3,
+        description="Number of retries of a request failing with a retryable status "
+        "or a connection error.",
+    )
+    retry_backoff_factor: float = Field(
+        default=0.5,
+        description="Base in seconds of the exponential backoff between retries.",
+    )
+    retry_backoff_max: float = Field(
+        default=30.0,
+        description="Maximum time in seconds to wait between retries, "
+        "also caps Retry-After.",
+    )
+    retry_status_codes: List[int] = Field(
+        default=[429, 500, 502, 503, 504],
+        description="HTTP status codes which are retried.",
+    )
+    circuit_breaker_threshold: int = Field(
+        default=5,
+        description="Consecutive failed requests after which requests fail fast. "
+        "0 disables the circuit breaker.",
+    )
+    circuit_breaker_reset_timeout: int = Field(
+        default=60,
+        description="time in seconds the circuit breaker stays open before "
+        "a trial request is let through.",
+    )
+    requests_per_second: Optional[float] = Field(
+        default=None,
+        description="Maximum request rate sent to Power BI Report Server. "
+        "By default requests are not rate limited.",
+    )
+    max_in_flight: Optional[int] = Field(
+        default=None,
+        description="Maximum number of requests in flight at once. "
+        "By default it is max_workers.",
+    )
+    adaptive_concurrency: bool = Field(
+        default=False,
+        description="Lower the number of requests in flight when the server slows "
+        "down or returns 5xx and raise it back while it is healthy.",
+    )
+    adaptive_latency_target: float = Field(
+        default=2.0,
+        description="p95 latency in seconds above which adaptive concurrency backs off.",
+    )
+    adaptive_error_rate_threshold: float = Field(
+        default=0.05,
+        description="Share of 5xx responses above which adaptive concurrency backs off.",
+    )
+    adaptive_window: int = Field(
+        default=20,
+        description="Number of requests adaptive concurrency looks at "
+        "before adjusting the limit.",
+    )
+    response_cache_path: Optional[str] = Field(
+        default=None,
+        description="Path of SQLite file caching responses between runs. "
+        "By default responses are not cached.",
+    )
+    response_cache_max_size_mb: int = Field(
+        default=256,
+        description="Size of compressed responses in the cache after which "
+        "least recently used ones are evicted.",
+    )
+    response_cache_ttl: int = Field(
+        default=3600,
+        description="time in seconds cached responses without ETag or "
+        "Last-Modified are used without asking the server. Catalog listings "
+        "are always revalidated.",
+    )
+    session_pool_size: int = Field(
+        default=1,
+        description="Number of persistent NTLM authenticated sessions kept open. "
+        "It is raised to max_workers if lower.",
+    )
+    connection_pool_maxsize: int = Field(
+        default=10,
+        description="Maximum number of keep-alive connections per session.",
+    )
+    keep_alive_max_requests: int = Field(
+        default=0,
+        description="Recycle a session after this many requests. 0 means unlimited.",
+    )
+    keep_alive_idle_timeout: int = Field(
+        default=0,
+        description="Recycle a session idle for more than this many seconds. "
+        "0 means sessions are never recycled for idleness.",
+    )
+    async_client: bool = Field(
+        default=False,
+        description="Fetch reports and their details with the asyncio client, "
+        "which needs the async extra (httpx and httpx-ntlm).",
+    )
+    async_max_in_flight: int = Field(
+        default=100,
+        description="Maximum number of requests in flight at once with the "
+        "asyncio client. It is also the size of its connection pool.",
+    )
+    stream_collections: bool = Field(
+        default=False,
+        description="Parse collection responses incrementally while they are "
+        "downloaded instead of loading whole pages in memory. Streamed "
+        "collections bypass the response cache.",
+    )
+    stream_chunk_size: int = Field(
+        default=64 * 1024,
+        description="Size in bytes of the chunks read from streamed responses.",
+    )
+    content_directory: Optional[str] = Field(
+        default=None,
+        description="Directory of the temporary files report definitions are "
+        "downloaded to, the system temporary directory by default.",
+    )
+    opentelemetry_spans: bool = Field(
+        default=False,
+        description="Record OpenTelemetry spans of requests and ingestion stages "
+        "with the globally configured tracer provider.",
+    )
+
+    def get_dataset_platform(self, data_source_type: Optional[str]) -> Optional[str]:
+        """
+        DataHub platform of data source type as per dataset_type_mapping
+        """
+        if data_source_type is None:
+            return None
+        for source_type, platform in self.dataset_type_mapping.items():
+            if source_type.lower() == data_source_type.lower():
+                return platform
+        return None
 
     @property
     def get_base_api_url(self):
@@ -359,333 +794,1640 @@ class PowerBiReportServerAPIConfig(EnvBasedSourceConfigBase):
         )
 
 
+class ReportServerConfig(ConfigModel):
+    """
+    Power BI Report Server instance, settings left out are taken from the top level
+    """
+
+    workstation_name: str = Field(description="Workstation name")
+    username: Optional[str] = Field(
+        default=None, description="Windows account username"
+    )
+    password: Optional[str] = Field(
+        default=None, description="Windows account password"
+    )
+    report_virtual_directory_name: Optional[str] = Field(
+        default=None, description="Report Virtual Directory URL name"
+    )
+    report_server_virtual_directory_name: Optional[str] = Field(
+        default=None, description="Report Server Virtual Directory URL name"
+    )
+
+
 class PowerBiDashboardSourceConfig(PowerBiReportServerAPIConfig):
     platform_name: str = "powerbireportserver"
     platform_urn: str = builder.make_data_platform_urn(platform=platform_name)
     report_pattern: AllowDenyPattern = AllowDenyPattern.allow_all()
     chart_pattern: AllowDenyPattern = AllowDenyPattern.allow_all()
+    # Paths relative to a folder standing for all of its descendants
+    DESCENDANT_PROBES: ClassVar[Tuple[str, ...]] = ("", "\x00", "\uffff/\uffff")
+    extract_lineage: bool = Field(
+        default=False,
+        description="Ingest shared datasets of reports and lineage to upstream "
+        "datasets of their data sources mapped by dataset_type_mapping. The "
+        "upstream is a table when the connection string names one, e.g. "
+        "Table=dbo.Sales, and the database otherwise. Datasets of dashboards "
+        "need acryl-datahub 0.8.45 or later.",
+    )
+    extract_charts: bool = Field(
+        default=False,
+        description="Download definitions of paginated and Power BI reports and "
+        "ingest their data visuals as charts of the dashboards.",
+    )
+    chart_cache_path: Optional[str] = Field(
+        default=None,
+        description="Path of the SQLite file keeping the metadata extracted from "
+        "each report definition, so definitions are only downloaded again once "
+        "the report is modified.",
+    )
+    content_parse_workers: int = Field(
+        default=0,
+        description="Processes parsing downloaded report definitions. With 0 "
+        "they are parsed by the thread which downloaded them. Workers are "
+        "spawned, so pipelines run from a Python script need the usual "
+        "if __name__ == '__main__' guard.",
+    )
+    incremental: bool = Field(
+        default=False,
+        description="Only ingest reports modified since the last successful run.",
+    )
+    remove_stale_entities: bool = Field(
+        default=False,
+        description="Soft-delete dashboards, users and shared datasets emitted by "
+        "earlier runs which are no longer on the server. Stale entities are found "
+        "by full ingestions, incremental ones only add to the URNs kept in "
+        "state_file_path.",
+    )
+    stale_removal_threshold: float = Field(
+        default=75.0,
+        description="Don't remove stale entities if more than this percentage of "
+        "the entities emitted before would be removed, e.g. when the account lost "
+        "access to most of the catalog.",
+    )
+    state_file_path: Optional[str] = Field(
+        default=None,
+        description="Path of the local file keeping the ModifiedDate high-water "
+        "mark of the last successful run. Required for incremental ingestion and "
+        "removal of stale entities.",
+    )
+    full_resync_interval_days: Optional[int] = Field(
+        default=None,
+        description="Run a full ingestion if the last one is older than this many "
+        "days. By default only the first run is a full one.",
+    )
 
+    servers: List[ReportServerConfig] = Field(
+        default=[],
+        description="Power BI Report Server instances ingested in parallel, each "
+        "with its own connection pool. By default only the server configured at "
+        "the top level is ingested.",
+    )
+    folder_traversal: bool = Field(
+        default=False,
+        description="Walk the folder tree instead of reading the report collections. "
+        "Folders whose whole subtree is denied by report_pattern, e.g. by "
+        "'/Finance/.*', are skipped without being listed.",
+    )
+    shard_count: int = Field(
+        default=1,
+        description="Split the catalog between this many pipelines by top-level "
+        "folder of the report path. With folder_traversal the top-level folders "
+        "of other shards are never listed. Report collections can't be filtered "
+        "by shard on the server, each shard downloads them whole.",
+    )
+    shard_index: int = Field(
+        default=0,
+        description="Shard ingested by this pipeline, from 0 to shard_count - 1. "
+        "Each shard needs its own state_file_path.",
+    )
+    mapper_workers: int = Field(
+        default=0,
+        description="Threads mapping reports to work units. With 1 or more, "
+        "reports are also fetched and enriched on a thread of their own, so "
+        "downloads go on while work units are consumed.",
+    )
+    pipeline_queue_size: int = Field(
+        default=64,
+        description="Reports buffered between the stages of the pipeline "
+        "enabled by mapper_workers, bounding its memory use.",
+    )
+    prometheus_metrics_path: Optional[str] = Field(
+        default=None,
+        description="Write request and stage metrics to this file in Prometheus "
+        "text format at the end of the run, e.g. for the node exporter "
+        "textfile collector.",
+    )
 
-class PowerBiReportServerAPI:
-    # API endpoints of PowerBi Report Server to fetch reports, datasets
-    API_ENDPOINTS = {
-        Constant.CATALOG_ITEM: "{PBIRS_BASE_URL}/CatalogItems({CATALOG_ID})",
-        Constant.DATASETS: "{PBIRS_BASE_URL}/Datasets",
-        Constant.DATASET: "{PBIRS_BASE_URL}/Datasets({DATASET_ID})",
-        Constant.DATASET_DATASOURCES: "{PBIRS_BASE_URL}/Datasets({DATASET_ID})/DataSources",
-        Constant.DATASOURCE: "{PBIRS_BASE_URL}/DataSources({DATASOURCE_ID})",
-        Constant.EXCEL_WORKBOOK: "{PBIRS_BASE_URL}/ExcelWorkbooks({EXCEL_WORKBOOK_ID})",
-        Constant.EXTENSIONS: "{PBIRS_BASE_URL}/Extensions",
-        Constant.FAVORITE_ITEM: "{PBIRS_BASE_URL}/FavoriteItems({FAVORITE_ITEM_ID})",
-        Constant.FOLDERS: "{PBIRS_BASE_URL}/Folders({FOLDER_ID})",
-        Constant.KPIS: "{PBIRS_BASE_URL}/Kpis({KPI_ID})",
-        Constant.LINKED_REPORTS: "{PBIRS_BASE_URL}/LinkedReports",
-        Constant.LINKED_REPORT: "{PBIRS_BASE_URL}/LinkedReports({LINKED_REPORT_ID})",
-        Constant.ME: "{PBIRS_BASE_URLL}/Me",
-        Constant.MOBILE_REPORTS: "{PBIRS_BASE_URL}/MobileReports",
-        Constant.MOBILE_REPORT: "{PBIRS_BASE_URL}/MobileReports({MOBILE_REPORT_ID})",
-        Constant.POWERBI_REPORTS: "{PBIRS_BASE_URL}/PowerBiReports",
-        Constant.POWERBI_REPORT: "{PBIRS_BASE_URL}/PowerBiReports({POWERBI_REPORT_ID})",
-        Constant.REPORTS: "{PBIRS_BASE_URL}/Reports",
-        Constant.REPORT: "{PBIRS_BASE_URL}/Reports({REPORT_ID})",
-        Constant.RESOURCE: "{PBIRS_BASE_URL}/Resources({RESOURCE_GET})",
-        Constant.SESSION: "{PBIRS_BASE_URL}/Session",
-        Constant.SUBSCRIPTION: "{PBIRS_BASE_URL}/Subscriptions({SUBSCRIPTION_ID})",
-        Constant.SYSTEM: "{PBIRS_BASE_URL}/System",
-        Constant.SYSTEM_POLICIES: "{PBIRS_BASE_URL}/System/Policies",
-    }
-
-    def __init__(self, config: PowerBiReportServerAPIConfig) -> None:
-        self.__config: PowerBiReportServerAPIConfig = config
-        self.__auth: HttpNtlmAuth = HttpNtlmAuth(
-            "{}\\{}".format(self.__config.workstation_name, self.__config.username),
-            self.__config.password,
-        )
+    @validator("state_file_path", always=True)
+    def validate_state_file_path(cls, value, values):  # noqa: N805
+        if values.get("incremental") and not value:
+            raise ValueError("state_file_path is required for incremental ingestion")
+        if values.get("remove_stale_entities") and not value:
+            raise ValueError(
+                "state_file_path is required for removal of stale entities"
+            )
+        return value
 
-    def get_auth_credentials(self):
-        return self.__auth
+    @validator("shard_index", always=True)
+    def validate_shard_index(cls, value, values):  # noqa: N805
+        if not 0 <= value < values.get("shard_count", 1):
+            raise ValueError("shard_index must be between 0 and shard_count - 1")
+        return value
 
-    def get_users_policies(self) -> List[SystemPolicies]:
+    def get_server_configs(self) -> List["PowerBiDashboardSourceConfig"]:
         """
-        Get user policy by Power Bi Report Server System
+        Config of each server to ingest, inheriting the top level settings
         """
-        user_list_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.SYSTEM_POLICIES
-        ]
-        # Replace place holders
-        user_list_endpoint = user_list_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url
-        )
-        # Hit PowerBi
-        LOGGER.info("Request to URL={}".format(user_list_endpoint))
-        response = requests.get(
-            url=user_list_endpoint, auth=self.get_auth_credentials()
-        )
-
-        # Check if we got response from PowerBi
-        if response.status_code != 200:
-            LOGGER.warning(
-                "Failed to fetch user list from power-bi for, http_status={}, message={}".format(
-                    response.status_code, response.text
-                )
+        if not self.servers:
+            return [self]
+        return [
+            self.copy(
+                update={
+                    key: value
+                    for key, value in server.dict().items()
+                    if value is not None
+                }
             )
-            raise ConnectionError("Failed to fetch the user list from the power-bi")
-
-        users_dict: List[Any] = response.json()[Constant.VALUE]
-        # Iterate through response and create a list of PowerBiAPI.Dashboard
-        users: List[SystemPolicies] = [
-            SystemPolicies.parse_obj(instance) for instance in users_dict
+            for server in self.servers
         ]
-        return users
-
-    def get_user_policies(self, user_name: str) -> Optional[SystemPolicies]:
-        users_policies = self.get_users_policies()
-        for user_policy in users_policies:
-            if user_policy.GroupUserName == user_name:
-                return user_policy
-        return None
 
-    def get_report(self, report_id: str) -> Optional[Report]:
+    def is_folder_pruned(self, path: str) -> bool:
         """
-        Fetch the .rdl report from PowerBiReportServer for the given report id
+        Whether subtree of folder is skipped, i.e. it belongs to another shard or
+        every path under the folder is denied by report_pattern. A deny pattern covers the subtree when it matches
+        the folder path followed by a slash whatever comes next, as "/Finance/.*"
+        does, unlike "/Finance$" which only denies the folder itself. Deny patterns
+        take precedence over allow patterns, no report of such a subtree is allowed.
         """
-        if report_id is None:
-            LOGGER.info("Input value is None")
-            LOGGER.info("{}={}".format(Constant.ReportId, report_id))
-            return None
-
-        report_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[Constant.REPORT]
-        # Replace place holders
-        report_get_endpoint = report_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            REPORT_ID=report_id,
-        )
-        # Hit PowerBiReportServer
-        LOGGER.info("Request to report URL={}".format(report_get_endpoint))
-        response = requests.get(
-            url=report_get_endpoint,
-            auth=self.get_auth_credentials(),
+        if not self.is_in_shard(path):
+            return True
+        prefix = path.rstrip("/") + "/"
+        return any(
+            all(
+                re.match(deny_pattern, prefix + suffix, self.report_pattern.regex_flags)
+                for suffix in self.DESCENDANT_PROBES
+            )
+            for deny_pattern in self.report_pattern.deny
         )
 
-        # Check if we got response from PowerBi
-        if response.status_code != 200:
-            message: str = "Failed to fetch report from power-bi-report-server for"
-            LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.ReportId, report_id))
-            raise ConnectionError(message)
+    def is_in_shard(self, folder: str) -> bool:
+        """
+        Whether items of folder belong to the shard of this pipeline
+        """
+        if self.shard_count <= 1:
+            return True
+        # Items at the root share the empty top-level folder
+        top_level_folder = folder.split("/")[1] if folder else ""
+        shard = zlib.crc32(top_level_folder.encode("utf-8")) % self.shard_count
+        return shard == self.shard_index
 
-        response_dict = response.json()
 
-        return Report.parse_obj(response_dict)
+@dataclass
+class PowerBiReportServerDashboardSourceReport(SourceReport):
+    scanned_report: int = 0
+    filtered_reports: List[str] = dataclass_field(default_factory=list)
+    user_cache_hits: int = 0
+    user_cache_misses: int = 0
+    requests_issued: int = 0
+    requests_retried: int = 0
+    requests_failed: int = 0
+    requests_rejected_by_circuit_breaker: int = 0
+    request_latency_seconds_total: float = 0.0
+    request_latency_seconds_max: float = 0.0
+    throttled_seconds_total: float = 0.0
+    max_in_flight_limit: Optional[int] = None
+    lineage_cache_hits: int = 0
+    lineage_cache_misses: int = 0
+    response_cache_hits: int = 0
+    response_cache_revalidations: int = 0
+    response_cache_misses: int = 0
+    workunits_emitted: int = 0
+    workunits_suppressed: int = 0
+    folders_listed: int = 0
+    folders_pruned: int = 0
+    content_downloads: int = 0
+    definition_cache_hits: int = 0
+    stale_entities_removed: int = 0
+    # Requests, bytes, latency and parse time per API_ENDPOINTS template
+    endpoint_stats: Dict[str, EndpointStats] = dataclass_field(default_factory=dict)
+    # Time spent to fetch, enrich, map and emit reports, summed over threads
+    stage_timings: Dict[str, StageStats] = dataclass_field(default_factory=dict)
 
-    def get_powerbi_report(self, report_id: str) -> Optional[PowerBiReport]:
-        """
-        Fetch the .pbix report from PowerBiReportServer for the given report id
-        """
-        if report_id is None:
-            LOGGER.info("Input value is None")
-            LOGGER.info("{}={}".format(Constant.ReportId, report_id))
-            return None
+    def report_scanned(self, count: int = 1) -> None:
+        self.scanned_report += count
 
-        powerbi_report_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.POWERBI_REPORT
-        ]
-        # Replace place holders
-        powerbi_report_get_endpoint = powerbi_report_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            POWERBI_REPORT_ID=report_id,
-        )
-        # Hit PowerBiReportServer
-        LOGGER.info("Request to report URL={}".format(powerbi_report_get_endpoint))
-        response = requests.get(
-            url=powerbi_report_get_endpoint,
-            auth=self.get_auth_credentials(),
+    def report_request(self, latency: float, retries: int, failed: bool) -> None:
+        self.requests_issued += 1
+        self.requests_retried += retries
+        if failed:
+            self.requests_failed += 1
+        self.request_latency_seconds_total += latency
+        self.request_latency_seconds_max = max(
+            self.request_latency_seconds_max, latency
         )
 
-        # Check if we got response from PowerBi
-        if response.status_code != 200:
-            message: str = "Failed to fetch report from power-bi-report-server for"
-            LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.ReportId, report_id))
-            raise ConnectionError(message)
+    def __endpoint(self, endpoint: Optional[str]) -> EndpointStats:
+        endpoint = endpoint or Constant.OTHER_ENDPOINT
+        stats = self.endpoint_stats.get(endpoint)
+        if stats is None:
+            stats = self.endpoint_stats[endpoint] = EndpointStats()
+        return stats
 
-        response_dict = response.json()
-        return PowerBiReport.parse_obj(response_dict)
+    def report_endpoint_request(
+        self,
+        endpoint: Optional[str],
+        latency: float,
+        status_code: Optional[int],
+        bytes_received: int,
+    ) -> None:
+        stats = self.__endpoint(endpoint)
+        stats.requests += 1
+        stats.bytes_received += bytes_received
+        stats.status_codes[status_code or "error"] += 1
+        stats.latency.observe(latency)
 
-    def get_linked_report(self, report_id: str) -> Optional[LinkedReport]:
-        """
-        Fetch the mobile report from PowerBiReportServer for the given report id
-        """
-        if report_id is None:
-            LOGGER.info("Input value is None")
-            LOGGER.info("{}={}".format(Constant.ReportId, report_id))
-            return None
+    def report_endpoint_bytes(self, endpoint: Optional[str], count: int) -> None:
+        self.__endpoint(endpoint).bytes_received += count
 
-        linked_report_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.LINKED_REPORT
-        ]
-        # Replace place holders
-        linked_report_get_endpoint = linked_report_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            LINKED_REPORT_ID=report_id,
-        )
-        # Hit PowerBiReportServer
-        LOGGER.info("Request to report URL={}".format(linked_report_get_endpoint))
-        response = requests.get(
-            url=linked_report_get_endpoint,
-            auth=self.get_auth_credentials(),
-        )
+    def report_endpoint_parse(self, endpoint: Optional[str], seconds: float) -> None:
+        self.__endpoint(endpoint).parse.observe(seconds)
 
-        # Check if we got response from PowerBi
-        if response.status_code != 200:
-            message: str = "Failed to fetch report from power-bi-report-server for"
-            LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.ReportId, report_id))
-            raise ConnectionError(message)
+    def report_stage(self, stage: str, seconds: float) -> None:
+        stats = self.stage_timings.get(stage)
+        if stats is None:
+            stats = self.stage_timings[stage] = StageStats()
+        stats.observe(seconds)
 
-        response_dict = response.json()
+    def report_stale_entity_removed(self) -> None:
+        self.stale_entities_removed += 1
 
-        return LinkedReport.parse_obj(response_dict)
+    def report_circuit_breaker_rejection(self) -> None:
+        self.requests_rejected_by_circuit_breaker += 1
 
-    def get_mobile_report(self, report_id: str) -> Optional[MobileReport]:
-        """
-        Fetch the mobile report from PowerBiReportServer for the given report id
-        """
-        if report_id is None:
-            LOGGER.info("Input value is None")
-            LOGGER.info("{}={}".format(Constant.ReportId, report_id))
-            return None
+    def report_throttled(self, seconds: float) -> None:
+        self.throttled_seconds_total += seconds
 
-        mobile_report_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.MOBILE_REPORT
-        ]
-        # Replace place holders
-        mobile_report_get_endpoint = mobile_report_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            MOBILE_REPORT_ID=report_id,
-        )
-        # Hit PowerBiReportServer
-        LOGGER.info("Request to report URL={}".format(mobile_report_get_endpoint))
-        response = requests.get(
-            url=mobile_report_get_endpoint,
-            auth=self.get_auth_credentials(),
-        )
+    def report_max_in_flight_limit(self, limit: Optional[int]) -> None:
+        self.max_in_flight_limit = limit
 
-        # Check if we got response from PowerBi
-        if response.status_code != 200:
-            message: str = "Failed to fetch report from power-bi-report-server for"
-            LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.ReportId, report_id))
-            raise ConnectionError(message)
+    def report_user_cache_hit(self) -> None:
+        self.user_cache_hits += 1
 
-        response_dict = response.json()
+    def report_user_cache_miss(self) -> None:
+        self.user_cache_misses += 1
 
-        return MobileReport.parse_obj(response_dict)
+    def report_lineage_cache_hit(self) -> None:
+        self.lineage_cache_hits += 1
 
-    def get_all_reports(self) -> List[Any]:
-        """
-        Fetch all reports from PowerBiReportServer
-        """
-        report_types_mapping: Dict[str, Any] = {
-            Constant.REPORTS: Report,
-            Constant.MOBILE_REPORTS: MobileReport,
-            Constant.LINKED_REPORTS: LinkedReport,
-            Constant.POWERBI_REPORTS: PowerBiReport,
-        }
+    def report_lineage_cache_miss(self) -> None:
+        self.lineage_cache_misses += 1
 
-        reports: List[Any] = []
-        for report_type in report_types_mapping.keys():
+    def report_content_download(self) -> None:
+        self.content_downloads += 1
 
-            report_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[report_type]
-            # Replace place holders
-            report_get_endpoint = report_get_endpoint.format(
-                PBIRS_BASE_URL=self.__config.get_base_api_url,
+    def report_definition_cache_hit(self) -> None:
+        self.definition_cache_hits += 1
+
+    def report_response_cache_hit(self, revalidated: bool) -> None:
+        if revalidated:
+            self.response_cache_revalidations += 1
+        else:
+            self.response_cache_hits += 1
+
+    def report_response_cache_miss(self) -> None:
+        self.response_cache_misses += 1
+
+    def report_dropped(self, view: str) -> None:
+        self.filtered_reports.append(view)
+
+    def report_folder_listed(self) -> None:
+        self.folders_listed += 1
+
+    def report_folder_pruned(self) -> None:
+        self.folders_pruned += 1
+
+    def report_workunit_emitted(self) -> None:
+        self.workunits_emitted += 1
+
+    def report_workunit_suppressed(self) -> None:
+        self.workunits_suppressed += 1
+
+
+class SessionPool:
+    """
+    Pool of persistent requests sessions sharing the NTLM credentials.
+
+    NTLM authenticates the connection rather than the request, so keeping
+    connections alive saves the 3-leg handshake on every call.
+    """
+
+    @dataclass
+    class PooledSession:
+        session: requests.Session
+        request_count: int = 0
+        last_used: float = dataclass_field(default_factory=time.monotonic)
+        # Set to close the session instead of returning it to the pool
+        discard: bool = False
+
+    def __init__(
+        self,
+        auth: HttpNtlmAuth,
+        size: int = 1,
+        connection_pool_maxsize: int = 10,
+        max_requests: int = 0,
+        idle_timeout: int = 0,
+    ) -> None:
+        self.__auth = auth
+        self.__connection_pool_maxsize = connection_pool_maxsize
+        self.__max_requests = max_requests
+        self.__idle_timeout = idle_timeout
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__all: List[SessionPool.PooledSession] = []
+        # Sessions are created lazily, None marks a free slot
+        self.__idle: "queue.LifoQueue[Optional[SessionPool.PooledSession]]" = (
+            queue.LifoQueue()
+        )
+        for _ in range(max(size, 1)):
+            self.__idle.put(None)
+
+    def __new_session(self) -> "SessionPool.PooledSession":
+        session = requests.Session()
+        session.auth = self.__auth
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.__connection_pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        pooled = SessionPool.PooledSession(session=session)
+        with self.__lock:
+            self.__all.append(pooled)
+        return pooled
+
+    def __discard(self, pooled: "SessionPool.PooledSession") -> None:
+        pooled.session.close()
+        with self.__lock:
+            self.__all.remove(pooled)
+
+    def __is_expired(self, pooled: "SessionPool.PooledSession") -> bool:
+        if 0 < self.__max_requests <= pooled.request_count:
+            return True
+        if 0 < self.__idle_timeout < time.monotonic() - pooled.last_used:
+            return True
+        return False
+
+    @contextmanager
+    def session(self) -> Iterator["SessionPool.PooledSession"]:
+        if self.__closed:
+            raise ConnectionError("Session pool is closed")
+
+        pooled = self.__idle.get()
+        try:
+            if pooled is not None and self.__is_expired(pooled):
+                self.__discard(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self.__new_session()
+            pooled.request_count += 1
+            yield pooled
+        finally:
+            if pooled is not None and pooled.discard:
+                self.__discard(pooled)
+                pooled = None
+            if pooled is not None:
+                pooled.last_used = time.monotonic()
+            self.__idle.put(pooled)
+
+    def close(self) -> None:
+        self.__closed = True
+        with self.__lock:
+            sessions = list(self.__all)
+            self.__all.clear()
+        for pooled in sessions:
+            pooled.session.close()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile, q between 0 and 100
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(q / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate requests per second with bursts up to capacity
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.__rate = rate
+        self.__capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.__tokens = self.__capacity
+        self.__updated_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available. Returns 0 when it was taken, the time
+        in seconds until the next one otherwise.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                self.__capacity,
+                self.__tokens + (now - self.__updated_at) * self.__rate,
             )
-            # Hit PowerBiReportServer
-            LOGGER.info("Request to report URL={}".format(report_get_endpoint))
-            response = requests.get(
-                url=report_get_endpoint,
-                auth=self.get_auth_credentials(),
+            self.__updated_at = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return 0.0
+            return (1 - self.__tokens) / self.__rate
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for it if needed. Returns time waited in seconds.
+        """
+        waited = 0.0
+        while True:
+            delay = self.take()
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimit:
+    """
+    AIMD limit of requests in flight: every window of requests it is halved
+    when p95 latency or the 5xx rate is over target, otherwise it grows by one
+    up to max_in_flight. Callers serialize calls to record.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        latency_target: float = 2.0,
+        error_rate_threshold: float = 0.05,
+        window: int = 20,
+    ) -> None:
+        self.max_in_flight = max(max_in_flight, 1)
+        self.limit = self.max_in_flight
+        self.__latency_target = latency_target
+        self.__error_rate_threshold = error_rate_threshold
+        self.__window = max(window, 1)
+        self.__latencies: List[float] = []
+        self.__server_errors = 0
+
+    def record(self, latency: float, status_code: Optional[int]) -> bool:
+        """
+        Feed outcome of a request, returns whether the limit changed
+        """
+        self.__latencies.append(latency)
+        if status_code is None or status_code >= 500:
+            self.__server_errors += 1
+        if len(self.__latencies) < self.__window:
+            return False
+
+        p95 = percentile(self.__latencies, 95)
+        error_rate = self.__server_errors / len(self.__latencies)
+        self.__latencies = []
+        self.__server_errors = 0
+
+        if p95 > self.__latency_target or error_rate > self.__error_rate_threshold:
+            limit = max(self.limit // 2, 1)
+        else:
+            limit = min(self.limit + 1, self.max_in_flight)
+        if limit == self.limit:
+            return False
+        LOGGER.info(
+            "Requests in flight limit {} -> {} (p95={:.2f}s, 5xx rate={:.2%})".format(
+                self.limit, limit, p95, error_rate
             )
+        )
+        self.limit = limit
+        return True
 
-            # Check if we got response from PowerBi
-            if response.status_code != 200:
-                message: str = "Failed to fetch report from power-bi-report-server for"
-                LOGGER.warning(message)
-                LOGGER.warning("{}={}".format(Constant.ReportId, report_type))
 
-            response_dict = response.json()["value"]
-            if response_dict:
-                reports.extend(
-                    report_types_mapping[report_type].parse_obj(report)
-                    for report in response_dict
-                )
+class RequestThrottle:
+    """
+    Client side throttling of requests.
+
+    Combines the optional token bucket rate limit with a cap of requests in
+    flight, which follows AdaptiveLimit in adaptive mode.
+    """
 
-        return reports
+    def __init__(
+        self,
+        max_in_flight: int,
+        requests_per_second: Optional[float] = None,
+        adaptive: bool = False,
+        latency_target: float = 2.0,
+        error_rate_threshold: float = 0.05,
+        window: int = 20,
+        on_limit_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.__in_flight = 0
+        self.__condition = threading.Condition()
+        self.__bucket: Optional[TokenBucket] = (
+            TokenBucket(requests_per_second) if requests_per_second else None
+        )
+        self.__adaptive = adaptive
+        self.__limit = AdaptiveLimit(
+            max_in_flight, latency_target, error_rate_threshold, window
+        )
+        self.__on_limit_change = on_limit_change
+        if self.__on_limit_change is not None:
+            self.__on_limit_change(self.__limit.limit)
 
-    def get_dataset(self, dataset_id: str) -> Any:
+    @property
+    def limit(self) -> int:
+        return self.__limit.limit
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
         """
-        Fetch the dataset from PowerBi for the given dataset identifier
+        Hold a request slot, yields time in seconds spent waiting for it
         """
-        if dataset_id is None:
-            LOGGER.info("Input value is None")
-            LOGGER.info("{}={}".format(Constant.DatasetId, dataset_id))
+        started_at = time.monotonic()
+        with self.__condition:
+            while self.__in_flight >= self.__limit.limit:
+                self.__condition.wait()
+            self.__in_flight += 1
+        try:
+            if self.__bucket is not None:
+                self.__bucket.acquire()
+            yield time.monotonic() - started_at
+        finally:
+            with self.__condition:
+                self.__in_flight -= 1
+                self.__condition.notify()
+
+    def record(self, latency: float, status_code: Optional[int]) -> None:
+        """
+        Feed outcome of a request to the adaptive controller
+        """
+        if not self.__adaptive:
+            return
+        with self.__condition:
+            if not self.__limit.record(latency, status_code):
+                return
+            limit = self.__limit.limit
+            self.__condition.notify_all()
+        if self.__on_limit_change is not None:
+            self.__on_limit_change(limit)
+
+
+class CircuitBreakerOpenError(ConnectionError):
+    """
+    Request is rejected because the server kept failing
+    """
+
+
+class CircuitBreaker:
+    """
+    Fail fast after threshold consecutive failures.
+
+    Once open, requests are rejected until reset_timeout elapses, then a single
+    trial request is let through. Its success closes the breaker again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: int) -> None:
+        self.__threshold = threshold
+        self.__reset_timeout = reset_timeout
+        self.__lock = threading.Lock()
+        self.__failures = 0
+        self.__opened_at: Optional[float] = None
+        self.__trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.__threshold <= 0:
+            return True
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if self.__trial_in_flight:
+                return False
+            if time.monotonic() - self.__opened_at < self.__reset_timeout:
+                return False
+            self.__trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial_in_flight or self.__failures >= self.__threshold > 0:
+                if self.__opened_at is None:
+                    LOGGER.warning(
+                        "Circuit breaker opened after {} failures".format(
+                            self.__failures
+                        )
+                    )
+                self.__opened_at = time.monotonic()
+            self.__trial_in_flight = False
+
+    def release(self) -> None:
+        """
+        Let another trial through when the trial request ended without outcome
+        """
+        with self.__lock:
+            self.__trial_in_flight = False
+
+
+class MemoCache:
+    """
+    Thread-safe per-run memo.
+
+    Concurrent callers asking for the same key share one computation, so each
+    key is computed exactly once whatever the fan-in. Failed computations are
+    forgotten and computed again on the next call.
+    """
+
+    def __init__(
+        self,
+        on_hit: Optional[Callable[[], None]] = None,
+        on_miss: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.__on_hit = on_hit
+        self.__on_miss = on_miss
+        self.__lock = threading.Lock()
+        self.__futures: Dict[Any, Future] = {}
+
+    def get(self, key: Any, compute: Callable[[], R]) -> R:
+        with self.__lock:
+            future = self.__futures.get(key)
+            owner = future is None
+            if future is None:
+                future = Future()
+                self.__futures[key] = future
+            callback = self.__on_miss if owner else self.__on_hit
+            if callback is not None:
+                callback()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self.__lock:
+                del self.__futures[key]
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+
+@dataclass
+class ReportLineage:
+    # Shared datasets used by the report
+    datasets: List[DataSet] = dataclass_field(default_factory=list)
+    # Data sources of each shared dataset by dataset Id
+    dataset_data_sources: Dict[str, List[DataSource]] = dataclass_field(
+        default_factory=dict
+    )
+    # Data sources embedded in the report
+    data_sources: List[DataSource] = dataclass_field(default_factory=list)
+
+
+class CatalogRecord:
+    """
+    Compact record of a report held by the source during the run.
+
+    Only the fields mapped to DataHub are kept. Repeated strings, i.e. user
+    names and parent folder paths, are interned so reports of the same
+    author or folder share them.
+    """
+
+    __slots__ = (
+        "ReportType",
+        "Id",
+        "Name",
+        "Description",
+        "Folder",
+        "Leaf",
+        "ModifiedDate",
+        "CreatedBy",
+        "HasDataSources",
+        "HasSharedDataSets",
+        "UserInfo",
+        "Lineage",
+        "Definition",
+        "EnrichmentFailed",
+    )
+
+    def __init__(
+        self,
+        report_type: str,
+        id: str,
+        name: str,
+        path: str,
+        description: Optional[str] = None,
+        modified_date: Optional[datetime] = None,
+        created_by: Optional[str] = None,
+        has_data_sources: bool = False,
+        has_shared_data_sets: bool = False,
+    ) -> None:
+        self.ReportType: str = report_type
+        self.Id: str = id
+        self.Name: str = name
+        self.Description: Optional[str] = description
+        # Path is kept as shared folder path and last segment, which is the name
+        folder, _, leaf = path.rpartition("/")
+        self.Folder: str = sys.intern(folder)
+        self.Leaf: str = name if leaf == name else leaf
+        self.ModifiedDate: Optional[datetime] = modified_date
+        self.CreatedBy: Optional[str] = (
+            sys.intern(created_by) if created_by is not None else None
+        )
+        self.HasDataSources: bool = has_data_sources
+        self.HasSharedDataSets: bool = has_shared_data_sets
+        self.UserInfo: Optional[SystemPolicies] = None
+        self.Lineage: Optional[ReportLineage] = None
+        self.Definition: Optional[ReportDefinition] = None
+        # Details couldn't be fetched, the report is retried by the next run
+        self.EnrichmentFailed: bool = False
+
+    @classmethod
+    def from_item(cls, report_type: str, item: CatalogItem) -> "CatalogRecord":
+        return cls(
+            report_type=report_type,
+            id=item.Id,
+            name=item.Name,
+            path=item.Path,
+            description=item.Description,
+            modified_date=item.ModifiedDate,
+            created_by=item.CreatedBy,
+            has_data_sources=bool(getattr(item, "HasDataSources", False)),
+            has_shared_data_sets=bool(getattr(item, "HasSharedDataSets", False)),
+        )
+
+    @classmethod
+    def from_folder_item(cls, report_type: str, item: CatalogItem) -> "CatalogRecord":
+        record = cls.from_item(report_type, item)
+        # Folder listing has no report specific fields, lineage collections
+        # are requested for every report type having them
+        record.HasDataSources = report_type in (
+            Constant.REPORTS,
+            Constant.POWERBI_REPORTS,
+        )
+        record.HasSharedDataSets = report_type == Constant.REPORTS
+        return record
+
+    @property
+    def Path(self) -> str:  # noqa: N802
+        return "{}/{}".format(self.Folder, self.Leaf)
+
+    def get_urn_part(self):
+        return "reports.{}".format(self.Id)
+
+    def __repr__(self) -> str:
+        return "CatalogRecord(ReportType={!r}, Id={!r}, Path={!r})".format(
+            self.ReportType, self.Id, self.Path
+        )
+
+
+class UserDirectory:
+    """
+    Per-run index of the System/Policies user table.
+
+    The table is fetched once and looked up by GroupUserName. Lookups are
+    case-insensitive and domain-aware: "DOMAIN\\user" matches exactly, while a
+    bare "user" matches the domain qualified entry if only one domain has it.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], List[SystemPolicies]],
+        ttl: Optional[int] = None,
+        report: Optional[PowerBiReportServerDashboardSourceReport] = None,
+        report_lock: Optional[threading.Lock] = None,
+    ) -> None:
+        self.__fetch = fetch
+        self.__ttl = ttl
+        self.__report = report
+        self.__report_lock = report_lock or threading.Lock()
+        self.__lock = threading.Lock()
+        self.__loaded_at: Optional[float] = None
+        self.__by_name: Dict[str, SystemPolicies] = {}
+        self.__by_account: Dict[str, Optional[SystemPolicies]] = {}
+
+    @staticmethod
+    def normalize(user_name: str) -> str:
+        return user_name.strip().lower()
+
+    @staticmethod
+    def account_name(user_name: str) -> str:
+        return user_name.split("\\")[-1]
+
+    def __is_stale(self) -> bool:
+        if self.__loaded_at is None:
+            return True
+        if self.__ttl is None:
+            return False
+        return time.monotonic() - self.__loaded_at > self.__ttl
+
+    def __load(self) -> None:
+        by_name: Dict[str, SystemPolicies] = {}
+        by_account: Dict[str, Optional[SystemPolicies]] = {}
+        for user in self.__fetch():
+            key = self.normalize(user.GroupUserName)
+            by_name[key] = user
+            account = self.account_name(key)
+            # Same account name in several domains can't be resolved without domain
+            if account in by_account and by_account[account] is not user:
+                by_account[account] = None
+            else:
+                by_account[account] = user
+        self.__by_name = by_name
+        self.__by_account = by_account
+        self.__loaded_at = time.monotonic()
+
+    def refresh(self) -> None:
+        with self.__lock:
+            self.__load()
+
+    def get(self, user_name: Optional[str]) -> Optional[SystemPolicies]:
+        if user_name is None:
             return None
 
-        dataset_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.DATASET
-        ]
-        # Replace place holders
-        dataset_get_endpoint = dataset_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            DATASET_ID=dataset_id,
+        with self.__lock:
+            stale = self.__is_stale()
+            if stale:
+                self.__load()
+            if self.__report is not None:
+                with self.__report_lock:
+                    if stale:
+                        self.__report.report_user_cache_miss()
+                    else:
+                        self.__report.report_user_cache_hit()
+            by_name = self.__by_name
+            by_account = self.__by_account
+
+        key = self.normalize(user_name)
+        user = by_name.get(key)
+        if user is None:
+            if "\\" in key:
+                # Policy might be granted to the bare account name
+                user = by_name.get(self.account_name(key))
+            else:
+                user = by_account.get(key)
+        return user
+
+
+def next_page_request(
+    config: PowerBiReportServerAPIConfig,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    members: Dict[str, Any],
+    count: int,
+) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Request of the page following the one with OData members and count items
+    """
+    # Server driven paging
+    next_link: Optional[str] = members.get(Constant.ODATA_NEXT_LINK)
+    if next_link:
+        return next_link, None
+
+    # Client driven paging, a short page is the last one
+    page_size = config.page_size
+    if params and page_size > 0 and count == page_size:
+        next_params = dict(params)
+        next_params[Constant.ODATA_SKIP] = params[Constant.ODATA_SKIP] + page_size
+        return url, next_params
+
+    return None
+
+
+def backoff_delay(
+    config: PowerBiReportServerAPIConfig, attempt: int, retry_after: Optional[str]
+) -> float:
+    """
+    Time to wait before retry, Retry-After wins over exponential backoff
+    """
+    backoff_max = config.retry_backoff_max
+    if retry_after:
+        try:
+            return min(float(retry_after), backoff_max)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+                return min(max(delay, 0.0), backoff_max)
+            except (TypeError, ValueError):
+                pass
+    # Exponential backoff with full jitter
+    return random.uniform(
+        0, min(backoff_max, config.retry_backoff_factor * 2 ** attempt)
+    )
+
+
+class PowerBiReportServerAPI:
+    # API endpoints of PowerBi Report Server to fetch reports, datasets
+    API_ENDPOINTS = {
+        Constant.CATALOG_ITEM: "{PBIRS_BASE_URL}/CatalogItems({CATALOG_ID})",
+        Constant.DATASETS: "{PBIRS_BASE_URL}/Datasets",
+        Constant.DATASET: "{PBIRS_BASE_URL}/Datasets({DATASET_ID})",
+        Constant.DATASET_DATASOURCES: "{PBIRS_BASE_URL}/Datasets({DATASET_ID})/DataSources",
+        Constant.DATASOURCE: "{PBIRS_BASE_URL}/DataSources({DATASOURCE_ID})",
+        Constant.EXCEL_WORKBOOK: "{PBIRS_BASE_URL}/ExcelWorkbooks({EXCEL_WORKBOOK_ID})",
+        Constant.EXTENSIONS: "{PBIRS_BASE_URL}/Extensions",
+        Constant.FAVORITE_ITEM: "{PBIRS_BASE_URL}/FavoriteItems({FAVORITE_ITEM_ID})",
+        Constant.FOLDERS: "{PBIRS_BASE_URL}/Folders({FOLDER_ID})",
+        Constant.FOLDER_CATALOG_ITEMS: "{PBIRS_BASE_URL}/Folders({FOLDER_ID})/CatalogItems",
+        Constant.KPIS: "{PBIRS_BASE_URL}/Kpis({KPI_ID})",
+        Constant.LINKED_REPORTS: "{PBIRS_BASE_URL}/LinkedReports",
+        Constant.LINKED_REPORT: "{PBIRS_BASE_URL}/LinkedReports({LINKED_REPORT_ID})",
+        Constant.ME: "{PBIRS_BASE_URL}/Me",
+        Constant.MOBILE_REPORTS: "{PBIRS_BASE_URL}/MobileReports",
+        Constant.MOBILE_REPORT: "{PBIRS_BASE_URL}/MobileReports({MOBILE_REPORT_ID})",
+        Constant.POWERBI_REPORTS: "{PBIRS_BASE_URL}/PowerBiReports",
+        Constant.POWERBI_REPORT: "{PBIRS_BASE_URL}/PowerBiReports({POWERBI_REPORT_ID})",
+        Constant.REPORTS: "{PBIRS_BASE_URL}/Reports",
+        Constant.REPORT: "{PBIRS_BASE_URL}/Reports({REPORT_ID})",
+        Constant.REPORT_DATASOURCES: "{PBIRS_BASE_URL}/Reports({REPORT_ID})/DataSources",
+        Constant.REPORT_SHARED_DATASETS: "{PBIRS_BASE_URL}/Reports({REPORT_ID})/SharedDataSets",
+        Constant.POWERBI_REPORT_DATASOURCES: "{PBIRS_BASE_URL}/PowerBiReports({POWERBI_REPORT_ID})/DataSources",
+        Constant.REPORT_CONTENT: "{PBIRS_BASE_URL}/Reports({REPORT_ID})/Content/$value",
+        Constant.POWERBI_REPORT_CONTENT: "{PBIRS_BASE_URL}/PowerBiReports({POWERBI_REPORT_ID})/Content/$value",
+        Constant.RESOURCE: "{PBIRS_BASE_URL}/Resources({RESOURCE_GET})",
+        Constant.SESSION: "{PBIRS_BASE_URL}/Session",
+        Constant.SUBSCRIPTION: "{PBIRS_BASE_URL}/Subscriptions({SUBSCRIPTION_ID})",
+        Constant.SYSTEM: "{PBIRS_BASE_URL}/System",
+        Constant.SYSTEM_POLICIES: "{PBIRS_BASE_URL}/System/Policies",
+    }
+
+    # Listings deciding which reports are ingested and which are removed as
+    # stale, the response cache revalidates them on every request
+    CATALOG_LISTINGS = frozenset(
+        (
+            Constant.DATASETS,
+            Constant.FOLDER_CATALOG_ITEMS,
+            Constant.LINKED_REPORTS,
+            Constant.MOBILE_REPORTS,
+            Constant.POWERBI_REPORTS,
+            Constant.REPORTS,
         )
-        # Hit PowerBiReportServer
-        LOGGER.info("Request to dataset URL={}".format(dataset_get_endpoint))
-        response = requests.get(
-            url=dataset_get_endpoint, auth=self.get_auth_credentials()
+    )
+
+    def __init__(
+        self,
+        config: PowerBiReportServerAPIConfig,
+        report: Optional[PowerBiReportServerDashboardSourceReport] = None,
+        report_lock: Optional[threading.Lock] = None,
+    ) -> None:
+        self.__config: PowerBiReportServerAPIConfig = config
+        self.__report = report
+        # Shared with the source and other clients updating the same report
+        self.__report_lock = report_lock or threading.Lock()
+        self.__auth: HttpNtlmAuth = HttpNtlmAuth(
+            "{}\\{}".format(self.__config.workstation_name, self.__config.username),
+            self.__config.password,
+        )
+        self.__decoder: ModelDecoder = ModelDecoder(
+            validate=self.__config.validate_payloads
+        )
+        self.__endpoints: EndpointRegistry = EndpointRegistry(
+            self.__config.get_base_api_url, PowerBiReportServerAPI.API_ENDPOINTS
+        )
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        # Marks threads of the executor
+        self.__worker = threading.local()
+        if self.__config.max_workers > 1:
+            self.__executor = ThreadPoolExecutor(
+                max_workers=self.__config.max_workers,
+                thread_name_prefix="pbirs",
+                initializer=functools.partial(setattr, self.__worker, "active", True),
+            )
+        self.__session_pool: SessionPool = SessionPool(
+            auth=self.__auth,
+            size=max(self.__config.session_pool_size, self.__config.max_workers),
+            connection_pool_maxsize=self.__config.connection_pool_maxsize,
+            max_requests=self.__config.keep_alive_max_requests,
+            idle_timeout=self.__config.keep_alive_idle_timeout,
+        )
+        self.__response_cache: Optional[ResponseCache] = None
+        if self.__config.response_cache_path:
+            self.__response_cache = ResponseCache(
+                path=self.__config.response_cache_path,
+                max_size=self.__config.response_cache_max_size_mb * 1024 * 1024,
+                ttl=self.__config.response_cache_ttl,
+            )
+        self.__user_directory: UserDirectory = UserDirectory(
+            fetch=self.get_users_policies,
+            ttl=self.__config.users_cache_ttl,
+            report=report,
+            report_lock=self.__report_lock,
+        )
+        self.__tracer = Tracer(self.__config.opentelemetry_spans)
+        self.__circuit_breaker = CircuitBreaker(
+            threshold=self.__config.circuit_breaker_threshold,
+            reset_timeout=self.__config.circuit_breaker_reset_timeout,
+        )
+        self.__throttle = RequestThrottle(
+            max_in_flight=self.__config.max_in_flight or self.__config.max_workers,
+            requests_per_second=self.__config.requests_per_second,
+            adaptive=self.__config.adaptive_concurrency,
+            latency_target=self.__config.adaptive_latency_target,
+            error_rate_threshold=self.__config.adaptive_error_rate_threshold,
+            window=self.__config.adaptive_window,
+            on_limit_change=(
+                report.report_max_in_flight_limit if report is not None else None
+            ),
+        )
+
+    def get_auth_credentials(self):
+        return self.__auth
+
+    def __backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """
+        Time to wait before retry, Retry-After wins over exponential backoff
+        """
+        return backoff_delay(
+            self.__config,
+            attempt,
+            response.headers.get("Retry-After") if response is not None else None,
+        )
+
+    def __report_request(self, latency: float, retries: int, failed: bool) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_request(latency, retries, failed)
+
+    def __report_attempt(
+        self,
+        endpoint: Optional[str],
+        url: str,
+        latency: float,
+        response: Optional[requests.Response],
+        stream: bool,
+    ) -> None:
+        status_code = response.status_code if response is not None else None
+        self.__tracer.record(
+            "pbirs.request",
+            latency,
+            endpoint=endpoint,
+            url=url,
+            status_code=status_code,
+        )
+        if self.__report is not None:
+            # Streamed bodies are counted as they are read
+            size = len(response.content) if response is not None and not stream else 0
+            with self.__report_lock:
+                self.__report.report_endpoint_request(
+                    endpoint, latency, status_code, size
+                )
+
+    def __report_bytes(self, endpoint: Optional[str], count: int) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_endpoint_bytes(endpoint, count)
+
+    def __report_parse(self, endpoint: Optional[str], seconds: float) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_endpoint_parse(endpoint, seconds)
+
+    def __report_throttled(self, seconds: float) -> None:
+        if self.__report is not None and seconds > 0:
+            with self.__report_lock:
+                self.__report.report_throttled(seconds)
+
+    def get(
+        self, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> requests.Response:
+        """
+        Issue GET request, answered from the response cache when possible
+        """
+        if self.__response_cache is None:
+            return self.__request(url, params)
+
+        key = ResponseCache.key(url, params)
+        entry = self.__response_cache.lookup(key)
+        listing = (
+            self.__endpoints.endpoint_of(url) in PowerBiReportServerAPI.CATALOG_LISTINGS
+        )
+        if entry is not None and not listing and self.__response_cache.is_fresh(entry):
+            self.__report_response_cache(hit=True, revalidated=False)
+            return entry.to_response()
+
+        response = self.__request(
+            url, params, entry.conditional_headers() if entry is not None else None
+        )
+        if response.status_code == 304 and entry is not None:
+            self.__response_cache.touch(key, entry, response.headers)
+            self.__report_response_cache(hit=True, revalidated=True)
+            return entry.to_response()
+
+        self.__report_response_cache(hit=False, revalidated=False)
+        # Listings without validators could never be served from the cache
+        if response.status_code == 200 and (
+            not listing
+            or any(name in response.headers for name in ResponseCache.VALIDATOR_HEADERS)
+        ):
+            self.__response_cache.store(
+                key, response.url, response.headers, response.content
+            )
+        return response
+
+    def __report_response_cache(self, hit: bool, revalidated: bool) -> None:
+        if self.__report is not None:
+            with self.__report_lock:
+                if hit:
+                    self.__report.report_response_cache_hit(revalidated)
+                else:
+                    self.__report.report_response_cache_miss()
+
+    def __request(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        Issue GET request on a pooled keep-alive session.
+
+        Connection errors and retryable statuses are retried with backoff, 401 is
+        retried once on a new session to renegotiate NTLM. Failing requests
+        trip the circuit breaker which then rejects requests for a while.
+        """
+        if not self.__circuit_breaker.allow():
+            if self.__report is not None:
+                with self.__report_lock:
+                    self.__report.report_circuit_breaker_rejection()
+            raise CircuitBreakerOpenError(
+                "Power BI Report Server keeps failing, request to {} rejected".format(
+                    url
+                )
+            )
+
+        settled = False
+        try:
+            timeout = (self.__config.connect_timeout, self.__config.scan_timeout)
+            endpoint = self.__endpoints.endpoint_of(url)
+            started_at = time.monotonic()
+            renegotiated = False
+            attempt = 0
+            while True:
+                response: Optional[requests.Response] = None
+                error: Optional[Exception] = None
+                with self.__throttle.slot() as throttled:
+                    self.__report_throttled(throttled)
+                    attempt_started_at = time.monotonic()
+                    with self.__session_pool.session() as pooled:
+                        try:
+                            response = pooled.session.get(
+                                url=url,
+                                params=params,
+                                headers=headers,
+                                timeout=timeout,
+                                stream=stream,
+                            )
+                        except (requests.Timeout, requests.ConnectionError) as e:
+                            pooled.discard = True
+                            error = e
+                        if response is not None and response.status_code == 401:
+                            pooled.discard = True
+                latency = time.monotonic() - attempt_started_at
+                self.__throttle.record(
+                    latency, response.status_code if response is not None else None
+                )
+                self.__report_attempt(endpoint, url, latency, response, stream)
+
+                if (
+                    response is not None
+                    and response.status_code == 401
+                    and not renegotiated
+                ):
+                    renegotiated = True
+                    LOGGER.info("Renegotiating NTLM for URL={}".format(url))
+                    response.close()
+                    continue
+
+                # Without response the request failed with error
+                retryable = (
+                    response is None
+                    or response.status_code in self.__config.retry_status_codes
+                )
+                if not retryable or attempt >= self.__config.max_retries:
+                    break
+
+                delay = self.__backoff(attempt, response)
+                LOGGER.info(
+                    "Retrying URL={} in {:.2f}s after {}".format(
+                        url, delay, error if response is None else response.status_code
+                    )
+                )
+                if response is not None:
+                    response.close()
+                attempt += 1
+                time.sleep(delay)
+
+            self.__report_request(time.monotonic() - started_at, attempt, retryable)
+            if retryable:
+                self.__circuit_breaker.record_failure()
+            else:
+                self.__circuit_breaker.record_success()
+            settled = True
+        finally:
+            # Unexpected errors must not leave the trial request in flight
+            if not settled:
+                self.__circuit_breaker.release()
+
+        if response is None:
+            raise ConnectionError(
+                "Request to {} failed after {} retries ({})".format(url, attempt, error)
+            ) from error
+        return response
+
+    def map_ordered(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        """
+        Run fn over items with the configured concurrency keeping input order
+        """
+        return ordered_map(
+            fn,
+            items,
+            executor=self.__executor,
+            max_in_flight=2 * self.__config.max_workers,
         )
+
+    def __select_params(self, model: Any) -> Dict[str, Any]:
+        """
+        OData $select of fields declared by model
+        """
+        select_fields = getattr(model, "SELECT_FIELDS", ())
+        if not self.__config.field_projection or not select_fields:
+            return {}
+        return {Constant.ODATA_SELECT: ",".join(select_fields)}
+
+    def __submit(self, fn: Callable[..., R], *args: Any) -> Callable[[], R]:
+        """
+        Start fn on the executor if any, the returned callable waits for its result
+        """
+        # Waiting in a worker for another task of the same pool could deadlock
+        if self.__executor is None or getattr(self.__worker, "active", False):
+            return functools.partial(fn, *args)
+        return self.__executor.submit(fn, *args).result
+
+    def close(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+        self.__session_pool.close()
+        if self.__response_cache is not None:
+            self.__response_cache.close()
+
+    def fetch_one(self, endpoint: str, model: Type[M], **keys: str) -> M:
+        """
+        Fetch single item of API_ENDPOINTS and parse it to model
+        """
+        url = self.__endpoints.url(endpoint, **keys)
+        LOGGER.debug("Request to URL={}".format(url))
+        response = self.get(url, params=self.__select_params(model))
+
         # Check if we got response from PowerBi
         if response.status_code != 200:
-            message: str = "Failed to fetch dataset from power-bi-report-server for"
+            message: str = "Failed to fetch {} from power-bi-report-server for".format(
+                model.__name__
+            )
             LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.DatasetId, dataset_id))
+            LOGGER.warning("URL={}, http_status={}".format(url, response.status_code))
             raise ConnectionError(message)
 
-        response_dict = response.json()
+        started_at = time.perf_counter()
+        item = self.__decoder.decode(model, loads(response.content))
+        self.__report_parse(endpoint, time.perf_counter() - started_at)
+        return item
+
+    def get_users_policies(self) -> List[SystemPolicies]:
+        """
+        Get user policy by Power Bi Report Server System
+        """
+        return list(
+            self.fetch_many(Constant.SYSTEM_POLICIES, SystemPolicies, paged=False)
+        )
 
-        # PowerBi Always return the webURL,
-        # in-case if it is None then setting complete webURL to None instead of None/details
-        return DataSet.parse_obj(response_dict)
+    def get_user_policies(self, user_name: Optional[str]) -> Optional[SystemPolicies]:
+        """
+        Lookup user policy in the cached System/Policies user table, reports
+        without CreatedBy have no owner
+        """
+        return self.__user_directory.get(user_name)
 
-    def get_data_source(self, dataset: DataSet) -> Any:
+    def get_report(self, report_id: str) -> Optional[Report]:
         """
-        Fetch the data source from PowerBi for the given dataset
+        Fetch the .rdl report from PowerBiReportServer for the given report id
         """
+        if report_id is None:
+            return None
+        return self.fetch_one(Constant.REPORT, Report, REPORT_ID=report_id)
 
-        datasource_get_endpoint: str = PowerBiReportServerAPI.API_ENDPOINTS[
-            Constant.DATASET_DATASOURCES
-        ]
-        # Replace place holders
-        datasource_get_endpoint = datasource_get_endpoint.format(
-            PBIRS_BASE_URL=self.__config.get_base_api_url,
-            DATASET_ID=dataset.Id,
+    def get_powerbi_report(self, report_id: str) -> Optional[PowerBiReport]:
+        """
+        Fetch the .pbix report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return self.fetch_one(
+            Constant.POWERBI_REPORT, PowerBiReport, POWERBI_REPORT_ID=report_id
+        )
+
+    def get_linked_report(self, report_id: str) -> Optional[LinkedReport]:
+        """
+        Fetch the linked report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return self.fetch_one(
+            Constant.LINKED_REPORT, LinkedReport, LINKED_REPORT_ID=report_id
         )
-        # Hit PowerBi
-        LOGGER.info("Request to datasource URL={}".format(datasource_get_endpoint))
-        response = requests.get(
-            url=datasource_get_endpoint, auth=self.get_auth_credentials()
+
+    def get_mobile_report(self, report_id: str) -> Optional[MobileReport]:
+        """
+        Fetch the mobile report from PowerBiReportServer for the given report id
+        """
+        if report_id is None:
+            return None
+        return self.fetch_one(
+            Constant.MOBILE_REPORT, MobileReport, MOBILE_REPORT_ID=report_id
         )
+
+    REPORT_TYPES_MAPPING: Dict[str, Any] = {
+        Constant.REPORTS: Report,
+        Constant.MOBILE_REPORTS: MobileReport,
+        Constant.LINKED_REPORTS: LinkedReport,
+        Constant.POWERBI_REPORTS: PowerBiReport,
+    }
+
+    # CatalogItem Type of each report type
+    CATALOG_ITEM_TYPES: Dict[str, str] = {
+        "Report": Constant.REPORTS,
+        "MobileReport": Constant.MOBILE_REPORTS,
+        "LinkedReport": Constant.LINKED_REPORTS,
+        "PowerBIReport": Constant.POWERBI_REPORTS,
+    }
+
+    # Endpoint and key field of the definition of each report type having one
+    CONTENT_ENDPOINTS: Dict[str, Tuple[str, str]] = {
+        Constant.REPORTS: (Constant.REPORT_CONTENT, "REPORT_ID"),
+        Constant.POWERBI_REPORTS: (
+            Constant.POWERBI_REPORT_CONTENT,
+            "POWERBI_REPORT_ID",
+        ),
+    }
+
+    CONTENT_FORMATS: Dict[str, str] = {
+        Constant.REPORTS: RDL,
+        Constant.POWERBI_REPORTS: PBIX,
+    }
+
+    PageRequest = Tuple[str, Optional[Dict[str, Any]]]
+
+    def __fetch_page(
+        self, endpoint: str, url: str, params: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[PageRequest]]:
+        """
+        Fetch one page of OData collection and work out the request of next page
+        """
+        # Hit PowerBiReportServer
+        LOGGER.debug("Request to collection URL={} params={}".format(url, params))
+        response = self.get(url, params=params)
+
         # Check if we got response from PowerBi
         if response.status_code != 200:
-            message: str = "Failed to fetch datasource from power-bi-report-server for"
+            message: str = "Failed to fetch collection from power-bi-report-server for"
             LOGGER.warning(message)
-            LOGGER.warning("{}={}".format(Constant.DatasetId, dataset.Id))
+            LOGGER.warning("URL={}, http_status={}".format(url, response.status_code))
             raise ConnectionError(message)
 
-        res = response.json()
-        value = res["value"]
-        if len(value) == 0:
+        started_at = time.perf_counter()
+        response_dict = loads(response.content)
+        self.__report_parse(endpoint, time.perf_counter() - started_at)
+        values: List[Dict[str, Any]] = response_dict.get(Constant.VALUE) or []
+        return values, next_page_request(
+            self.__config, url, params, response_dict, len(values)
+        )
+
+    def __iter_stream(
+        self,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        model: Type[M],
+    ) -> Iterator[M]:
+        """
+        Parse items of OData collection pages while they are downloaded
+        """
+        request: Optional[PowerBiReportServerAPI.PageRequest] = (url, params)
+        while request is not None:
+            url, params = request
+            LOGGER.debug("Stream collection URL={} params={}".format(url, params))
+            response = self.__request(url, params, stream=True)
+            parser = CollectionParser()
+            try:
+                # Check if we got response from PowerBi
+                if response.status_code != 200:
+                    message = (
+                        "Failed to fetch collection from power-bi-report-server for"
+                    )
+                    LOGGER.warning(message)
+                    LOGGER.warning(
+                        "URL={}, http_status={}".format(url, response.status_code)
+                    )
+                    raise ConnectionError(message)
+                received = 0
+                parse_seconds = 0.0
+                try:
+                    for chunk in response.iter_content(
+                        chunk_size=self.__config.stream_chunk_size
+                    ):
+                        received += len(chunk)
+                        started_at = time.perf_counter()
+                        items = [
+                            self.__decoder.decode(model, value)
+                            for value in parser.feed(chunk)
+                        ]
+                        parse_seconds += time.perf_counter() - started_at
+                        yield from items
+                    started_at = time.perf_counter()
+                    items = [
+                        self.__decoder.decode(model, value) for value in parser.close()
+                    ]
+                    parse_seconds += time.perf_counter() - started_at
+                    yield from items
+                except (requests.RequestException, ValueError) as e:
+                    raise ConnectionError(
+                        "Failed to read collection from {} ({})".format(url, e)
+                    ) from e
+                finally:
+                    self.__report_bytes(endpoint, received)
+                    self.__report_parse(endpoint, parse_seconds)
+            finally:
+                response.close()
+            request = next_page_request(
+                self.__config, url, params, parser.members, parser.count
+            )
+
+    def __iter_pages(
+        self,
+        endpoint: str,
+        page: Optional[
+            Callable[[], Tuple[List[Dict[str, Any]], Optional[PageRequest]]]
+        ],
+        model: Any,
+    ) -> Iterator[Any]:
+        while page is not None:
+            values, next_request = page()
+            # Next page is downloaded while this one is consumed
+            page = (
+                self.__submit(self.__fetch_page, endpoint, *next_request)
+                if next_request is not None
+                else None
+            )
+            # Raw items are released as soon as they are decoded
+            values.reverse()
+            parse_seconds = 0.0
+            while values:
+                started_at = time.perf_counter()
+                item = self.__decoder.decode(model, values.pop())
+                parse_seconds += time.perf_counter() - started_at
+                yield item
+            self.__report_parse(endpoint, parse_seconds)
+
+    def fetch_many(
+        self,
+        endpoint: str,
+        model: Type[M],
+        params: Optional[Dict[str, Any]] = None,
+        paged: bool = True,
+        **keys: str,
+    ) -> Iterator[M]:
+        """
+        Iterate over OData collection of API_ENDPOINTS page by page.
+
+        The first page is requested right away when running concurrently,
+        items are parsed to model as they are consumed. Navigation collections
+        of a single item are small and fetched with paged=False.
+        """
+        collection_endpoint = self.__endpoints.url(endpoint, **keys)
+        params = {**self.__select_params(model), **(params or {})}
+        if paged and self.__config.page_size > 0:
+            params.update(
+                {
+                    Constant.ODATA_TOP: self.__config.page_size,
+                    Constant.ODATA_SKIP: 0,
+                    # Stable order is needed to page with $skip
+                    Constant.ODATA_ORDER_BY: "Id",
+                }
+            )
+        if self.__config.stream_collections:
+            return self.__iter_stream(endpoint, collection_endpoint, params, model)
+        first_page = self.__submit(
+            self.__fetch_page, endpoint, collection_endpoint, params
+        )
+        return self.__iter_pages(endpoint, first_page, model)
+
+    def get_all_reports(
+        self, modified_since: Optional[Dict[str, datetime]] = None
+    ) -> Iterator[Any]:
+        """
+        Stream all reports from PowerBiReportServer.
+
+        modified_since limits each report type to items modified after the
+        given datetime.
+        """
+        modified_since = modified_since or {}
+
+        # All collections start downloading before the first one is consumed
+        collections = []
+        for report_type, model in PowerBiReportServerAPI.REPORT_TYPES_MAPPING.items():
+            params: Dict[str, Any] = {}
+            if modified_since.get(report_type) is not None:
+                params[Constant.ODATA_FILTER] = "ModifiedDate gt {}".format(
+                    to_odata_datetime(modified_since[report_type])
+                )
+            collections.append(
+                (report_type, self.fetch_many(report_type, model, params))
+            )
+
+        for report_type, collection in collections:
+            try:
+                yield from collection
+            except ConnectionError as e:
+                message = "Failed to fetch {} ({})".format(report_type, e)
+                LOGGER.warning(message)
+                if self.__report is not None:
+                    with self.__report_lock:
+                        self.__report.report_failure(report_type, message)
+
+    def __list_folder(self, folder: Tuple[str, str]) -> List[CatalogItem]:
+        folder_id, folder_path = folder
+        if self.__report is not None:
+            with self.__report_lock:
+                self.__report.report_folder_listed()
+        try:
+            return list(
+                self.fetch_many(
+                    Constant.FOLDER_CATALOG_ITEMS, CatalogItem, FOLDER_ID=folder_id
+                )
+            )
+        except ConnectionError as e:
+            message = "Failed to list folder {} ({})".format(folder_path, e)
+            LOGGER.warning(message)
+            if self.__report is not None:
+                with self.__report_lock:
+                    self.__report.report_failure(folder_path, message)
+            return []
+
+    def walk_catalog(self, is_pruned: Callable[[str], bool]) -> Iterator[CatalogItem]:
+        """
+        Walk the folder tree breadth first from the root folder.
+
+        Items other than folders are yielded. Folders of a level are listed
+        concurrently, the subtree of a folder whose path is_pruned is never
+        listed.
+        """
+        folders: List[Tuple[str, str]] = [(ROOT_FOLDER_KEY, "/")]
+        while folders:
+            subfolders: List[Tuple[str, str]] = []
+            for items in self.map_ordered(self.__list_folder, folders):
+                for item in items:
+                    if item.Type != Constant.FOLDER_TYPE:
+                        yield item
+                    elif is_pruned(item.Path):
+                        LOGGER.debug("Pruned folder {}".format(item.Path))
+                        if self.__report is not None:
+                            with self.__report_lock:
+                                self.__report.report_folder_pruned()
+                    else:
+                        subfolders.append((item.Id, item.Path))
+            folders = subfolders
+
+    def get_dataset(self, dataset_id: str) -> Optional[DataSet]:
+        """
+        Fetch the dataset from PowerBi for the given dataset identifier
+        """
+        if dataset_id is None:
+            return None
+        return self.fetch_one(Constant.DATASET, DataSet, DATASET_ID=dataset_id)
+
+    def get_data_source(self, dataset: DataSet) -> Any:
+        """
+        Fetch the data source from PowerBi for the given dataset
+        """
+        data_sources = self.get_dataset_data_sources(dataset.Id)
+        if len(data_sources) == 0:
             LOGGER.info(
                 "datasource is not found for dataset {}({})".format(
                     dataset.Name, dataset.Id
@@ -693,20 +2435,147 @@ class PowerBiReportServerAPI:
             )
             return None
         # Consider only zero index datasource
-        datasource_dict = value[0]
-        # Create datasource instance with basic detail available
-        datasource = DataSource.parse_obj(datasource_dict)
-
-        # Check if datasource is relational as per our relation mapping
-        if self.__config.dataset_type_mapping.get(datasource.Type) is not None:
-            # Now set the database detail as it is relational data source
-            datasource.MetaData = MetaData(is_relational=True)
-            datasource.database = datasource_dict["connectionDetails"]["database"]
-            datasource.server = datasource_dict["connectionDetails"]["server"]
+        return data_sources[0]
+
+    def __to_data_sources(self, data_sources: Iterable[DataSource]) -> List[DataSource]:
+        result: List[DataSource] = []
+        for data_source in data_sources:
+            # Check if datasource is relational as per our relation mapping
+            platform = self.__config.get_dataset_platform(data_source.get_type())
+            data_source.MetaData = MetaData(is_relational=platform is not None)
+            result.append(data_source)
+        return result
+
+    def get_dataset_data_sources(self, dataset_id: str) -> List[DataSource]:
+        """
+        Fetch the data sources of the given dataset
+        """
+        return self.__to_data_sources(
+            self.fetch_many(
+                Constant.DATASET_DATASOURCES,
+                DataSource,
+                paged=False,
+                DATASET_ID=dataset_id,
+            )
+        )
+
+    def get_report_datasets(self, report_id: str) -> List[DataSet]:
+        """
+        Fetch the shared datasets used by the given .rdl report
+        """
+        return list(
+            self.fetch_many(
+                Constant.REPORT_SHARED_DATASETS,
+                DataSet,
+                paged=False,
+                REPORT_ID=report_id,
+            )
+        )
+
+    def get_report_data_sources(
+        self, report_type: str, report_id: str
+    ) -> List[DataSource]:
+        """
+        Fetch the data sources embedded in the given report
+        """
+        if report_type == Constant.REPORTS:
+            collection = self.fetch_many(
+                Constant.REPORT_DATASOURCES,
+                DataSource,
+                paged=False,
+                REPORT_ID=report_id,
+            )
+        elif report_type == Constant.POWERBI_REPORTS:
+            collection = self.fetch_many(
+                Constant.POWERBI_REPORT_DATASOURCES,
+                DataSource,
+                paged=False,
+                POWERBI_REPORT_ID=report_id,
+            )
         else:
-            datasource.MetaData = MetaData(is_relational=False)
+            return []
+        return self.__to_data_sources(collection)
+
+    def download_content(self, report_type: str, report_id: str) -> str:
+        """
+        Stream the definition of report to a temporary file and return its
+        path, the caller removes the file
+        """
+        endpoint, key = PowerBiReportServerAPI.CONTENT_ENDPOINTS[report_type]
+        url = self.__endpoints.url(endpoint, **{key: report_id})
+        LOGGER.debug("Download content URL={}".format(url))
+        response = self.__request(url, stream=True)
+        try:
+            # Check if we got response from PowerBi
+            if response.status_code != 200:
+                message = (
+                    "Failed to download report content from power-bi-report-server for"
+                )
+                LOGGER.warning(message)
+                LOGGER.warning(
+                    "URL={}, http_status={}".format(url, response.status_code)
+                )
+                raise ConnectionError(message)
+            fd, path = tempfile.mkstemp(
+                prefix="pbirs-",
+                suffix=".{}".format(
+                    PowerBiReportServerAPI.CONTENT_FORMATS[report_type]
+                ),
+                dir=self.__config.content_directory,
+            )
+            received = 0
+            try:
+                with os.fdopen(fd, "wb") as content_file:
+                    for chunk in response.iter_content(
+                        chunk_size=self.__config.stream_chunk_size
+                    ):
+                        received += len(chunk)
+                        content_file.write(chunk)
+            except requests.RequestException as e:
+                os.unlink(path)
+                raise ConnectionError(
+                    "Failed to download content from {} ({})".format(url, e)
+                ) from e
+            except BaseException:
+                os.unlink(path)
+                raise
+            finally:
+                self.__report_bytes(endpoint, received)
+        finally:
+            response.close()
+        return path
+
+
+class WorkUnitDeduplicator:
+    """
+    Run-wide index of emitted aspects keyed by (entity URN, aspect name).
 
-        return datasource
+    Only a content digest of each aspect is kept, so an aspect is emitted
+    when it is seen for the first time or its content changed during the run.
+    """
+
+    def __init__(self) -> None:
+        self.__digests: Dict[Tuple[str, str], bytes] = {}
+
+    @staticmethod
+    def digest(mcp: MetadataChangeProposalWrapper) -> bytes:
+        aspect = mcp.aspect.to_obj() if mcp.aspect is not None else None
+        return hashlib.blake2b(
+            json.dumps(aspect, sort_keys=True, default=str).encode("utf-8"),
+            digest_size=16,
+        ).digest()
+
+    def is_new(self, workunit: MetadataWorkUnit) -> bool:
+        mcp = workunit.metadata
+        if not isinstance(mcp, MetadataChangeProposalWrapper):
+            return True
+
+        key = (str(mcp.entityUrn), str(mcp.aspectName))
+        digest = self.digest(mcp)
+        if self.__digests.get(key) == digest:
+            return False
+        self.__digests[key] = digest
+        return True
 
 
 class Mapper:
@@ -721,10 +2590,13 @@ class Mapper:
         """
 
         def __eq__(self, instance):
-            return self.id == self.id
+            return (
+                isinstance(instance, Mapper.EquableMetadataWorkUnit)
+                and self.id == instance.id
+            )
 
         def __hash__(self):
-            return id(self.id)
+            return hash(self.id)
 
     def __init__(self, config: PowerBiDashboardSourceConfig):
         self.__config = config
@@ -760,6 +2632,20 @@ class Mapper:
             mcp=mcp,
         )
 
+    def to_removed_work_unit(self, urn: str) -> EquableMetadataWorkUnit:
+        """
+        Soft-delete entity emitted by an earlier run
+        """
+        return self.__to_work_unit(
+            self.new_mcp(
+                # urn:li:<entity type>:<key>
+                entity_type=urn.split(":", 3)[2],
+                entity_urn=urn,
+                aspect_name=Constant.STATUS,
+                aspect=StatusClass(removed=True),
+            )
+        )
+
     @staticmethod
     def to_urn_set(mcps: List[MetadataChangeProposalWrapper]) -> List[str]:
         return list(
@@ -772,11 +2658,118 @@ class Mapper:
             )
         )
 
+    def to_chart_urn(self, report: CatalogRecord, visual: Visual) -> str:
+        return builder.make_chart_urn(
+            self.__config.platform_name,
+            "{}.{}".format(report.get_urn_part(), visual.name),
+        )
+
+    @staticmethod
+    def to_user_urn(user: SystemPolicies) -> str:
+        return builder.make_user_urn(user.get_urn_part())
+
+    def to_dataset_urn(self, dataset: DataSet) -> str:
+        return builder.make_dataset_urn(
+            self.__config.platform_name, dataset.get_urn_part(), self.__config.env
+        )
+
+    def to_upstream_urn(self, data_source: DataSource) -> Optional[str]:
+        """
+        URN of the upstream dataset of relational data source.
+
+        The table is only known when the connection string names it, e.g.
+        Table=dbo.Sales, otherwise the URN is the one of the database.
+        """
+        if data_source.MetaData is None or not data_source.MetaData.is_relational:
+            return None
+        platform = self.__config.get_dataset_platform(data_source.get_type())
+        database = data_source.get_database()
+        table = data_source.get_table()
+        name: Optional[str] = table or database or data_source.get_server()
+        if database is not None and table is not None:
+            name = "{}.{}".format(database, table)
+        if platform is None or name is None:
+            return None
+        return builder.make_dataset_urn(platform, name, self.__config.env)
+
+    def to_upstream_urns(self, data_sources: Iterable[DataSource]) -> List[str]:
+        return list(
+            OrderedSet(
+                [
+                    urn
+                    for urn in map(self.to_upstream_urn, data_sources)
+                    if urn is not None
+                ]
+            )
+        )
+
+    def to_datahub_dataset(
+        self, dataset: DataSet, data_sources: List[DataSource]
+    ) -> List[MetadataChangeProposalWrapper]:
+        """
+        Map PowerBiReportServer shared dataset to datahub dataset
+        """
+        dataset_urn = self.to_dataset_urn(dataset)
+
+        properties_mcp = self.new_mcp(
+            entity_type=Constant.DATASET_ENTITY,
+            entity_urn=dataset_urn,
+            aspect_name=Constant.DATASET_PROPERTIES,
+            aspect=DatasetPropertiesClass(
+                name=dataset.Name,
+                description=dataset.Description,
+                customProperties={"path": dataset.Path},
+            ),
+        )
+
+        # removed status mcp
+        status_mcp = self.new_mcp(
+            entity_type=Constant.DATASET_ENTITY,
+            entity_urn=dataset_urn,
+            aspect_name=Constant.STATUS,
+            aspect=StatusClass(removed=False),
+        )
+
+        mcps = [properties_mcp, status_mcp]
+
+        upstream_urns = self.to_upstream_urns(data_sources)
+        if upstream_urns:
+            mcps.append(
+                self.new_mcp(
+                    entity_type=Constant.DATASET_ENTITY,
+                    entity_urn=dataset_urn,
+                    aspect_name=Constant.UPSTREAM_LINEAGE,
+                    aspect=UpstreamLineageClass(
+                        upstreams=[
+                            UpstreamClass(
+                                dataset=upstream_urn,
+                                type=DatasetLineageTypeClass.TRANSFORMED,
+                            )
+                            for upstream_urn in upstream_urns
+                        ]
+                    ),
+                )
+            )
+
+        return mcps
+
+    def to_dataset_work_units(
+        self, dataset: DataSet, data_sources: List[DataSource]
+    ) -> Set[EquableMetadataWorkUnit]:
+        """
+        Map shared dataset to work units, emitted once per run
+        """
+        work_units = map(
+            self.__to_work_unit, self.to_datahub_dataset(dataset, data_sources)
+        )
+        return OrderedSet([wu for wu in work_units if wu is not None])
+
     def __to_datahub_dashboard(
         self,
-        report: Report,
+        report: CatalogRecord,
         chart_mcps: List[MetadataChangeProposalWrapper],
-        user_mcps: List[MetadataChangeProposalWrapper],
+        user_urn_list: List[str],
+        dataset_urn_list: Optional[List[str]] = None,
     ) -> List[MetadataChangeProposalWrapper]:
         """
         Map PowerBi dashboard to Datahub dashboard
@@ -787,18 +2780,30 @@ class Mapper:
         )
 
         chart_urn_list: List[str] = self.to_urn_set(chart_mcps)
-        user_urn_list: List[str] = self.to_urn_set(user_mcps)
 
         def chart_custom_properties(
-            _report: Report,
+            _report: CatalogRecord,
         ) -> dict:
-            return {
-                "chartCount": 0,  # str(len(dashboard.tiles)), couldn't count charts
+            properties = {
+                "chartCount": str(len(chart_urn_list)),
                 "workspaceName": "",
                 "workspaceId": _report.Id,
             }
+            definition = _report.Definition
+            if definition is not None and definition.parameters:
+                properties["parameters"] = ", ".join(definition.parameters)
+            if definition is not None and definition.data_sources:
+                properties["dataSources"] = ", ".join(
+                    data_source.reference or data_source.name
+                    for data_source in definition.data_sources
+                )
+            return properties
 
-        # DashboardInfo mcp
+        # DashboardInfo mcp, datasets is only known to acryl-datahub 0.8.45 and
+        # later so it is left out unless lineage was extracted
+        lineage_kwargs: Dict[str, Any] = (
+            {"datasets": dataset_urn_list} if dataset_urn_list else {}
+        )
         dashboard_info_cls = DashboardInfoClass(
             description=report.Name or "",
             title=report.Name or "",
@@ -806,6 +2811,7 @@ class Mapper:
             lastModified=ChangeAuditStamps(),
             dashboardUrl=report.Path,  # should be werbUrl
             customProperties={**chart_custom_properties(report)},
+            **lineage_kwargs,
         )
 
         info_mcp = self.new_mcp(
@@ -852,9 +2858,9 @@ class Mapper:
             aspect=ownership,
         )
 
-        # Dashboard browsePaths
+        # Dashboard browsePaths, following the folder of the report
         browse_path = BrowsePathsClass(
-            paths=["/powerbi/{}".format(self.__config.platform_name)]
+            paths=["/powerbi/{}{}".format(self.__config.platform_name, report.Folder)]
         )
         browse_path_mcp = self.new_mcp(
             entity_type=Constant.DASHBOARD,
@@ -871,6 +2877,62 @@ class Mapper:
             owner_mcp,
         ]
 
+    def to_datahub_charts(
+        self, report: CatalogRecord
+    ) -> List[MetadataChangeProposalWrapper]:
+        """
+        Map visuals of report definition to Datahub charts
+        """
+        mcps: List[MetadataChangeProposalWrapper] = []
+        if report.Definition is None:
+            return mcps
+        for visual in report.Definition.visuals:
+            title = visual.title or visual.name
+            if not self.__config.chart_pattern.allowed(title):
+                continue
+            chart_urn = self.to_chart_urn(report, visual)
+            custom_properties = {"visualType": visual.type}
+            if visual.page is not None:
+                custom_properties["page"] = visual.page
+            if visual.dataset is not None:
+                custom_properties["dataset"] = visual.dataset
+            if visual.fields:
+                custom_properties["fields"] = ", ".join(visual.fields)
+
+            info_mcp = self.new_mcp(
+                entity_type=Constant.CHART,
+                entity_urn=chart_urn,
+                aspect_name=Constant.CHART_INFO,
+                aspect=ChartInfoClass(
+                    title=title,
+                    description="",
+                    lastModified=ChangeAuditStamps(),
+                    customProperties=custom_properties,
+                ),
+            )
+
+            # removed status mcp
+            status_mcp = self.new_mcp(
+                entity_type=Constant.CHART,
+                entity_urn=chart_urn,
+                aspect_name=Constant.STATUS,
+                aspect=StatusClass(removed=False),
+            )
+
+            key_mcp = self.new_mcp(
+                entity_type=Constant.CHART,
+                entity_urn=chart_urn,
+                aspect_name=Constant.CHART_KEY,
+                aspect=ChartKeyClass(
+                    dashboardTool=self.__config.platform_name,
+                    chartId=Constant.CHART_ID.format(
+                        "{}.{}".format(report.Id, visual.name)
+                    ),
+                ),
+            )
+            mcps.extend([info_mcp, status_mcp, key_mcp])
+        return mcps
+
     def to_datahub_user(
         self, user: SystemPolicies
     ) -> List[MetadataChangeProposalWrapper]:
@@ -881,7 +2943,7 @@ class Mapper:
         LOGGER.info("Converting user {} to datahub's user".format(user.GroupUserName))
 
         # Create an URN for user
-        user_urn = builder.make_user_urn(user.get_urn_part())
+        user_urn = self.to_user_urn(user)
 
         user_info_instance = CorpUserInfoClass(
             displayName=user.DisplayName,
@@ -918,23 +2980,42 @@ class Mapper:
 
         return [info_mcp, status_mcp, user_key_mcp]
 
-    def to_datahub_work_units(self, report: Report) -> Set[EquableMetadataWorkUnit]:
+    def to_user_work_units(self, user: SystemPolicies) -> Set[EquableMetadataWorkUnit]:
+        """
+        Map PowerBiReportServer user to work units, emitted once per run
+        """
+        work_units = map(self.__to_work_unit, self.to_datahub_user(user))
+        return OrderedSet([wu for wu in work_units if wu is not None])
+
+    def to_datahub_work_units(
+        self, report: CatalogRecord
+    ) -> Set[EquableMetadataWorkUnit]:
+        """
+        Map report to work units. Owners are only referenced by URN,
+        their CorpUser aspects come from to_user_work_units.
+        """
         mcps = []
 
         LOGGER.info("Converting dashboard={} to datahub dashboard".format(report.Name))
 
-        # Convert user to CorpUser
-        user_mcps = self.to_datahub_user(report.UserInfo)
-        # Convert tiles to charts
-        ds_mcps: List[Any]
-        chart_mcps: List[Any]
-        ds_mcps, chart_mcps = [], []  # self.to_datahub_chart(dashboard.tiles)
+        user_urn_list: List[str] = (
+            [self.to_user_urn(report.UserInfo)] if report.UserInfo is not None else []
+        )
+        # Convert visuals of the report definition to charts
+        ds_mcps: List[Any] = []
+        chart_mcps = self.to_datahub_charts(report)
+        # Shared datasets and upstream tables of embedded data sources
+        dataset_urn_list: List[str] = []
+        if report.Lineage is not None:
+            dataset_urn_list.extend(map(self.to_dataset_urn, report.Lineage.datasets))
+            dataset_urn_list.extend(self.to_upstream_urns(report.Lineage.data_sources))
         # Lets convert dashboard to datahub dashboard
-        dashboard_mcps = self.__to_datahub_dashboard(report, chart_mcps, user_mcps)
+        dashboard_mcps = self.__to_datahub_dashboard(
+            report, chart_mcps, user_urn_list, dataset_urn_list
+        )
 
         # Now add MCPs in sequence
         mcps.extend(ds_mcps)
-        mcps.extend(user_mcps)
         mcps.extend(chart_mcps)
         mcps.extend(dashboard_mcps)
 
@@ -944,18 +3025,6 @@ class Mapper:
         return OrderedSet([wu for wu in work_units if wu is not None])
 
 
-@dataclass
-class PowerBiReportServerDashboardSourceReport(SourceReport):
-    scanned_report: int = 0
-    filtered_reports: List[str] = dataclass_field(default_factory=list)
-
-    def report_scanned(self, count: int = 1) -> None:
-        self.scanned_report += count
-
-    def report_dropped(self, view: str) -> None:
-        self.filtered_reports.append(view)
-
-
 @platform_name("PowerBIReportServer")
 @config_class(PowerBiDashboardSourceConfig)
 @support_status(SupportStatus.UNKNOWN)
@@ -988,15 +3057,261 @@ class PowerBiReportServerDashboardSource(Source):
         super().__init__(ctx)
         self.source_config = config
         self.report = PowerBiReportServerDashboardSourceReport()
-        self.auth = PowerBiReportServerAPI(self.source_config).get_auth_credentials()
-        self.powerbi_client = PowerBiReportServerAPI(self.source_config)
+        # Counters are updated from worker threads of the source and its clients
+        self.__report_lock = threading.Lock()
+        self.__tracer = Tracer(config.opentelemetry_spans)
+        # Each server has a client and connection pool of its own
+        self.server_configs = self.source_config.get_server_configs()
+        self.powerbi_clients = [
+            PowerBiReportServerAPI(server_config, self.report, self.__report_lock)
+            for server_config in self.server_configs
+        ]
+        self.powerbi_client = self.powerbi_clients[0]
+        self.auth = self.powerbi_client.get_auth_credentials()
         self.mapper = Mapper(config)
+        self.deduplicator = WorkUnitDeduplicator()
+        # URNs of users whose aspects were already emitted in this run
+        self.emitted_user_urns: Set[str] = set()
+        # URNs of shared datasets already emitted in this run
+        self.emitted_dataset_urns: Set[str] = set()
+        # URNs of all entities emitted as present in this run
+        self.present_urns: Set[str] = set()
+        # Earliest ModifiedDate of the reports whose enrichment failed, by
+        # watermark key, the watermarks are kept below them
+        self.failed_since: Dict[str, datetime] = {}
+        # Data sources by dataset Id, fetched once whatever the fan-in
+        self.dataset_data_sources = MemoCache(
+            on_hit=self.report.report_lineage_cache_hit,
+            on_miss=self.report.report_lineage_cache_miss,
+        )
+        self.definition_cache: Optional[DefinitionCache] = None
+        if self.source_config.extract_charts and self.source_config.chart_cache_path:
+            self.definition_cache = DefinitionCache(self.source_config.chart_cache_path)
+        self.parse_executor: Optional[ProcessPoolExecutor] = None
+        if (
+            self.source_config.extract_charts
+            and self.source_config.content_parse_workers > 0
+        ):
+            # Workers are spawned rather than forked from this multithreaded
+            # process, they only import the content module
+            self.parse_executor = ProcessPoolExecutor(
+                max_workers=self.source_config.content_parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self.mapper_executor: Optional[ThreadPoolExecutor] = None
+        if self.source_config.mapper_workers > 0:
+            self.mapper_executor = ThreadPoolExecutor(
+                max_workers=self.source_config.mapper_workers,
+                thread_name_prefix="pbirs-mapper",
+            )
+        self.state: Optional[IngestionState] = None
+        if self.source_config.state_file_path and (
+            self.source_config.incremental or self.source_config.remove_stale_entities
+        ):
+            self.state = IngestionState.load(self.source_config.state_file_path)
+        if (
+            self.source_config.shard_count > 1
+            and not self.source_config.folder_traversal
+        ):
+            # Shards are hashes of top-level folders, OData $filter can't select them
+            LOGGER.warning(
+                "Each shard downloads whole report collections, enable "
+                "folder_traversal to list only the folders of the shard"
+            )
+        self.async_drivers: List[Any] = []
+        if self.source_config.async_client:
+            # Imported here as the asyncio client needs the async extra
+            from .async_client import AsyncIngestionDriver
+
+            self.async_drivers = [
+                AsyncIngestionDriver(
+                    server_config,
+                    self.report,
+                    self.definition_cache,
+                    self.parse_executor,
+                    self.__report_lock,
+                )
+                for server_config in self.server_configs
+            ]
 
     @classmethod
     def create(cls, config_dict, ctx):
         config = PowerBiDashboardSourceConfig.parse_obj(config_dict)
         return cls(config, ctx)
 
+    def __get_lineage(
+        self, client: PowerBiReportServerAPI, report: CatalogRecord
+    ) -> ReportLineage:
+        lineage = ReportLineage()
+        if report.HasSharedDataSets:
+            lineage.datasets = client.get_report_datasets(report.Id)
+            for dataset in lineage.datasets:
+                fetch = functools.partial(client.get_dataset_data_sources, dataset.Id)
+                data_sources = self.dataset_data_sources.get(dataset.Id, fetch)
+                lineage.dataset_data_sources[dataset.Id] = data_sources
+        if report.HasDataSources:
+            lineage.data_sources = client.get_report_data_sources(
+                report.ReportType, report.Id
+            )
+        return lineage
+
+    def __get_definition(
+        self, server: int, report: CatalogRecord
+    ) -> Optional[ReportDefinition]:
+        """
+        Metadata of report definition, downloaded only if the report was
+        modified since it was extracted
+        """
+        content_format = PowerBiReportServerAPI.CONTENT_FORMATS.get(report.ReportType)
+        if content_format is None:
+            return None
+        server_url = self.server_configs[server].get_base_api_url
+        modified_date = (
+            to_utc(report.ModifiedDate) if report.ModifiedDate is not None else None
+        )
+        if self.definition_cache is not None and modified_date is not None:
+            definition = self.definition_cache.lookup(
+                server_url, report.Id, modified_date
+            )
+            if definition is not None:
+                with self.__report_lock:
+                    self.report.report_definition_cache_hit()
+                return definition
+
+        path = self.powerbi_clients[server].download_content(
+            report.ReportType, report.Id
+        )
+        with self.__report_lock:
+            self.report.report_content_download()
+        try:
+            with self.__stage(Constant.STAGE_PARSE, report_id=report.Id):
+                # Only the path goes to the worker process, the file is read there
+                if self.parse_executor is not None:
+                    definition = self.parse_executor.submit(
+                        extract_definition, content_format, path
+                    ).result()
+                else:
+                    definition = extract_definition(content_format, path)
+        finally:
+            os.unlink(path)
+        if self.definition_cache is not None and modified_date is not None:
+            self.definition_cache.store(
+                server_url, report.Id, modified_date, definition
+            )
+        return definition
+
+    def __enrich_report(self, server: int, report: CatalogRecord) -> CatalogRecord:
+        """
+        Fetch details of report which are not part of the report collection
+        """
+        client = self.powerbi_clients[server]
+        try:
+            with self.__stage(Constant.STAGE_ENRICH, report_id=report.Id):
+                # Fetch PowerBi users for dashboards
+                report.UserInfo = client.get_user_policies(report.CreatedBy)
+                # Fetch datasets and data sources for lineage
+                if self.source_config.extract_lineage:
+                    report.Lineage = self.__get_lineage(client, report)
+                # Download and parse report definition for charts
+                if self.source_config.extract_charts:
+                    report.Definition = self.__get_definition(server, report)
+            # Increase dashboard count in report
+            with self.__report_lock:
+                self.report.report_scanned()
+        except Exception as e:
+            message = (
+                "Error ({}) occurred while loading dashboard {}(id={}) tiles.".format(
+                    e, report.Name, report.Id
+                )
+            )
+            LOGGER.exception(message)
+            report.EnrichmentFailed = True
+            with self.__report_lock:
+                self.report.report_warning(report.Id, message)
+        return report
+
+    def __iter_reports(
+        self, server: int, modified_since: Dict[str, datetime]
+    ) -> Iterator[CatalogRecord]:
+        """
+        Enriched reports of server, fetched by the asyncio client when it is enabled
+        """
+        if self.async_drivers:
+            return self.async_drivers[server].iter_reports(modified_since)
+
+        client = self.powerbi_clients[server]
+        # Only a compact record of each report is kept past decoding
+        reports: Iterator[CatalogRecord]
+        if self.source_config.folder_traversal:
+            reports = self.__walk_reports(client, modified_since)
+        else:
+            reports = (
+                CatalogRecord.from_item(self.REPORT_TYPES_BY_MODEL[type(item)], item)
+                for item in client.get_all_reports(modified_since)
+            )
+        reports = timed_iter(
+            reports, functools.partial(self.__report_stage, Constant.STAGE_FETCH)
+        )
+        # Reports of other shards or denied are dropped before any follow-up call
+        reports = filter(self.__is_report_selected, reports)
+        # Per report follow-up calls run concurrently, reports keep their order
+        return client.map_ordered(
+            functools.partial(self.__enrich_report, server), reports
+        )
+
+    def __walk_reports(
+        self, client: PowerBiReportServerAPI, modified_since: Dict[str, datetime]
+    ) -> Iterator[CatalogRecord]:
+        for item in client.walk_catalog(self.source_config.is_folder_pruned):
+            report_type = PowerBiReportServerAPI.CATALOG_ITEM_TYPES.get(item.Type)
+            if report_type is None:
+                continue
+            # Items of the folder listing can't be filtered by the server
+            watermark = modified_since.get(report_type)
+            if (
+                watermark is not None
+                and item.ModifiedDate is not None
+                and to_utc(item.ModifiedDate) <= to_utc(watermark)
+            ):
+                continue
+            yield CatalogRecord.from_folder_item(report_type, item)
+
+    def __is_report_selected(self, report: CatalogRecord) -> bool:
+        if not self.source_config.is_in_shard(report.Folder):
+            return False
+        if not self.source_config.report_pattern.allowed(report.Path):
+            with self.__report_lock:
+                self.report.report_dropped(report.Path)
+            return False
+        return True
+
+    def __report_stage(self, stage: str, seconds: float) -> None:
+        with self.__report_lock:
+            self.report.report_stage(stage, seconds)
+
+    @contextmanager
+    def __stage(self, stage: str, **attributes: Any) -> Iterator[None]:
+        """
+        Time the block as stage, traced as a span when spans are enabled
+        """
+        started_at = time.perf_counter()
+        try:
+            with self.__tracer.span("pbirs.{}".format(stage), **attributes):
+                yield
+        finally:
+            self.__report_stage(stage, time.perf_counter() - started_at)
+
+    def __state_key(self, server: int, report_type: str) -> str:
+        # State of a single server keeps plain report type keys
+        if not self.source_config.servers:
+            return report_type
+        server_config = self.server_configs[server]
+        return "{}/{}/{}".format(
+            server_config.workstation_name,
+            server_config.report_virtual_directory_name,
+            report_type,
+        )
+
     def get_workunits(self) -> Iterable[MetadataWorkUnit]:
         """
         Datahub Ingestion framework invoke this method
@@ -1005,34 +3320,238 @@ class PowerBiReportServerDashboardSource(Source):
 
         # Fetch PowerBiReportServer reports for given url
         # workspace = self.powerbi_client.get_workspace(self.source_config.workspace_id)
-        reports = self.powerbi_client.get_all_reports()
+        full_sync = (
+            not self.source_config.incremental
+            or self.state is None
+            or self.state.is_full_sync_due(self.source_config.full_resync_interval_days)
+        )
+        servers = range(len(self.server_configs))
+        modified_since: List[Dict[str, datetime]] = [{} for _ in servers]
+        watermarks: Dict[str, datetime] = {}
+        if self.state is not None and not full_sync:
+            for server in servers:
+                for report_type in PowerBiReportServerAPI.REPORT_TYPES_MAPPING:
+                    key = self.__state_key(server, report_type)
+                    watermark = self.state.get_watermark(key)
+                    if watermark is not None:
+                        modified_since[server][report_type] = watermark
+                        watermarks[key] = watermark
+            LOGGER.info(
+                "Incremental ingestion of reports modified since {}".format(watermarks)
+            )
+        started_at = datetime.now(timezone.utc)
+
+        # Servers are ingested in parallel, work units are emitted from this thread.
+        # In the pipeline, fetching and enrichment run ahead on threads of their
+        # own and mapping on the mapper executor, each stage bounded by the queue
+        pipeline = self.mapper_executor is not None
+        reports = merge_iterators(
+            [self.__iter_reports(server, modified_since[server]) for server in servers],
+            max_buffered=(
+                self.source_config.pipeline_queue_size
+                if pipeline
+                else 2 * self.source_config.max_workers
+            ),
+            inline=not pipeline,
+        )
+        mapped = ordered_map(
+            self.__map_report,
+            self.__plan(reports, watermarks),
+            self.mapper_executor,
+            max_in_flight=self.source_config.pipeline_queue_size,
+        )
+        for workunits in mapped:
+            yield from self.__emit(workunits)
+        if self.state is not None and self.source_config.remove_stale_entities:
+            yield from self.__emit(self.__remove_stale_entities(full_sync))
 
-        for report in reports:
-            try:
-                # Fetch PowerBi users for dashboards
-                report.UserInfo = self.powerbi_client.get_user_policies(
-                    report.CreatedBy
+        self.__save_state(watermarks, full_sync, started_at)
+        self.__write_metrics()
+
+    def __plan(
+        self,
+        reports: Iterable[Tuple[int, CatalogRecord]],
+        watermarks: Dict[str, datetime],
+    ) -> Iterator[Tuple[CatalogRecord, bool, List[DataSet]]]:
+        """
+        Reports in emission order with the owner and shared datasets to map
+        along with each of them
+        """
+        for server, report in reports:
+            key = self.__state_key(server, report.ReportType)
+            if not report.EnrichmentFailed:
+                self.__track_watermark(watermarks, key, report)
+            elif report.ModifiedDate is not None:
+                modified_date = to_utc(report.ModifiedDate)
+                self.failed_since[key] = min(
+                    self.failed_since.get(key, modified_date), modified_date
                 )
-                # Increase dashboard and tiles count in report
-                self.report.report_scanned(count=len(report))
-            except Exception as e:
-                message = "Error ({}) occurred while loading dashboard {}(id={}) tiles.".format(
-                    e, report.Name, report.Id
+            # Owners are emitted once, the first time they are seen
+            new_user = False
+            if report.UserInfo is not None:
+                user_urn = self.mapper.to_user_urn(report.UserInfo)
+                if user_urn not in self.emitted_user_urns:
+                    self.emitted_user_urns.add(user_urn)
+                    new_user = True
+            # Shared datasets are emitted once, the first time they are seen
+            new_datasets: List[DataSet] = []
+            if report.Lineage is not None:
+                for dataset in report.Lineage.datasets:
+                    dataset_urn = self.mapper.to_dataset_urn(dataset)
+                    if dataset_urn not in self.emitted_dataset_urns:
+                        self.emitted_dataset_urns.add(dataset_urn)
+                        new_datasets.append(dataset)
+            yield report, new_user, new_datasets
+
+    def __map_report(
+        self, planned: Tuple[CatalogRecord, bool, List[DataSet]]
+    ) -> List[MetadataWorkUnit]:
+        """
+        Convert PowerBi Dashboard and child entities to Datahub work units
+        """
+        report, new_user, new_datasets = planned
+        workunits: List[MetadataWorkUnit] = []
+        with self.__stage(Constant.STAGE_MAP, report_id=report.Id):
+            if new_user and report.UserInfo is not None:
+                workunits.extend(self.mapper.to_user_work_units(report.UserInfo))
+            for dataset in new_datasets:
+                assert report.Lineage is not None
+                workunits.extend(
+                    self.mapper.to_dataset_work_units(
+                        dataset, report.Lineage.dataset_data_sources.get(dataset.Id, [])
+                    )
                 )
-                LOGGER.exception(message, e)
-                self.report.report_warning(report.Id, message)
+            workunits.extend(self.mapper.to_datahub_work_units(report))
+        return workunits
+
+    def __emit(
+        self, workunits: Iterable[MetadataWorkUnit]
+    ) -> Iterable[MetadataWorkUnit]:
+        for workunit in workunits:
+            started_at = time.perf_counter()
+            mcp = workunit.metadata
+            if (
+                isinstance(mcp, MetadataChangeProposalWrapper)
+                and isinstance(mcp.aspect, StatusClass)
+                and not mcp.aspect.removed
+            ):
+                self.present_urns.add(str(mcp.entityUrn))
+            # Skip aspects already emitted with same content in this run
+            if not self.deduplicator.is_new(workunit):
+                self.report.report_workunit_suppressed()
+                continue
+            # Add workunit to report
+            self.report.report_workunit(workunit)
+            self.report.report_workunit_emitted()
+            # Return workunit to Datahub Ingestion framework, the time it
+            # takes to process it downstream is part of the emit stage
+            yield workunit
+            self.__report_stage(Constant.STAGE_EMIT, time.perf_counter() - started_at)
+
+    def __remove_stale_entities(self, full_sync: bool) -> Iterator[MetadataWorkUnit]:
+        """
+        Soft-delete entities emitted by earlier runs but not by this one
+        """
+        assert self.state is not None
+        previous_urns = self.state.emitted_urns
+        if not full_sync:
+            # Unmodified reports aren't listed by incremental runs,
+            # their entities are kept until the next full ingestion
+            self.present_urns.update(previous_urns)
+            return
+        if self.report.failures:
+            LOGGER.warning("Run has failures, stale entities are not removed")
+            return
+
+        # Single pass over the sorted URNs of the state file
+        stale_urns = [urn for urn in previous_urns if urn not in self.present_urns]
+        if (
+            stale_urns
+            and 100 * len(stale_urns) / len(previous_urns)
+            > self.source_config.stale_removal_threshold
+        ):
+            self.report.report_warning(
+                "stale-entities",
+                "{} of {} entities are stale, more than stale_removal_threshold. "
+                "They are not removed.".format(len(stale_urns), len(previous_urns)),
+            )
+            # Kept for the next full ingestion to decide
+            self.present_urns.update(stale_urns)
+            return
+        LOGGER.info("Removing {} stale entities".format(len(stale_urns)))
+        for urn in stale_urns:
+            self.report.report_stale_entity_removed()
+            yield self.mapper.to_removed_work_unit(urn)
+
+    def __write_metrics(self) -> None:
+        """
+        Write metrics of the run to prometheus_metrics_path
+        """
+        path = self.source_config.prometheus_metrics_path
+        if not path:
+            return
+        with self.__report_lock:
+            metrics = to_prometheus(
+                self.report.endpoint_stats, self.report.stage_timings
+            )
+        # Written to a temporary file first so collectors never read a partial one
+        temporary_path = "{}.tmp".format(path)
+        with open(temporary_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(metrics)
+        os.replace(temporary_path, path)
+        LOGGER.info("Wrote metrics to {}".format(path))
+
+    REPORT_TYPES_BY_MODEL: Dict[Any, str] = {
+        model: report_type
+        for report_type, model in PowerBiReportServerAPI.REPORT_TYPES_MAPPING.items()
+    }
 
-            # Convert PowerBi Dashboard and child entities
-            # to Datahub work unit to ingest into Datahub
-            workunits = self.mapper.to_datahub_work_units(report)
-            for workunit in workunits:
-                # Add workunit to report
-                self.report.report_workunit(workunit)
-                # Return workunit to Datahub Ingestion framework
-                yield workunit
+    @staticmethod
+    def __track_watermark(
+        watermarks: Dict[str, datetime], key: str, report: CatalogRecord
+    ) -> None:
+        if report.ModifiedDate is None:
+            return
+        modified_date = to_utc(report.ModifiedDate)
+        watermark = watermarks.get(key)
+        if watermark is None or to_utc(watermark) < modified_date:
+            watermarks[key] = modified_date
+
+    def __save_state(
+        self, watermarks: Dict[str, datetime], full_sync: bool, started_at: datetime
+    ) -> None:
+        """
+        Persist high-water marks if the run went through without failures
+        """
+        if self.state is None:
+            return
+        if self.report.failures:
+            LOGGER.warning("Run has failures, state file is left unchanged")
+            return
+
+        for key, watermark in watermarks.items():
+            failed_since = self.failed_since.get(key)
+            if failed_since is not None and failed_since <= to_utc(watermark):
+                # Reports modified since the failed one are listed again
+                LOGGER.info("Watermark of {} kept before failed reports".format(key))
+                watermark = failed_since - timedelta(microseconds=1)
+            self.state.set_watermark(key, watermark)
+        if full_sync:
+            self.state.last_full_sync = started_at
+        if self.source_config.remove_stale_entities:
+            self.state.emitted_urns = self.present_urns
+        self.state.save()
+        LOGGER.info("Saved ingestion state to {}".format(self.state.path))
 
     def get_report(self) -> SourceReport:
         return self.report
 
     def close(self):
-        pass
+        if self.mapper_executor is not None:
+            self.mapper_executor.shutdown(wait=True)
+        for client in self.powerbi_clients:
+            client.close()
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown(wait=True)
+        if self.definition_cache is not None:
+            self.definition_cache.close()
@@ -0,0 +1,213 @@
+#########################################################
+#
+# Persistent cache of Power BI Report Server responses
+#
+#########################################################
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    headers: Dict[str, str]
+    stored_at: float
+
+    @property
+    def etag(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get("ETag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get("Last-Modified")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Request headers revalidating this response
+        """
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        return response
+
+
+class ResponseCache:
+    """
+    SQLite file keeping zlib compressed bodies of successful GET responses.
+
+    Entries are keyed by URL and query. Responses carrying ETag or
+    Last-Modified are revalidated with a conditional request, the others are
+    served until ttl expires. Least recently used entries are evicted once
+    the compressed bodies exceed max_size bytes.
+    """
+
+    # Response headers stored along the body
+    STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+    # Validators a 304 response may replace
+    VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+    # Least recently used entries read at once while evicting
+    EVICTION_BATCH = 64
+
+    def __init__(self, path: str, max_size: int, ttl: int) -> None:
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " url TEXT NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+            # Running size of the bodies, kept up to date by store and eviction
+            (self.__size,) = self.__connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        if not params:
+            return url
+        return "{}?{}".format(url, urlencode(sorted(params.items())))
+
+    def lookup(self, key: str) -> Optional[CachedResponse]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT url, headers, body, stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            with self.__connection:
+                self.__connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        url, headers, body, stored_at = row
+        return CachedResponse(
+            url=url,
+            body=zlib.decompress(body),
+            headers=json.loads(headers),
+            stored_at=stored_at,
+        )
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """
+        Response without validators is served from cache until ttl expires
+        """
+        if entry.etag or entry.last_modified:
+            return False
+        return time.time() - entry.stored_at < self.__ttl
+
+    def store(
+        self, key: str, url: str, headers: Mapping[str, str], content: bytes
+    ) -> None:
+        """
+        Store body of successful response to url, headers being case-insensitive
+        like those of requests and httpx responses
+        """
+        stored_headers = {
+            name: headers[name]
+            for name in ResponseCache.STORED_HEADERS
+            if name in headers
+        }
+        body = zlib.compress(content)
+        now = time.time()
+        with self.__lock:
+            with self.__connection:
+                replaced = self.__connection.execute(
+                    "SELECT size FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self.__connection.execute(
+                    "INSERT OR REPLACE INTO responses"
+                    " (key, url, headers, body, size, stored_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, json.dumps(stored_headers), body, len(body), now, now),
+                )
+            self.__size += len(body) - (replaced[0] if replaced else 0)
+            self.__evict()
+
+    def touch(
+        self, key: str, entry: CachedResponse, headers: Mapping[str, str]
+    ) -> None:
+        """
+        Mark entry as revalidated by a 304 response, keeping validators the
+        server sent along in its headers
+        """
+        entry.headers.update(
+            {
+                name: headers[name]
+                for name in ResponseCache.VALIDATOR_HEADERS
+                if name in headers
+            }
+        )
+        now = time.time()
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ?"
+                " WHERE key = ?",
+                (json.dumps(entry.headers), now, now, key),
+            )
+
+    def __evict(self) -> None:
+        evicted = 0
+        while self.__size > self.__max_size:
+            rows = self.__connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT ?",
+                (ResponseCache.EVICTION_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            keys = []
+            for key, size in rows:
+                if self.__size <= self.__max_size:
+                    break
+                keys.append((key,))
+                self.__size -= size
+            with self.__connection:
+                self.__connection.executemany(
+                    "DELETE FROM responses WHERE key = ?", keys
+                )
+            evicted += len(keys)
+        if evicted:
+            LOGGER.debug("Evicted {} responses from cache".format(evicted))
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
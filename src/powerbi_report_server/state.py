@@ -0,0 +1,104 @@
+#########################################################
+#
+# Ingestion state persisted between runs
+#
+#########################################################
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# Logger instance
+LOGGER = logging.getLogger(__name__)
+
+
+def to_utc(value: datetime) -> datetime:
+    # Power BI Report Server dates without offset are in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def to_odata_datetime(value: datetime) -> str:
+    """
+    Format datetime as OData Edm.DateTimeOffset literal
+    """
+    return to_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class IngestionState:
+    """
+    Local JSON state file keeping ModifiedDate high-water mark per report type,
+    time of the last full synchronisation and the sorted URNs of the entities
+    emitted up to the last run.
+    """
+
+    WATERMARKS = "watermarks"
+    LAST_FULL_SYNC = "last_full_sync"
+    EMITTED_URNS = "emitted_urns"
+
+    def __init__(self, path: str, state: Optional[Dict[str, Any]] = None) -> None:
+        self.path = path
+        self.__state: Dict[str, Any] = state or {}
+        self.__state.setdefault(IngestionState.WATERMARKS, {})
+
+    @classmethod
+    def load(cls, path: str) -> "IngestionState":
+        if not os.path.exists(path):
+            LOGGER.info("State file {} not found, starting from scratch".format(path))
+            return cls(path)
+
+        with open(path, "r", encoding="utf-8") as state_file:
+            return cls(path, json.load(state_file))
+
+    def get_watermark(self, key: str) -> Optional[datetime]:
+        value = self.__state[IngestionState.WATERMARKS].get(key)
+        return datetime.fromisoformat(value) if value else None
+
+    def set_watermark(self, key: str, value: datetime) -> None:
+        self.__state[IngestionState.WATERMARKS][key] = to_utc(value).isoformat()
+
+    @property
+    def last_full_sync(self) -> Optional[datetime]:
+        value = self.__state.get(IngestionState.LAST_FULL_SYNC)
+        return datetime.fromisoformat(value) if value else None
+
+    @last_full_sync.setter
+    def last_full_sync(self, value: datetime) -> None:
+        self.__state[IngestionState.LAST_FULL_SYNC] = to_utc(value).isoformat()
+
+    @property
+    def emitted_urns(self) -> List[str]:
+        return self.__state.get(IngestionState.EMITTED_URNS, [])
+
+    @emitted_urns.setter
+    def emitted_urns(self, urns: Iterable[str]) -> None:
+        # Kept sorted so the file diffs well and removals are emitted in order
+        self.__state[IngestionState.EMITTED_URNS] = sorted(urns)
+
+    def is_full_sync_due(self, interval_days: Optional[int]) -> bool:
+        last_full_sync = self.last_full_sync
+        if last_full_sync is None:
+            return True
+        if interval_days is None:
+            return False
+        return datetime.now(timezone.utc) - last_full_sync >= timedelta(
+            days=interval_days
+        )
+
+    def save(self) -> None:
+        """
+        Atomically replace the state file
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as state_file:
+                json.dump(self.__state, state_file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,60 @@
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import pytest
+from datahub.ingestion.api.common import PipelineContext
+from datahub.ingestion.api.workunit import MetadataWorkUnit
+
+from powerbi_report_server.mock_server import MockReportServer, MockServerConfig
+from powerbi_report_server.powerbi_report_server import (
+    PowerBiReportServerDashboardSource,
+)
+
+Ingest = Callable[
+    ..., Tuple[PowerBiReportServerDashboardSource, List[MetadataWorkUnit]]
+]
+
+
+@pytest.fixture
+def mock_server() -> Iterator[MockReportServer]:
+    config = MockServerConfig(
+        reports=8,
+        powerbi_reports=6,
+        mobile_reports=2,
+        linked_reports=2,
+        folders=3,
+        users=4,
+        datasets=3,
+        visuals=2,
+    )
+    with MockReportServer(config) as server:
+        yield server
+
+
+@pytest.fixture
+def ingest(mock_server: MockReportServer) -> Ingest:
+    """
+    Run get_workunits of a source configured with options against the mock server
+    """
+
+    def run(
+        **options: Any,
+    ) -> Tuple[PowerBiReportServerDashboardSource, List[MetadataWorkUnit]]:
+        config: Dict[str, Any] = {
+            "username": "user",
+            "password": "password",
+            "workstation_name": mock_server.workstation_name,
+            "report_virtual_directory_name": "Reports",
+            "report_server_virtual_directory_name": "ReportServer",
+            "dataset_type_mapping": {"SQL": "mssql"},
+            **options,
+        }
+        source = PowerBiReportServerDashboardSource.create(
+            config, PipelineContext(run_id="test")
+        )
+        try:
+            workunits = list(source.get_workunits())
+        finally:
+            source.close()
+        return source, workunits
+
+    return run
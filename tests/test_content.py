@@ -0,0 +1,149 @@
+import json
+import zipfile
+from datetime import datetime
+
+from powerbi_report_server.content import (
+    PBIX,
+    RDL,
+    DataSourceReference,
+    DefinitionCache,
+    ReportDefinition,
+    Visual,
+    extract_definition,
+    extract_pbix,
+    extract_rdl,
+)
+from powerbi_report_server.mock_server import MockCatalog, MockServerConfig
+
+RDL_NAMESPACE = (
+    "http://schemas.microsoft.com/sqlserver/reporting/2016/01/reportdefinition"
+)
+
+
+def write_content(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def mock_content(tmp_path, collection):
+    catalog = MockCatalog(MockServerConfig(visuals=3, folders=1))
+    report = catalog.collections[collection][7]
+    return write_content(tmp_path, collection, catalog.content(report))
+
+
+def test_extract_rdl(tmp_path):
+    definition = extract_rdl(mock_content(tmp_path, "Reports"))
+
+    assert definition.visuals == (
+        Visual(
+            name="Chart0",
+            type="Chart",
+            title="Chart 0 of report 7",
+            dataset="DataSet1",
+            fields=("Amount",),
+        ),
+        Visual(
+            name="Tablix1",
+            type="Tablix",
+            dataset="DataSet1",
+            fields=("Region", "Amount"),
+        ),
+        Visual(
+            name="Chart2",
+            type="Chart",
+            title="Chart 2 of report 7",
+            dataset="DataSet1",
+            fields=("Amount",),
+        ),
+    )
+    assert definition.data_sources == (
+        DataSourceReference(name="DataSource1", reference="/Data Sources/Sales"),
+    )
+    assert definition.parameters == ("Year",)
+
+
+def test_extract_rdl_nested_regions(tmp_path):
+    rdl = (
+        '<Report xmlns="{}"><DataSources><DataSource Name="Embedded">'
+        "<ConnectionProperties><DataProvider>SQL</DataProvider>"
+        "<ConnectString>Data Source=sql</ConnectString></ConnectionProperties>"
+        "</DataSource></DataSources><Body><ReportItems>"
+        '<Tablix Name="Outer"><DataSetName>Orders</DataSetName><TablixCells>'
+        '<Chart Name="Inner"><DataSetName>Lines</DataSetName>'
+        "<Y>=Sum(Fields!Quantity.Value)</Y></Chart>"
+        "<Value>=Fields!Customer.Value</Value>"
+        "</TablixCells></Tablix></ReportItems></Body></Report>"
+    ).format(RDL_NAMESPACE)
+
+    definition = extract_rdl(write_content(tmp_path, "nested.rdl", rdl.encode()))
+
+    assert [(visual.name, visual.dataset) for visual in definition.visuals] == [
+        ("Inner", "Lines"),
+        ("Outer", "Orders"),
+    ]
+    assert definition.visuals[0].fields == ("Quantity",)
+    assert definition.data_sources == (
+        DataSourceReference(name="Embedded", provider="SQL"),
+    )
+
+
+def test_extract_pbix(tmp_path):
+    definition = extract_pbix(mock_content(tmp_path, "PowerBiReports"))
+
+    assert [visual.title for visual in definition.visuals] == [
+        "Visual 0 of report 7",
+        "Visual 1 of report 7",
+        "Visual 2 of report 7",
+    ]
+    assert definition.visuals[0].type == "barChart"
+    assert definition.visuals[0].page == "Page 1"
+    assert definition.visuals[0].fields == ("Sales.Region", "Sum(Sales.Amount)")
+    assert definition.data_sources == (
+        DataSourceReference(
+            name="EntityDataSource",
+            reference="Sales",
+            provider="analysisServicesDatabaseLive",
+        ),
+    )
+    assert definition.parameters == ()
+
+
+def test_extract_pbix_skips_decorations_and_groups(tmp_path):
+    containers = [
+        {"config": json.dumps({"name": "a", "singleVisual": {"visualType": "image"}})},
+        {"config": json.dumps({"name": "b", "singleVisualGroup": {}})},
+        {"config": json.dumps({"name": "c", "singleVisual": {"visualType": "card"}})},
+    ]
+    layout = {"sections": [{"name": "S", "visualContainers": containers}]}
+    path = tmp_path / "report.pbix"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("Report/Layout", json.dumps(layout).encode("utf-16-le"))
+
+    definition = extract_pbix(str(path))
+
+    assert [visual.name for visual in definition.visuals] == ["c"]
+    assert definition.visuals[0].page == "S"
+    assert definition.data_sources == ()
+
+
+def test_extract_definition(tmp_path):
+    assert extract_definition(RDL, mock_content(tmp_path, "Reports")).visuals
+    assert extract_definition(PBIX, mock_content(tmp_path, "PowerBiReports")).visuals
+
+
+def test_definition_cache(tmp_path):
+    definition = ReportDefinition(
+        visuals=(Visual(name="v", type="Chart", fields=("a", "b")),),
+        data_sources=(DataSourceReference(name="s"),),
+        parameters=("Year",),
+    )
+    modified_date = datetime(2022, 1, 1)
+    cache = DefinitionCache(str(tmp_path / "cache.db"))
+    cache.store("server", "1", modified_date, definition)
+
+    assert cache.lookup("server", "1", modified_date) == definition
+    # A modified report is extracted again
+    assert cache.lookup("server", "1", datetime(2022, 1, 2)) is None
+    assert cache.lookup("other", "1", modified_date) is None
+    cache.close()
@@ -0,0 +1,114 @@
+import json
+from typing import Any, List
+
+import pytest
+
+from powerbi_report_server.decoding import CollectionParser
+
+BODY = {
+    "@odata.context": "http://server/api/v2.0/$metadata#Reports",
+    "value": [
+        {"Id": "1", "Name": "Sales été", "Size": 1024, "Hidden": False},
+        {"Id": "2", "Name": "Costs", "Size": 2.5e3, "Hidden": True, "Tags": []},
+    ],
+    "@odata.nextLink": "http://server/api/v2.0/Reports?$skip=2",
+}
+
+
+def parse_chunks(chunks: List[bytes]) -> CollectionParser:
+    parser = CollectionParser()
+    values: List[Any] = []
+    for chunk in chunks:
+        values.extend(parser.feed(chunk))
+    values.extend(parser.close())
+    parser.values = values  # type: ignore[attr-defined]
+    return parser
+
+
+def test_whole_body():
+    parser = parse_chunks([json.dumps(BODY).encode("utf-8")])
+
+    assert parser.values == BODY["value"]
+    assert parser.count == 2
+    assert parser.members["@odata.nextLink"] == BODY["@odata.nextLink"]
+
+
+def test_every_split_of_the_body():
+    content = json.dumps(BODY, ensure_ascii=False).encode("utf-8")
+    # Splits land inside keys, strings, numbers, literals and multibyte characters
+    for split in range(1, len(content)):
+        parser = parse_chunks([content[:split], content[split:]])
+        assert parser.values == BODY["value"], split
+        assert parser.members["@odata.nextLink"] == BODY["@odata.nextLink"], split
+
+
+def test_byte_by_byte():
+    content = json.dumps(BODY, indent=2).encode("utf-8")
+    parser = parse_chunks([content[index : index + 1] for index in range(len(content))])
+
+    assert parser.values == BODY["value"]
+
+
+def test_values_are_returned_as_soon_as_complete():
+    parser = CollectionParser()
+
+    assert parser.feed(b'{"value": [{"Id": "1"}, {"Id"') == [{"Id": "1"}]
+    assert parser.feed(b': "2"}]}') == [{"Id": "2"}]
+    assert parser.close() == []
+
+
+def test_empty_collection():
+    parser = parse_chunks([b'{"value": []}'])
+
+    assert parser.values == []
+    assert parser.count == 0
+
+
+def test_truncated_body():
+    parser = CollectionParser()
+    parser.feed(b'{"value": [{"Id": "1"}, ')
+
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_unexpected_data():
+    parser = CollectionParser()
+
+    with pytest.raises(ValueError):
+        parser.feed(b'[{"Id": "1"}]')
+
+
+SCALAR_BODY = (
+    '{"@odata.count": 12.5e-1, "value": [3.5, 1e3, -0.25E+2, 42, true, null, '
+    '"a \\"quoted\\" \\u00e9 string", "", 7], "@odata.total": -100}'
+)
+
+
+@pytest.mark.parametrize(
+    "chunks, values",
+    [
+        (['{"value":[3.', "5]}"], [3.5]),
+        (['{"value":[1e', "3]}"], [1000.0]),
+        (['{"value":[1E+', "3]}"], [1000.0]),
+        (['{"value":[-', "2]}"], [-2]),
+        (['{"value":[12', "34]}"], [1234]),
+        (['{"value":[tr', "ue]}"], [True]),
+        (['{"value":["a\\', 'u00e9b"]}'], ["aéb"]),
+        (['{"value":["ab', 'cd"]}'], ["abcd"]),
+    ],
+)
+def test_split_scalar(chunks, values):
+    parser = parse_chunks([chunk.encode("utf-8") for chunk in chunks])
+
+    assert parser.values == values
+
+
+def test_every_split_of_scalars():
+    expected = json.loads(SCALAR_BODY)
+    content = SCALAR_BODY.encode("utf-8")
+    for split in range(1, len(content)):
+        parser = parse_chunks([content[:split], content[split:]])
+        assert parser.values == expected["value"], split
+        assert parser.members["@odata.count"] == expected["@odata.count"], split
+        assert parser.members["@odata.total"] == expected["@odata.total"], split
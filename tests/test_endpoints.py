@@ -0,0 +1,81 @@
+from powerbi_report_server.endpoints import (
+    ROOT_FOLDER_KEY,
+    EndpointRegistry,
+    ODataKey,
+    odata_key,
+)
+
+BASE_URL = "http://server/Reports/api/v2.0/"
+GUID = "5f0b6a7e-1c2d-4e3f-8a9b-0c1d2e3f4a5b"
+TEMPLATES = {
+    "REPORTS": "{PBIRS_BASE_URL}/Reports",
+    "REPORT": "{PBIRS_BASE_URL}/Reports({REPORT_ID})",
+    "REPORT_DATASOURCES": "{PBIRS_BASE_URL}/Reports({REPORT_ID})/DataSources",
+    "FOLDER_CATALOG_ITEMS": "{PBIRS_BASE_URL}/Folders({FOLDER_ID})/CatalogItems",
+}
+
+
+def test_guid_key_is_left_as_is():
+    assert odata_key(GUID) == GUID
+
+
+def test_string_key_is_quoted():
+    assert odata_key("Sales") == "'Sales'"
+    # Single quotes are doubled, other characters are percent-encoded
+    assert odata_key("Bob's report") == "'Bob''s%20report'"
+
+
+def test_alternate_key():
+    assert odata_key("/Finance/Q1", name="Path") == "Path='/Finance/Q1'"
+    assert ROOT_FOLDER_KEY == "Path='/'"
+
+
+def test_url():
+    registry = EndpointRegistry(BASE_URL, TEMPLATES)
+
+    assert registry.url("REPORTS") == "http://server/Reports/api/v2.0/Reports"
+    assert registry.url(
+        "REPORT_DATASOURCES", REPORT_ID=GUID
+    ) == "http://server/Reports/api/v2.0/Reports({})/DataSources".format(GUID)
+    assert (
+        registry.url("REPORT", REPORT_ID="Sales")
+        == "http://server/Reports/api/v2.0/Reports('Sales')"
+    )
+
+
+def test_url_with_quoted_key():
+    registry = EndpointRegistry(BASE_URL, TEMPLATES)
+
+    assert (
+        registry.url("FOLDER_CATALOG_ITEMS", FOLDER_ID=ROOT_FOLDER_KEY)
+        == "http://server/Reports/api/v2.0/Folders(Path='/')/CatalogItems"
+    )
+    assert registry.url("REPORT", REPORT_ID=ODataKey("'A'")).endswith("Reports('A')")
+
+
+def test_endpoint_of():
+    registry = EndpointRegistry(BASE_URL, TEMPLATES)
+
+    for endpoint, keys in (
+        ("REPORTS", {}),
+        ("REPORT", {"REPORT_ID": GUID}),
+        ("REPORT_DATASOURCES", {"REPORT_ID": GUID}),
+        ("FOLDER_CATALOG_ITEMS", {"FOLDER_ID": ROOT_FOLDER_KEY}),
+    ):
+        assert registry.endpoint_of(registry.url(endpoint, **keys)) == endpoint
+
+
+def test_endpoint_of_next_link():
+    registry = EndpointRegistry(BASE_URL, TEMPLATES)
+
+    assert (
+        registry.endpoint_of("http://server/Reports/api/v2.0/Reports?$skip=100")
+        == "REPORTS"
+    )
+
+
+def test_endpoint_of_other_url():
+    registry = EndpointRegistry(BASE_URL, TEMPLATES)
+
+    assert registry.endpoint_of("http://server/Reports/api/v2.0/Kpis") is None
+    assert registry.endpoint_of("http://other/Reports/api/v2.0/Reports") is None
@@ -0,0 +1,251 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+from datahub.emitter.mcp import MetadataChangeProposalWrapper
+from datahub.ingestion.api.workunit import MetadataWorkUnit
+
+from powerbi_report_server.mock_server import MockReportServer
+from powerbi_report_server.powerbi_report_server import PowerBiReportServerAPI
+
+REPORT_COUNT = 18
+
+
+def aspect_urns(workunits: List[MetadataWorkUnit], aspect_name: str) -> List[str]:
+    urns = []
+    for workunit in workunits:
+        mcp = workunit.metadata
+        if (
+            isinstance(mcp, MetadataChangeProposalWrapper)
+            and mcp.aspectName == aspect_name
+        ):
+            urns.append(str(mcp.entityUrn))
+    return urns
+
+
+def removed_urns(workunits: List[MetadataWorkUnit]) -> List[str]:
+    return [
+        str(workunit.metadata.entityUrn)
+        for workunit in workunits
+        if isinstance(workunit.metadata, MetadataChangeProposalWrapper)
+        and workunit.metadata.aspectName == "status"
+        and workunit.metadata.aspect.removed
+    ]
+
+
+def remove_report(server: MockReportServer, item: Dict[str, Any]) -> None:
+    catalog = server.catalog
+    for items in catalog.collections.values():
+        if item in items:
+            items.remove(item)
+    for items in catalog.children.values():
+        if item in items:
+            items.remove(item)
+    del catalog.by_id[item["Id"]]
+
+
+def test_full_ingestion(ingest):
+    source, workunits = ingest(extract_lineage=True)
+
+    dashboards = aspect_urns(workunits, "dashboardInfo")
+    assert len(dashboards) == len(set(dashboards)) == REPORT_COUNT
+    # Owners are emitted once whatever the number of their reports
+    users = aspect_urns(workunits, "corpUserInfo")
+    assert len(users) == len(set(users)) == 4
+    assert aspect_urns(workunits, "upstreamLineage")
+    assert source.report.scanned_report == REPORT_COUNT
+    assert not source.report.failures
+    assert not source.report.warnings
+
+
+def test_ingestion_is_repeatable(ingest):
+    _, first = ingest(extract_lineage=True)
+    _, second = ingest(extract_lineage=True, max_workers=4)
+
+    assert [workunit.id for workunit in first] == [workunit.id for workunit in second]
+
+
+def test_paged_ingestion(ingest, mock_server):
+    mock_server.config.max_page_size = 5
+    _, paged = ingest(page_size=0)
+    mock_server.config.max_page_size = 0
+    _, whole = ingest(page_size=0)
+
+    assert [workunit.id for workunit in paged] == [workunit.id for workunit in whole]
+
+
+def test_async_ingestion(ingest):
+    pytest.importorskip("httpx")
+    pytest.importorskip("httpx_ntlm")
+    _, sync_workunits = ingest(extract_lineage=True)
+    source, async_workunits = ingest(extract_lineage=True, async_client=True)
+
+    assert [workunit.id for workunit in async_workunits] == [
+        workunit.id for workunit in sync_workunits
+    ]
+    assert not source.report.failures
+
+
+def test_async_ingestion_with_throttling_and_cache(ingest, tmp_path):
+    pytest.importorskip("httpx")
+    pytest.importorskip("httpx_ntlm")
+    options = dict(
+        extract_lineage=True,
+        async_client=True,
+        requests_per_second=1000.0,
+        max_in_flight=4,
+        adaptive_concurrency=True,
+        adaptive_window=5,
+        response_cache_path=str(tmp_path / "responses.db"),
+    )
+    _, sync_workunits = ingest(extract_lineage=True)
+    source, first = ingest(**options)
+    assert source.report.response_cache_misses
+    assert source.report.max_in_flight_limit is not None
+
+    source, second = ingest(**options)
+
+    assert [workunit.id for workunit in first] == [
+        workunit.id for workunit in sync_workunits
+    ]
+    assert [workunit.id for workunit in second] == [
+        workunit.id for workunit in sync_workunits
+    ]
+    assert source.report.response_cache_revalidations
+    assert not source.report.failures
+
+
+def test_chart_extraction(ingest):
+    _, workunits = ingest(extract_charts=True)
+
+    charts = aspect_urns(workunits, "chartInfo")
+    # Paginated and Power BI reports have 2 data visuals each
+    assert len(charts) == len(set(charts)) == 2 * (8 + 6)
+
+
+def test_incremental_ingestion(ingest, mock_server, tmp_path):
+    state_file_path = str(tmp_path / "state.json")
+    _, first = ingest(incremental=True, state_file_path=state_file_path)
+    assert len(aspect_urns(first, "dashboardInfo")) == REPORT_COUNT
+
+    _, unchanged = ingest(incremental=True, state_file_path=state_file_path)
+    assert aspect_urns(unchanged, "dashboardInfo") == []
+
+    modified = mock_server.catalog.collections["Reports"][3]
+    modified["ModifiedDate"] = "2030-01-01T00:00:00.000000Z"
+    _, changed = ingest(incremental=True, state_file_path=state_file_path)
+    assert len(aspect_urns(changed, "dashboardInfo")) == 1
+
+    with open(state_file_path, encoding="utf-8") as state_file:
+        watermarks = json.load(state_file)["watermarks"]
+    assert "2030-01-01T00:00:00+00:00" in watermarks.values()
+
+
+def test_stale_entities_are_removed(ingest, mock_server, tmp_path):
+    options = dict(remove_stale_entities=True, state_file_path=str(tmp_path / "s"))
+    _, first = ingest(**options)
+    remove_report(mock_server, mock_server.catalog.collections["Reports"][0])
+    remove_report(mock_server, mock_server.catalog.collections["PowerBiReports"][0])
+
+    source, second = ingest(**options)
+
+    gone = set(aspect_urns(first, "dashboardInfo")) - set(
+        aspect_urns(second, "dashboardInfo")
+    )
+    assert len(gone) == 2
+    assert set(removed_urns(second)) == gone
+    assert source.report.stale_entities_removed == 2
+
+    # Removed entities are forgotten, nothing is removed twice
+    _, third = ingest(**options)
+    assert removed_urns(third) == []
+
+
+def test_stale_removal_threshold(ingest, mock_server, tmp_path):
+    options = dict(remove_stale_entities=True, state_file_path=str(tmp_path / "s"))
+    ingest(**options)
+    for item in list(mock_server.catalog.collections["Reports"]):
+        remove_report(mock_server, item)
+
+    source, workunits = ingest(stale_removal_threshold=10.0, **options)
+
+    assert removed_urns(workunits) == []
+    assert "stale-entities" in source.report.warnings
+
+
+def test_incremental_run_keeps_unlisted_entities(ingest, mock_server, tmp_path):
+    options = dict(
+        incremental=True,
+        remove_stale_entities=True,
+        state_file_path=str(tmp_path / "s"),
+    )
+    ingest(**options)
+
+    source, workunits = ingest(**options)
+
+    assert removed_urns(workunits) == []
+    assert source.report.stale_entities_removed == 0
+
+
+def test_failed_enrichment_is_retried(ingest, mock_server, monkeypatch, tmp_path):
+    options = dict(
+        incremental=True,
+        extract_lineage=True,
+        state_file_path=str(tmp_path / "s"),
+    )
+    ingest(**options)
+    failed, modified = mock_server.catalog.collections["Reports"][2:4]
+    failed["ModifiedDate"] = "2030-01-01T00:00:00.000000Z"
+    modified["ModifiedDate"] = "2031-01-01T00:00:00.000000Z"
+    get_report_data_sources = PowerBiReportServerAPI.get_report_data_sources
+
+    def fail_once(self, report_type, report_id):
+        if report_id == failed["Id"]:
+            raise ConnectionError("Connection reset")
+        return get_report_data_sources(self, report_type, report_id)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(PowerBiReportServerAPI, "get_report_data_sources", fail_once)
+        source, workunits = ingest(**options)
+    assert source.report.warnings
+    assert len(aspect_urns(workunits, "dashboardInfo")) == 2
+
+    # Reports modified since the failed one are listed again
+    source, retried = ingest(**options)
+    assert len(aspect_urns(retried, "dashboardInfo")) == 2
+    assert not source.report.warnings
+
+    _, unchanged = ingest(**options)
+    assert aspect_urns(unchanged, "dashboardInfo") == []
+
+
+@pytest.mark.parametrize(
+    "deny, pruned, dashboards",
+    [
+        # Every report under the folder is denied
+        ("/Folder 0/.*", 1, REPORT_COUNT - 7),
+        # Only the folder itself is denied, its reports are allowed
+        ("/Folder 0$", 0, REPORT_COUNT),
+    ],
+)
+def test_folder_pruning(ingest, deny, pruned, dashboards):
+    source, workunits = ingest(folder_traversal=True, report_pattern={"deny": [deny]})
+
+    assert source.report.folders_pruned == pruned
+    assert len(aspect_urns(workunits, "dashboardInfo")) == dashboards
+
+
+def test_sharded_folder_traversal(ingest):
+    source, whole = ingest(folder_traversal=True)
+    folders_listed = source.report.folders_listed
+
+    dashboards: List[str] = []
+    for shard_index in range(3):
+        source, workunits = ingest(
+            folder_traversal=True, shard_count=3, shard_index=shard_index
+        )
+        dashboards.extend(aspect_urns(workunits, "dashboardInfo"))
+        # Top-level folders of the other shard aren't listed
+        assert source.report.folders_listed < folders_listed
+
+    assert sorted(dashboards) == sorted(aspect_urns(whole, "dashboardInfo"))
@@ -0,0 +1,157 @@
+from typing import Any, List
+
+from datahub.emitter.mcp import MetadataChangeProposalWrapper
+from datahub.ingestion.api.workunit import MetadataWorkUnit
+from datahub.metadata.schema_classes import ChangeTypeClass, StatusClass
+
+from powerbi_report_server.powerbi_report_server import (
+    CircuitBreaker,
+    PowerBiDashboardSourceConfig,
+    Role,
+    SystemPolicies,
+    UserDirectory,
+    WorkUnitDeduplicator,
+)
+
+
+def policies(*user_names: str) -> List[SystemPolicies]:
+    return [
+        SystemPolicies(
+            GroupUserName=user_name,
+            Roles=[Role(Name="Browser", Description="")],
+            DisplayName=None,
+        )
+        for user_name in user_names
+    ]
+
+
+def status_workunit(urn: str, removed: bool) -> MetadataWorkUnit:
+    return MetadataWorkUnit(
+        id=urn,
+        mcp=MetadataChangeProposalWrapper(
+            entityType="dashboard",
+            changeType=ChangeTypeClass.UPSERT,
+            entityUrn=urn,
+            aspectName="status",
+            aspect=StatusClass(removed=removed),
+        ),
+    )
+
+
+def test_user_directory_lookup():
+    directory = UserDirectory(fetch=lambda: policies("DOMAIN\\Alice", "bob"))
+
+    assert directory.get("domain\\alice").GroupUserName == "DOMAIN\\Alice"
+    # Bare account name matches the domain qualified entry
+    assert directory.get("ALICE").GroupUserName == "DOMAIN\\Alice"
+    # Policy granted to the bare account name
+    assert directory.get("OTHER\\bob").GroupUserName == "bob"
+    assert directory.get("carol") is None
+    assert directory.get(None) is None
+
+
+def test_user_directory_ambiguous_account():
+    directory = UserDirectory(fetch=lambda: policies("EU\\alice", "US\\alice"))
+
+    assert directory.get("alice") is None
+    assert directory.get("US\\alice").GroupUserName == "US\\alice"
+
+
+def test_user_directory_fetches_once():
+    fetches = []
+
+    def fetch() -> List[SystemPolicies]:
+        fetches.append(1)
+        return policies("DOMAIN\\alice")
+
+    directory = UserDirectory(fetch=fetch)
+    for _ in range(3):
+        directory.get("alice")
+    assert len(fetches) == 1
+
+    directory.refresh()
+    assert len(fetches) == 2
+
+
+def test_user_directory_ttl():
+    fetches = []
+
+    def fetch() -> List[SystemPolicies]:
+        fetches.append(1)
+        return policies("DOMAIN\\alice")
+
+    directory = UserDirectory(fetch=fetch, ttl=0)
+    directory.get("alice")
+    directory.get("alice")
+
+    assert len(fetches) == 2
+
+
+def test_deduplicator():
+    deduplicator = WorkUnitDeduplicator()
+    urn = "urn:li:dashboard:(powerbi,reports.1)"
+
+    assert deduplicator.is_new(status_workunit(urn, removed=False))
+    assert not deduplicator.is_new(status_workunit(urn, removed=False))
+    # Changed content is emitted again
+    assert deduplicator.is_new(status_workunit(urn, removed=True))
+    assert deduplicator.is_new(status_workunit(urn + "x", removed=True))
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    # Open, a single trial request is let through
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_circuit_breaker_release():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    # Trial ended without outcome
+    breaker.release()
+    assert breaker.allow()
+
+
+def source_config(**options: Any) -> PowerBiDashboardSourceConfig:
+    return PowerBiDashboardSourceConfig.parse_obj(
+        dict(
+            username="user",
+            password="password",
+            workstation_name="server",
+            report_virtual_directory_name="Reports",
+            report_server_virtual_directory_name="ReportServer",
+            dataset_type_mapping={},
+            **options,
+        )
+    )
+
+
+def test_folder_pruned_by_descendant_pattern():
+    config = source_config(report_pattern={"deny": ["/Finance/.*"]})
+
+    assert config.is_folder_pruned("/Finance")
+    assert config.is_folder_pruned("/Finance/Q1")
+    assert not config.is_folder_pruned("/Sales")
+    assert not config.is_folder_pruned("/Finance Archive")
+
+
+def test_folder_not_pruned_by_folder_pattern():
+    config = source_config(
+        report_pattern={"deny": ["/Finance$", "/Sales/.*\\.rdl", "/HR/$"]}
+    )
+
+    # Each pattern lets some report under the folder through
+    assert not config.is_folder_pruned("/Finance")
+    assert not config.is_folder_pruned("/Sales")
+    assert not config.is_folder_pruned("/HR")
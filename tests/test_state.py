@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from powerbi_report_server.state import IngestionState, to_odata_datetime, to_utc
+
+
+def test_missing_state_file(tmp_path):
+    state = IngestionState.load(str(tmp_path / "state.json"))
+
+    assert state.get_watermark("Report") is None
+    assert state.last_full_sync is None
+    assert state.emitted_urns == []
+    assert state.is_full_sync_due(None)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "nested" / "state.json")
+    state = IngestionState.load(path)
+    state.set_watermark("Report", datetime(2022, 1, 1, 12, 30))
+    state.last_full_sync = datetime(2022, 1, 2, tzinfo=timezone.utc)
+    state.emitted_urns = ["urn:b", "urn:a"]
+    state.save()
+
+    loaded = IngestionState.load(path)
+
+    # Dates without offset are UTC
+    assert loaded.get_watermark("Report") == datetime(
+        2022, 1, 1, 12, 30, tzinfo=timezone.utc
+    )
+    assert loaded.last_full_sync == datetime(2022, 1, 2, tzinfo=timezone.utc)
+    assert loaded.emitted_urns == ["urn:a", "urn:b"]
+    assert not list(tmp_path.joinpath("nested").glob("*.tmp"))
+
+
+def test_full_sync_interval(tmp_path):
+    state = IngestionState(str(tmp_path / "state.json"))
+    state.last_full_sync = datetime.now(timezone.utc) - timedelta(days=3)
+
+    assert not state.is_full_sync_due(None)
+    assert not state.is_full_sync_due(7)
+    assert state.is_full_sync_due(2)
+
+
+def test_to_utc():
+    offset = timezone(timedelta(hours=2))
+
+    assert to_utc(datetime(2022, 1, 1, 12, tzinfo=offset)) == datetime(
+        2022, 1, 1, 10, tzinfo=timezone.utc
+    )
+    assert to_odata_datetime(datetime(2022, 1, 1, 12)) == "2022-01-01T12:00:00.000000Z"